@@ -0,0 +1,138 @@
+'''
+Headless batch solver
+Read puzzles from a text file (one 81 characters line per puzzle, 0 or . for empty cells),
+solve them on every core and write one line per puzzle:
+    puzzle  solution  status  milliseconds
+
+Usage: python batch.py puzzles.txt [-o solutions.txt] [--algorithm DLX] [--check-unique]
+'''
+
+import argparse, collections, itertools, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+import bitmask_solver, board_model, dlx_solver
+
+
+_SOLVERS = {
+    'Bitmask': bitmask_solver.BitmaskSolver,
+    'DLX': dlx_solver.DLXSolver,
+}
+
+# Solver instance of the current worker process
+_solver = None
+
+
+def parse_line(line):
+    '''Turn an 81 characters line into a flat grid, return None if it isn't a puzzle'''
+    return board_model.parse_cells(line)
+
+
+def format_grid(grid):
+    return board_model.format_cells(board_model.flatten(grid))
+
+
+def _init_worker(algorithm):
+    global _solver
+    _solver = _SOLVERS[algorithm]()
+
+
+def _solve_chunk(lines, check_unique):
+    '''Solve a chunk of puzzle lines, return one result tuple per line'''
+    results = []
+
+    for line in lines:
+        puzzle = line.strip()
+        grid = parse_line(puzzle)
+
+        if grid is None:
+            results.append((puzzle, '', 'invalid', 0.0))
+            continue
+
+        start = time.perf_counter()
+
+        if check_unique:
+            solutions = _solver.count_solutions(grid, 2)
+            status = ('unsolvable', 'unique', 'multiple')[solutions]
+
+        if not check_unique or solutions:
+            _solver._status_solving = True
+            solved = _solver.solve(grid)
+
+            if not check_unique:
+                status = 'solved' if solved else 'unsolvable'
+
+        elapsed = (time.perf_counter() - start) * 1000
+        solution = format_grid(grid) if status != 'unsolvable' else ''
+        results.append((puzzle, solution, status, elapsed))
+
+    return results
+
+
+def _read_chunks(file, chunk_size):
+    '''Lazily split the puzzle file into chunks, skipping blank and comment lines'''
+    lines = (line for line in file if line.strip() and not line.startswith('#'))
+
+    while chunk := list(itertools.islice(lines, chunk_size)):
+        yield chunk
+
+
+def solve_file(source, output, algorithm='Bitmask', workers=None, chunk_size=256, check_unique=False):
+    '''
+    Solve every puzzle of the source file into the output file
+    Only a few chunks per worker are in flight at a time, so memory stays flat
+    however large the input is, and results are written in input order
+    '''
+    workers = workers or os.cpu_count() or 1
+    counter = collections.Counter()
+    pending = collections.deque()
+
+    def write(results):
+        for puzzle, solution, status, elapsed in results:
+            output.write(f'{puzzle}\t{solution}\t{status}\t{elapsed:.3f}\n')
+            counter[status] += 1
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(algorithm,)) as executor:
+        for chunk in _read_chunks(source, chunk_size):
+            pending.append(executor.submit(_solve_chunk, chunk, check_unique))
+
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+
+        while pending:
+            write(pending.popleft().result())
+
+    return counter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve Sudoku puzzles from a file without a window')
+    parser.add_argument('puzzles', help='text file with one 81 characters puzzle per line, - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='where to write the solutions, - for stdout')
+    parser.add_argument('-a', '--algorithm', choices=list(_SOLVERS), default='Bitmask')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=256, help='puzzles sent to a worker at a time')
+    parser.add_argument('-u', '--check-unique', action='store_true', help='also check that every solution is unique')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.puzzles == '-' else open(args.puzzles)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    start = time.perf_counter()
+
+    try:
+        counter = solve_file(source, output, args.algorithm, args.workers, args.chunk_size, args.check_unique)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counter.values())
+    summary = ', '.join(f'{status}: {count}' for status, count in sorted(counter.items()))
+
+    print(f'{total} puzzles in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s) - {summary}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
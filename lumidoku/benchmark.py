@@ -0,0 +1,240 @@
+'''
+Solver benchmark
+Solve the sample puzzles and the bundled hard sets with every algorithm, without a window,
+report wall time, search nodes, backtracks and peak memory, and write them as JSON
+Compare against an older result file to catch regressions:
+
+Usage: python benchmark.py -o results.json
+       python benchmark.py --baseline results.json --threshold 0.25
+       python benchmark.py --startup
+'''
+
+import argparse, json, os, platform, statistics, subprocess, sys, time, tracemalloc
+
+import bitmask_solver, dlx_solver, sudoku_core
+
+
+_SOLVERS = {
+    'Bitmask': bitmask_solver.BitmaskSolver,
+    'DLX': dlx_solver.DLXSolver,
+}
+
+# Modules timed by --startup, from the solver core to the whole game window
+_STARTUP_MODULES = ('board_model', 'sudoku_core', 'generator', 'solver_worker', 'prefetcher', 'sudoku_board')
+
+# Third-party packages that must not be loaded by importing the solver core
+_HEAVY_MODULES = ('pygame', 'requests', 'numpy')
+
+_PUZZLE_SETS = {
+    # Puzzles with the fewest possible clues, from Gordon Royle's collection
+    '17-clue': {
+        'royle-1': '000000010400000000020000000000050407008000300001090000300400200050100000000806000',
+        'royle-2': '000000010400000000020000000000050604008000300001090000300400200050100000000807000',
+        'royle-3': '000000012000035000000600070700000300000400800100000000000120000080000040050000600',
+        'royle-4': '000000012003600000000007000410020000000500300700000600280000040000300500000000000',
+        'royle-5': '000000012008030000000000040120500000000004700060000000507000300000620000000100000',
+        'royle-6': '000000012040050000000009000070600400000100000000000050000087500601000300200000000',
+        'royle-7': '000000012050400000000000030700600400001000000000080000920000800000510700000003000',
+    },
+    # Puzzles known to be hard for backtracking solvers
+    'adversarial': {
+        'anti-brute-force': '000000000000003085001020000000507000004000100090000000500000073002010000000040009',
+        'inkala-2010': '800000000003600000070090200050007000000045700000100030001000068008500010090000400',
+        'platinum-blonde': '000000012000000003002300400001800005060070800000009000008500000900040500470006000',
+        'golden-nugget': '000000039000001005003050800008090006070002000100400000009080050020000600400700000',
+        'easter-monster': '100000002090400050006000700050903000000070000000850040700000600030009080002000001',
+        'tarek-071223170000': '400000805030000000000700000020000060000080400000010000000603070500200000104000000',
+        'coly013': '520006000000000701300000000000400800600000050000000000041800000000030020008700000',
+        'champagne': '600008940900006100070040000200610000000000200089002000000060005000000030800001600',
+    },
+}
+
+
+def _sample_puzzles():
+    '''The game's own sample puzzles, read without opening a window'''
+    return {
+        name.lower(): ''.join(str(value) for row in grid for value in row)
+        for name, grid in sudoku_core.SAMPLE_PUZZLES.items()
+    }
+
+
+def _to_grid(puzzle):
+    return [[int(puzzle[i * 9 + j]) for j in range(9)] for i in range(9)]
+
+
+def measure(algorithm, puzzle, repeat=3):
+    '''Solve one puzzle repeat times, return the best wall time and the search statistics'''
+    solver = _SOLVERS[algorithm]()
+    best = None
+
+    for attempt in range(repeat):
+        grid = _to_grid(puzzle)
+        solver._status_solving = True
+
+        start = time.perf_counter()
+        solved = solver.solve(grid)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Memory is measured in a separate run, tracing slows the solver down a lot
+    tracemalloc.start()
+    solver._status_solving = True
+    solver.solve(_to_grid(puzzle))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'solved': solved,
+        'seconds': best,
+        'nodes': solver.nodes,
+        'backtracks': solver.backtracks,
+        'candidates': solver.candidates,
+        'peak_bytes': peak,
+    }
+
+
+def run(algorithms, puzzle_sets, repeat=3):
+    results = []
+
+    for set_name, puzzles in puzzle_sets.items():
+        for name, puzzle in puzzles.items():
+            for algorithm in algorithms:
+                result = {'set': set_name, 'puzzle': name, 'algorithm': algorithm}
+                result.update(measure(algorithm, puzzle, repeat))
+                results.append(result)
+
+                print(
+                    f'{set_name:12} {name:20} {algorithm:8} {result["seconds"] * 1000:9.2f} ms'
+                    f' {result["nodes"]:8} nodes {result["backtracks"]:8} backtracks'
+                    f' {result["peak_bytes"] / 1024:8.1f} KiB',
+                    file=sys.stderr
+                )
+
+    return results
+
+
+def measure_startup(module, repeat=5):
+    '''
+    Import a module in fresh interpreters repeat times, return the median import time
+    and the heavy third-party packages it loaded
+    '''
+    script = (
+        'import sys, time\n'
+        'start = time.perf_counter()\n'
+        f'import {module}\n'
+        'elapsed = time.perf_counter() - start\n'
+        f'print(elapsed, *[name for name in {_HEAVY_MODULES!r} if name in sys.modules])\n'
+    )
+    environment = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    times = []
+
+    for attempt in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=environment, capture_output=True, text=True,
+        )
+
+        if output.returncode:
+            return {'module': module, 'seconds': None, 'loaded': [], 'error': output.stderr.strip().splitlines()[-1]}
+
+        elapsed, *loaded = output.stdout.split()
+        times.append(float(elapsed))
+
+    return {'module': module, 'seconds': statistics.median(times), 'loaded': loaded}
+
+
+def run_startup(modules, repeat=5):
+    results = []
+
+    for module in modules:
+        result = measure_startup(module, repeat)
+        results.append(result)
+
+        if result['seconds'] is None:
+            print(f'{module:14} failed: {result["error"]}', file=sys.stderr)
+        else:
+            print(f'{module:14} {result["seconds"] * 1000:9.2f} ms  loads: {", ".join(result["loaded"]) or "-"}', file=sys.stderr)
+
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds):
+    '''
+    Return a description of every result that got slower (or searched more nodes)
+    than its baseline by more than threshold (0.25 = 25%)
+    Time differences under min_seconds are ignored as noise
+    '''
+    old_results = {(old['set'], old['puzzle'], old['algorithm']): old for old in baseline['results']}
+    regressions = []
+
+    for result in results:
+        if not (old := old_results.get((result['set'], result['puzzle'], result['algorithm']))):
+            continue
+
+        name = f'{result["set"]}/{result["puzzle"]} ({result["algorithm"]})'
+
+        if result['seconds'] > old['seconds'] * (1 + threshold) and result['seconds'] - old['seconds'] > min_seconds:
+            regressions.append(f'{name}: {old["seconds"] * 1000:.2f} ms -> {result["seconds"] * 1000:.2f} ms')
+
+        if result['nodes'] > old['nodes'] * (1 + threshold):
+            regressions.append(f'{name}: {old["nodes"]} nodes -> {result["nodes"]} nodes')
+
+        if result['solved'] != old['solved']:
+            regressions.append(f'{name}: solved {old["solved"]} -> {result["solved"]}')
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solving algorithms without a window')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('-a', '--algorithm', action='append', choices=list(_SOLVERS), help='algorithm to run (default: all)')
+    parser.add_argument('-s', '--set', action='append', help='puzzle set to run (default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='solves per puzzle, the fastest one counts')
+    parser.add_argument('-b', '--baseline', help='JSON results to compare against')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25, help='allowed slowdown against the baseline (0.25 = 25%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.001, help='ignore time differences smaller than this')
+    parser.add_argument('--startup', action='store_true', help='time the import of each module in a fresh interpreter instead of solving')
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        results = run_startup(_STARTUP_MODULES, args.repeat)
+
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'startup': results}, file, indent=2)
+
+        # The solver core must stay free of third-party packages
+        if any(result['loaded'] for result in results if result['module'] == 'sudoku_core'):
+            print('REGRESSION sudoku_core loads third-party packages', file=sys.stderr)
+            sys.exit(1)
+        return
+
+    puzzle_sets = {'samples': _sample_puzzles(), **_PUZZLE_SETS}
+    if args.set:
+        puzzle_sets = {name: puzzle_sets[name] for name in args.set}
+
+    results = run(args.algorithm or list(_SOLVERS), puzzle_sets, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results,
+            }, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold, args.min_seconds)
+
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
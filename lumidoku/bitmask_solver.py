@@ -0,0 +1,355 @@
+import collections
+import board_model
+
+
+class BitmaskSolver:
+    '''
+    Constraint propagation solver, for any box size (the grid size is read from the grid)
+    Digits used by every row, column and box are kept as integers with one bit per digit,
+    naked and hidden singles are filled in before each branch
+    and the search always branches on the most constrained cell (MRV)
+    On 16x16 and larger grids, pointing and claiming (box/line reduction) also run before branching,
+    the candidates they rule out are kept per cell in excluded
+    '''
+
+    def __init__(self) -> None:
+        self._status_solving = False
+        self._status_solved = False
+        self._geometry = board_model.geometry()
+
+        # Search statistics of the last run
+        self.nodes = 0
+        self.backtracks = 0
+        self.candidates = 0
+
+    def solve(self, grid):
+        '''
+        Fill in the grid (a list of rows, or a flat buffer, 0 for empty cells) in place
+        Return True if a solution is found, False if there is none or solving was stopped
+        '''
+        self._status_solved = False
+        solutions = self._run(grid, 1, check_stop=True)
+
+        if not solutions:
+            return False
+
+        if board_model.flatten(grid) is grid:
+            grid[:] = bytes(solutions[0])
+        else:
+            side = self._geometry.side
+            for cell, value in enumerate(solutions[0]):
+                grid[cell // side][cell % side] = value
+
+        self._status_solved = True
+        self._status_solving = False
+        return True
+
+    def steps(self, grid):
+        '''
+        Solve the grid one change at a time, as a generator yielding (i, j, value)
+        for every number placed, and (i, j, 0) for every number taken back
+        The grid is left untouched, _status_solved tells if a solution was found
+        '''
+        self._status_solved = False
+
+        if state := self._load(grid):
+            self._status_solved = yield from self._search_steps(*state)
+
+    def count_solutions(self, grid, limit=2, check_stop=False):
+        '''
+        Count the solutions of the grid, stop counting once limit is reached
+        With check_stop, counting also ends early (with the count so far) once _status_solving is turned off
+        '''
+        return len(self._run(grid, limit, check_stop))
+
+    def split(self, grid, count):
+        '''
+        Cut the search tree into about count independent parts, for parallel_solver:
+        propagate, then branch on the most constrained cell, breadth first, until there are enough branches
+        Return (parts, solutions), the partial grids left to search and the solutions met on the way, as flat lists
+        The nodes expanded here are counted in the search statistics, as in a search
+        '''
+        if not (state := self._load(grid)):
+            return [], []
+
+        g = self._geometry
+        frontier = collections.deque([state])
+        solutions = []
+
+        while frontier and len(frontier) < count:
+            values, rows, cols, boxes, excluded = frontier.popleft()
+            self.nodes += 1
+            cell = self._propagate(values, rows, cols, boxes, excluded)
+
+            if cell is None:
+                self.backtracks += 1
+                continue
+
+            if cell == -1:
+                solutions.append(values)
+                continue
+
+            candidates = g.all_digits & ~(rows[g.row[cell]] | cols[g.col[cell]] | boxes[g.box[cell]] | excluded[cell])
+            self.candidates += candidates.bit_count()
+
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+
+                branch = values[:], rows[:], cols[:], boxes[:], excluded[:]
+                self._place(*branch, cell, g.bit_to_digit[bit])
+                frontier.append(branch)
+
+        return [state[0] for state in frontier], solutions
+
+    def _load(self, grid):
+        '''Load the grid into bitmasks, return None if the given numbers break Sudoku rule'''
+        self.nodes = self.backtracks = self.candidates = 0
+
+        cells = board_model.flatten(grid)
+        values, rows, cols, boxes, excluded = state = self._empty_state(cells)
+        g = self._geometry
+
+        for cell, value in enumerate(cells):
+            if value:
+                bit = 1 << (value - 1)
+
+                if value > g.side or (rows[g.row[cell]] | cols[g.col[cell]] | boxes[g.box[cell]]) & bit:
+                    return None
+                self._place(*state, cell, value)
+
+        return state
+
+    def _empty_state(self, cells):
+        '''Pick the geometry of the grid, return empty values and row, column and box masks for it'''
+        self._geometry = g = board_model.geometry_of(cells)
+        return [0] * g.size, [0] * g.side, [0] * g.side, [0] * g.side, [0] * g.size
+
+    def _run(self, grid, limit, check_stop=False):
+        '''Load the grid and collect up to limit solutions'''
+        solutions = []
+
+        if state := self._load(grid):
+            self._search(*state, solutions, limit, check_stop)
+
+        return solutions
+
+    def _place(self, values, rows, cols, boxes, excluded, cell, value):
+        g = self._geometry
+        bit = 1 << (value - 1)
+        values[cell] = value
+        rows[g.row[cell]] |= bit
+        cols[g.col[cell]] |= bit
+        boxes[g.box[cell]] |= bit
+
+    def _propagate(self, values, rows, cols, boxes, excluded):
+        '''
+        Keep filling in naked and hidden singles until nothing changes
+        Return the empty cell with the fewest candidates, -1 if the grid is full
+        or None if some cell or digit has no place left
+        '''
+        place = self._place
+        g = self._geometry
+        all_digits, row_of, col_of, box_of, bit_to_digit = g.all_digits, g.row, g.col, g.box, g.bit_to_digit
+
+        while True:
+            progress = False
+            best_cell, best_count = -1, g.side + 1
+
+            # Naked singles: cells with only one candidate left
+            for cell in range(g.size):
+                if values[cell]:
+                    continue
+
+                candidates = all_digits & ~(rows[row_of[cell]] | cols[col_of[cell]] | boxes[box_of[cell]] | excluded[cell])
+
+                if not candidates:
+                    return None
+
+                if not candidates & (candidates - 1):
+                    place(values, rows, cols, boxes, excluded, cell, bit_to_digit[candidates])
+                    progress = True
+
+                elif (count := candidates.bit_count()) < best_count:
+                    best_cell, best_count = cell, count
+
+            if progress:
+                continue
+
+            # Hidden singles: digits with only one possible cell left in a unit
+            for unit in g.units:
+                used = seen_once = seen_twice = 0
+
+                for cell in unit:
+                    if value := values[cell]:
+                        used |= 1 << (value - 1)
+                    else:
+                        candidates = all_digits & ~(rows[row_of[cell]] | cols[col_of[cell]] | boxes[box_of[cell]] | excluded[cell])
+                        seen_twice |= seen_once & candidates
+                        seen_once |= candidates
+
+                if (seen_once | used) != all_digits:
+                    return None
+
+                if not (singles := seen_once & ~seen_twice):
+                    continue
+
+                for cell in unit:
+                    if values[cell]:
+                        continue
+
+                    candidates = all_digits & ~(rows[row_of[cell]] | cols[col_of[cell]] | boxes[box_of[cell]] | excluded[cell])
+
+                    if hidden := candidates & singles:
+                        # One cell can't be the only place for two digits
+                        if hidden & (hidden - 1):
+                            return None
+                        place(values, rows, cols, boxes, excluded, cell, bit_to_digit[hidden])
+                        progress = True
+
+            if progress:
+                continue
+
+            # Box/line reduction only pays off on 16x16 and larger grids, 9x9 ones are quicker to branch
+            if best_cell == -1 or not (g.box_size > 3 and self._box_line(values, rows, cols, boxes, excluded)):
+                return best_cell
+
+    def _box_line(self, values, rows, cols, boxes, excluded):
+        '''
+        Pointing and claiming: a digit confined to one line (row or column) inside a box can go nowhere else in that line,
+        and a digit confined to one box inside a line can go nowhere else in that box
+        The candidates of every line are merged box by box into segments, the eliminations go to excluded
+        Return True if any candidate was eliminated
+        '''
+        g = self._geometry
+        n, side, all_digits = g.box_size, g.side, g.all_digits
+        row_of, col_of, box_of = g.row, g.col, g.box
+
+        candidates = [
+            0 if values[cell] else all_digits & ~(rows[row_of[cell]] | cols[col_of[cell]] | boxes[box_of[cell]] | excluded[cell])
+            for cell in range(g.size)
+        ]
+        progress = False
+
+        def eliminate(cells, digits):
+            nonlocal progress
+            for cell in cells:
+                if found := candidates[cell] & digits:
+                    excluded[cell] |= found
+                    candidates[cell] ^= found
+                    progress = True
+
+        for lines in (g.rows, g.cols):
+            # segments[k][s]: candidates of line k inside the s-th box along it
+            segments = []
+            for line in lines:
+                merged = [0] * n
+                for position, cell in enumerate(line):
+                    merged[position // n] |= candidates[cell]
+                segments.append(merged)
+
+            for k, line in enumerate(lines):
+                first = k - k % n
+
+                # Claiming: digits found in one segment of the line only leave the other lines of that box
+                for s, digits in enumerate(self._alone(segments[k])):
+                    if digits:
+                        for other in range(first, first + n):
+                            if other != k:
+                                eliminate(lines[other][s * n:s * n + n], digits)
+
+            for first in range(0, side, n):
+                for s in range(n):
+                    # Pointing: digits found in one line of the box only leave the other segments of that line
+                    for k, digits in enumerate(self._alone([segments[line][s] for line in range(first, first + n)]), first):
+                        if digits:
+                            eliminate(lines[k][:s * n] + lines[k][s * n + n:], digits)
+
+        return progress
+
+    @staticmethod
+    def _alone(masks):
+        '''For every mask, its bits that no other mask has'''
+        once = twice = 0
+        for mask in masks:
+            twice |= once & mask
+            once |= mask
+        return [mask & ~twice for mask in masks]
+
+    def _search(self, values, rows, cols, boxes, excluded, solutions, limit, check_stop):
+        '''
+        Propagate, then try every candidate of the most constrained cell
+        Return True once the search should end (enough solutions or stopped)
+        '''
+        if check_stop and not self._status_solving:
+            return True
+
+        self.nodes += 1
+        cell = self._propagate(values, rows, cols, boxes, excluded)
+
+        if cell is None:
+            return False
+
+        if cell == -1:
+            solutions.append(values)
+            return len(solutions) >= limit
+
+        g = self._geometry
+        candidates = g.all_digits & ~(rows[g.row[cell]] | cols[g.col[cell]] | boxes[g.box[cell]] | excluded[cell])
+        self.candidates += candidates.bit_count()
+
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+
+            # Each branch works on its own copy, so nothing has to be undone
+            branch = values[:], rows[:], cols[:], boxes[:], excluded[:]
+            self._place(*branch, cell, g.bit_to_digit[bit])
+
+            if self._search(*branch, solutions, limit, check_stop):
+                return True
+
+            self.backtracks += 1
+
+        return False
+
+    def _search_steps(self, values, rows, cols, boxes, excluded):
+        '''
+        Same search as _search for a single solution, yielding every change to the grid
+        Return True if a solution was found
+        '''
+        self.nodes += 1
+        g = self._geometry
+        before = values[:]
+        cell = self._propagate(values, rows, cols, boxes, excluded)
+        placed = [k for k in range(g.size) if values[k] != before[k]]
+
+        for k in placed:
+            yield g.row[k], g.col[k], values[k]
+
+        if cell == -1:
+            return True
+
+        if cell is not None:
+            candidates = g.all_digits & ~(rows[g.row[cell]] | cols[g.col[cell]] | boxes[g.box[cell]] | excluded[cell])
+            self.candidates += candidates.bit_count()
+
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+
+                branch = values[:], rows[:], cols[:], boxes[:], excluded[:]
+                self._place(*branch, cell, g.bit_to_digit[bit])
+                yield g.row[cell], g.col[cell], g.bit_to_digit[bit]
+
+                if (yield from self._search_steps(*branch)):
+                    return True
+
+                self.backtracks += 1
+                yield g.row[cell], g.col[cell], 0
+
+        # Dead end: take back the singles filled in at this level
+        for k in placed:
+            yield g.row[k], g.col[k], 0
+
+        return False
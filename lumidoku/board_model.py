@@ -0,0 +1,138 @@
+import functools, math
+
+
+# Box sizes a board can have: 2 (4x4 grid), 3 (the usual 9x9), 4 (16x16) and 5 (25x25)
+BOX_SIZES = (2, 3, 4, 5)
+
+# Text symbol of every number, 0 for empty cells: 1-9 then letters, A is 10 and G is 16
+SYMBOLS = '0123456789ABCDEFGHIJKLMNOP'
+
+# Byte tables between the text form of a grid (symbols, 0 or . for empty cells) and its cells
+_FROM_TEXT = bytes.maketrans(
+    b'.' + SYMBOLS.encode() + SYMBOLS[10:].lower().encode(),
+    bytes([0] + list(range(len(SYMBOLS))) + list(range(10, len(SYMBOLS))))
+)
+_TO_TEXT = bytes.maketrans(bytes(range(len(SYMBOLS))), SYMBOLS.encode())
+
+
+class Geometry:
+    '''Rows, columns and boxes of a grid made of box_size x box_size boxes, as flat cell indices'''
+
+    def __init__(self, box_size) -> None:
+        self.box_size = n = box_size
+        self.side = side = n * n
+        self.size = size = side * side
+        self.all_digits = (1 << side) - 1
+
+        # Row, column and box index of every cell
+        self.row = [cell // side for cell in range(size)]
+        self.col = [cell % side for cell in range(size)]
+        self.box = [(cell // side // n) * n + (cell % side) // n for cell in range(size)]
+
+        self.rows = [[cell for cell in range(size) if self.row[cell] == k] for k in range(side)]
+        self.cols = [[cell for cell in range(size) if self.col[cell] == k] for k in range(side)]
+        self.boxes = [[cell for cell in range(size) if self.box[cell] == k] for k in range(side)]
+        self.units = self.rows + self.cols + self.boxes
+
+        # The cells sharing a row, column or box with every cell
+        self.peers = [
+            sorted(set(self.rows[self.row[cell]] + self.cols[self.col[cell]] + self.boxes[self.box[cell]]) - {cell})
+            for cell in range(size)
+        ]
+
+        self.bit_to_digit = {1 << (digit - 1): digit for digit in range(1, side + 1)}
+
+
+@functools.lru_cache(maxsize=None)
+def geometry(box_size=3):
+    return Geometry(box_size)
+
+
+def geometry_of(cells):
+    '''Geometry of a flat grid, from its number of cells'''
+    box_size = math.isqrt(math.isqrt(len(cells)))
+
+    if box_size not in BOX_SIZES or box_size ** 4 != len(cells):
+        raise ValueError(f'{len(cells)} cells is not a Sudoku grid')
+
+    return geometry(box_size)
+
+
+def flatten(grid):
+    '''The numbers of a grid row by row, from a list of rows or as is from a flat buffer'''
+    if len(grid) and isinstance(grid[0], (list, tuple)):
+        return [value for row in grid for value in row]
+
+    return grid
+
+
+def parse_cells(text):
+    '''
+    Read a grid written on one line (16, 81, 256 or 625 characters),
+    return its cells as a bytearray or None if it isn't a grid
+    '''
+    text = text.strip().encode('ascii', 'replace')
+
+    try:
+        side = geometry_of(text).side
+    except ValueError:
+        return None
+
+    if text.translate(None, b'.' + SYMBOLS[:side + 1].encode() + SYMBOLS[10:side + 1].lower().encode()):
+        return None
+
+    return bytearray(text.translate(_FROM_TEXT))
+
+
+def format_cells(cells):
+    '''Write flat cells (any bytes-like object, a memoryview is read without copying) on one line'''
+    return bytes(cells).translate(_TO_TEXT).decode()
+
+
+class Cell:
+    '''Position of one cell in the grid and its rect on the screen'''
+
+    __slots__ = ('row', 'col', 'index', 'rect')
+
+    def __init__(self, row, col, rect, side=9) -> None:
+        self.row = row
+        self.col = col
+        self.index = row * side + col
+        self.rect = rect
+
+
+class BoardModel:
+    '''
+    Compact grid: the numbers of the cells row by row in one bytearray (0 for empty),
+    and the given cells (part of the puzzle, not player answers) as the bits of one integer
+    '''
+
+    __slots__ = ('box_size', 'side', 'values', 'givens', 'view')
+
+    def __init__(self, box_size=3) -> None:
+        self.box_size = box_size
+        self.side = box_size * box_size
+        self.values = bytearray(self.side * self.side)
+        self.givens = 0
+
+        # Zero copy view shared by the solvers, the renderer and serialization
+        self.view = memoryview(self.values)
+
+    def get(self, i, j):
+        return self.values[i * self.side + j]
+
+    def set(self, i, j, value):
+        self.values[i * self.side + j] = value
+
+    def is_given(self, i, j):
+        return bool(self.givens >> (i * self.side + j) & 1)
+
+    def set_given(self, i, j, given=True):
+        if given:
+            self.givens |= 1 << (i * self.side + j)
+        else:
+            self.givens &= ~(1 << (i * self.side + j))
+
+    def puzzle(self):
+        '''Return the given cells only (the puzzle without the player's answers) as bytes'''
+        return bytes(value if self.givens >> k & 1 else 0 for k, value in enumerate(self.values))
@@ -0,0 +1,320 @@
+import board_model
+
+
+class DLXSolver:
+    '''
+    Dancing Links (Algorithm X) solver, for any box size (the grid size is read from the grid)
+    Sudoku is treated as an exact cover problem: a row for every digit in every cell (729 for 9x9)
+    and 4 constraint columns per cell (cell filled, digit in row, digit in column, digit in box)
+    The links are kept in flat lists, node 0 is the root and the next nodes are column headers
+    '''
+
+    def __init__(self) -> None:
+        self._status_solving = False
+        self._status_solved = False
+        self._geometry = board_model.geometry()
+
+        # Search statistics of the last run
+        self.nodes = 0
+        self.backtracks = 0
+        self.candidates = 0
+
+        # The last run ended because _status_solving was turned off, not because the search was over
+        self.stopped = False
+
+    def solve(self, grid):
+        '''
+        Fill in the grid (a list of rows, or a flat buffer, 0 for empty cells) in place
+        Return True if a solution is found, False if there is none or solving was stopped
+        '''
+        self._status_solved = False
+        solutions = self._run(grid, 1, check_stop=True)
+
+        if not solutions:
+            return False
+
+        self._fill(grid, solutions[0])
+
+        self._status_solved = True
+        self._status_solving = False
+        return True
+
+    def steps(self, grid):
+        '''
+        Solve the grid one change at a time, as a generator yielding (i, j, value)
+        for every number placed, and (i, j, 0) for every number taken back
+        The grid is left untouched, _status_solved tells if a solution was found
+        '''
+        self._status_solved = False
+
+        if self._load(grid):
+            self._status_solved = yield from self._search_steps()
+
+    def count_solutions(self, grid, limit=2, check_stop=False):
+        '''
+        Count the solutions of the grid, stop counting once limit is reached
+        With check_stop, counting also ends early (with the count so far, and stopped set) once _status_solving is turned off
+        '''
+        return len(self._run(grid, limit, check_stop))
+
+    def all_solutions(self, grid, limit=None):
+        '''Return every solution of the grid (up to limit) as new grids'''
+        solutions = []
+
+        for rows in self._run(grid, limit):
+            side = self._geometry.side
+            solution = [[0] * side for i in range(side)]
+            self._fill(solution, rows)
+            solutions.append(solution)
+
+        return solutions
+
+    def _fill(self, grid, rows):
+        '''Write the chosen exact cover rows back into the grid'''
+        flat = board_model.flatten(grid) is grid
+        side = self._geometry.side
+
+        for row in rows:
+            cell, digit = divmod(row, side)
+            if flat:
+                grid[cell] = digit + 1
+            else:
+                grid[cell // side][cell % side] = digit + 1
+
+    def _build(self):
+        '''Link the column headers (324 for 9x9) and the 4 nodes of each row (729 for 9x9)'''
+        g = self._geometry
+        side, size = g.side, g.size
+        headers = 4 * size
+
+        self._left = L = list(range(-1, headers))
+        self._right = R = list(range(1, headers + 2))
+        L[0], R[headers] = headers, 0
+
+        self._up = U = list(range(headers + 1))
+        self._down = D = list(range(headers + 1))
+        self._column = C = list(range(headers + 1))
+        self._row = [-1] * (headers + 1)
+        self._size = [0] * (headers + 1)
+        self._row_start = []
+
+        for row in range(size * side):
+            cell, digit = divmod(row, side)
+
+            columns = (
+                1 + cell,
+                1 + size + g.row[cell] * side + digit,
+                1 + 2 * size + g.col[cell] * side + digit,
+                1 + 3 * size + g.box[cell] * side + digit,
+            )
+
+            first = len(C)
+            self._row_start.append(first)
+
+            for k, column in enumerate(columns):
+                node = first + k
+
+                # Horizontal links form a circle of the 4 nodes
+                L.append(first + (k - 1) % 4)
+                R.append(first + (k + 1) % 4)
+
+                # Vertical links: append the node at the bottom of its column
+                U.append(U[column])
+                D.append(column)
+                D[U[column]] = node
+                U[column] = node
+
+                C.append(column)
+                self._row.append(row)
+                self._size[column] += 1
+
+    def _cover(self, column):
+        L, R, U, D, C, S = self._left, self._right, self._up, self._down, self._column, self._size
+
+        R[L[column]] = R[column]
+        L[R[column]] = L[column]
+
+        i = D[column]
+        while i != column:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, column):
+        L, R, U, D, C, S = self._left, self._right, self._up, self._down, self._column, self._size
+
+        i = U[column]
+        while i != column:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+
+        R[L[column]] = column
+        L[R[column]] = column
+
+    def _run(self, grid, limit, check_stop=False):
+        '''Cover the given numbers, then collect up to limit solutions'''
+        self._solutions = []
+        self._limit = limit
+        self._check_stop = check_stop
+        self.stopped = False
+
+        if self._load(grid):
+            self._search()
+
+        return self._solutions
+
+    def _load(self, grid):
+        '''Link a new matrix and cover the given numbers, return False if they break Sudoku rule'''
+        cells = board_model.flatten(grid)
+        self._geometry = board_model.geometry_of(cells)
+        self._build()
+        self._solution = []
+        self.nodes = self.backtracks = self.candidates = 0
+
+        side = self._geometry.side
+        covered = set()
+
+        for cell, value in enumerate(cells):
+            if not value:
+                continue
+
+            if value > side:
+                return False
+
+            row = cell * side + value - 1
+            node = self._row_start[row]
+            columns = [self._column[node + k] for k in range(4)]
+
+            # The given numbers already break Sudoku rule
+            if covered.intersection(columns):
+                return False
+
+            covered.update(columns)
+            for column in columns:
+                self._cover(column)
+            self._solution.append(row)
+
+        return True
+
+    def _search(self):
+        '''
+        Algorithm X: pick the column with the fewest rows, try each of its rows
+        Return True once the search should end (enough solutions or stopped)
+        '''
+        if self._check_stop and not self._status_solving:
+            self.stopped = True
+            return True
+
+        self.nodes += 1
+        R, D, C, S = self._right, self._down, self._column, self._size
+
+        if R[0] == 0:
+            self._solutions.append(self._solution[:])
+            return self._limit is not None and len(self._solutions) >= self._limit
+
+        column = self._choose_column()
+
+        if S[column] == 0:
+            return False
+
+        self.candidates += S[column]
+        self._cover(column)
+
+        done = False
+        i = D[column]
+        while i != column:
+            self._solution.append(self._row[i])
+
+            j = R[i]
+            while j != i:
+                self._cover(C[j])
+                j = R[j]
+
+            done = self._search()
+
+            j = self._left[i]
+            while j != i:
+                self._uncover(C[j])
+                j = self._left[j]
+
+            self._solution.pop()
+
+            if done:
+                break
+
+            self.backtracks += 1
+            i = D[i]
+
+        self._uncover(column)
+        return done
+
+    def _choose_column(self):
+        '''Return the column with the fewest rows left'''
+        R, S = self._right, self._size
+
+        column, j = R[0], R[0]
+        while j != 0:
+            if S[j] < S[column]:
+                column = j
+                if S[j] <= 1:
+                    break
+            j = R[j]
+
+        return column
+
+    def _search_steps(self):
+        '''
+        Same search as _search for a single solution, yielding every change to the grid
+        Return True if a solution was found
+        '''
+        self.nodes += 1
+        R, D, C = self._right, self._down, self._column
+
+        if R[0] == 0:
+            return True
+
+        column = self._choose_column()
+
+        if self._size[column] == 0:
+            return False
+
+        self.candidates += self._size[column]
+        self._cover(column)
+
+        side = self._geometry.side
+        found = False
+        i = D[column]
+        while i != column:
+            cell, digit = divmod(self._row[i], side)
+            yield cell // side, cell % side, digit + 1
+
+            j = R[i]
+            while j != i:
+                self._cover(C[j])
+                j = R[j]
+
+            found = yield from self._search_steps()
+
+            j = self._left[i]
+            while j != i:
+                self._uncover(C[j])
+                j = self._left[j]
+
+            if found:
+                break
+
+            self.backtracks += 1
+            yield cell // side, cell % side, 0
+            i = D[i]
+
+        self._uncover(column)
+        return found
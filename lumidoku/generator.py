@@ -0,0 +1,134 @@
+import random, time
+import bitmask_solver, board_model, logic_solver
+
+
+class PuzzleGenerator:
+    '''
+    Build new puzzles without a network connection
+    A random complete grid is filled in, then clues are removed (in symmetric pairs)
+    as long as the puzzle keeps a unique solution
+    '''
+
+    # Number of clues to stop removing at, for each difficulty (of 81 cells, other sizes keep the same share)
+    _TARGET_CLUES = {
+        'Easy': 38,
+        'Medium': 30,
+        'Hard': 22,
+    }
+
+    # Smallest share of clues for large boards, checking uniqueness gets very slow below it
+    _MIN_CLUE_SHARE = {
+        4: 0.43,
+        5: 0.55,
+    }
+
+    # Seconds to keep trying new grids before settling for a puzzle graded differently, for each difficulty,
+    # a new grid is only started within it so a puzzle takes at most about one grid more
+    # About one 9x9 grid in three comes out Hard, so Hard gets enough time for a dozen or more
+    _TIME_BUDGET = {
+        'Easy': 0.05,
+        'Medium': 0.1,
+        'Hard': 0.4,
+    }
+
+    def __init__(self, seed=None) -> None:
+        self._random = random.Random(seed)
+        self._solver = bitmask_solver.BitmaskSolver()
+        self._grader = logic_solver.LogicSolver()
+
+    def generate(self, difficulty='Medium', box_size=3):
+        '''
+        Return a new puzzle (a list of rows, 9 of 9 numbers by default) with a unique solution, graded as difficulty if possible
+        Use generate_graded when the puzzle is labelled, it tells the difficulty the puzzle really has
+        '''
+        return self.generate_graded(difficulty, box_size)[0]
+
+    def generate_graded(self, difficulty='Medium', box_size=3):
+        '''
+        Return (puzzle, grade): a new puzzle as generate does, and the difficulty it was graded as,
+        which is another one when no grid graded as difficulty came within the time budget
+        '''
+        size = box_size ** 4
+        target = max(
+            round(self._TARGET_CLUES[difficulty] * size / 81),
+            round(self._MIN_CLUE_SHARE.get(box_size, 0) * size),
+        )
+
+        deadline = time.perf_counter() + self._TIME_BUDGET[difficulty]
+
+        while True:
+            grid = self._remove_clues(self._fill_grid(box_size), target)
+            grade = self.grade(grid)
+
+            if grade == difficulty or time.perf_counter() > deadline:
+                return grid, grade
+
+    def grade(self, grid):
+        '''Grade a puzzle by the hardest technique it needs, see logic_solver.TECHNIQUES'''
+        return self._grader.grade(grid)
+
+    def _remove_clues(self, grid, target):
+        '''Empty cells of a complete grid until target clues are left or no cell can go'''
+        side = len(grid)
+        clues = side * side
+
+        cells = [(i, j) for i in range(side) for j in range(side) if i * side + j <= (clues - 1) // 2]
+        self._random.shuffle(cells)
+
+        for i, j in cells:
+            if clues <= target:
+                break
+
+            # Remove a cell together with its mirror through the centre
+            pair = {(i, j), (side - 1 - i, side - 1 - j)}
+            removed = [(x, y, grid[x][y]) for x, y in pair]
+
+            for x, y, value in removed:
+                grid[x][y] = 0
+
+            if self._solver.count_solutions(grid, 2) == 1:
+                clues -= len(pair)
+            else:
+                for x, y, value in removed:
+                    grid[x][y] = value
+
+        return grid
+
+    def _fill_grid(self, box_size=3):
+        '''
+        Return a random complete grid: the three diagonal boxes don't share
+        any row or column, so they are shuffled freely and the solver does the rest
+        '''
+        if box_size != 3:
+            return self._shuffle_pattern(box_size)
+
+        grid = [[0] * 9 for i in range(9)]
+
+        for box in range(3):
+            digits = list(range(1, 10))
+            self._random.shuffle(digits)
+
+            for k, digit in enumerate(digits):
+                grid[box * 3 + k // 3][box * 3 + k % 3] = digit
+
+        self._solver._status_solving = True
+        self._solver.solve(grid)
+        return grid
+
+    def _shuffle_pattern(self, box_size):
+        '''
+        Return a random complete grid of any box size without searching:
+        a valid base pattern with its digits relabelled, its bands and stacks
+        and the rows and columns inside them shuffled
+        (the search is slow on large empty grids, and diagonal boxes can leave no solution for 4x4)
+        '''
+        n, side = box_size, box_size * box_size
+
+        def shuffled_lines():
+            return [band * n + line for band in self._random.sample(range(n), n) for line in self._random.sample(range(n), n)]
+
+        digits = self._random.sample(range(1, side + 1), side)
+        cols = shuffled_lines()
+        rows = shuffled_lines()
+
+        return [[digits[(n * (i % n) + i // n + j) % side] for j in cols] for i in rows]
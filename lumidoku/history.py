@@ -0,0 +1,70 @@
+import array
+
+
+class EditHistory:
+    '''
+    Unbounded undo and redo of player edits
+    An edit is stored as the cells it changed, 3 unsigned shorts each (cell index, old number, new number)
+    so a 25x25 board's 625 cells fit, thousands of edits take a few kilobytes and undo/redo only touch the cells of one edit
+    '''
+
+    def __init__(self) -> None:
+        self._undo = []
+        self._redo = []
+
+        # Changes of the open edit, checked by the board on every cell change
+        self._changes = array.array('H')
+        self.recording = False
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def begin(self):
+        '''Start collecting the changes of one edit, a multi-cell edit is undone in one go'''
+        self._changes = array.array('H')
+        self.recording = True
+
+    def record(self, index, old_value, value):
+        self._changes.extend((index, old_value, value))
+
+    def end(self):
+        '''Close the edit, it goes on the undo stack if it changed anything'''
+        if self._changes:
+            self.push(self._changes)
+            self._changes = array.array('H')
+
+        self.recording = False
+
+    def record_diff(self, before, after):
+        '''Push the difference between two flat grids of the same size as one edit'''
+        changes = array.array('H')
+
+        for index, value in enumerate(after):
+            if value != before[index]:
+                changes.extend((index, before[index], value))
+
+        if changes:
+            self.push(changes)
+
+    def push(self, changes):
+        self._undo.append(changes)
+        self._redo.clear()
+
+    def undo(self):
+        '''Take back the last edit, return the (cell index, number) pairs to set, latest change first'''
+        if not self._undo:
+            return []
+
+        changes = self._undo.pop()
+        self._redo.append(changes)
+        return [(changes[k], changes[k + 1]) for k in range(len(changes) - 3, -1, -3)]
+
+    def redo(self):
+        '''Apply the last undone edit again, return the (cell index, number) pairs to set'''
+        if not self._redo:
+            return []
+
+        changes = self._redo.pop()
+        self._undo.append(changes)
+        return [(changes[k], changes[k + 2]) for k in range(0, len(changes), 3)]
@@ -0,0 +1,124 @@
+import cProfile, json, math, time
+
+
+class Instrumentation:
+    '''
+    Frame timing histograms of the game loop sections, collected only while enabled
+    The game checks enabled once per section, so there is nothing to pay while it's off
+    '''
+
+    # Upper bounds (milliseconds) of the histogram buckets, the last one catches the rest
+    _BUCKETS = (0.5, 1, 2, 4, 8, 16, 33, 66)
+
+    SECTIONS = ('events', 'solver', 'draw_board', 'draw_interface', 'frame')
+
+    def __init__(self, keep_samples=False) -> None:
+        self.enabled = False
+        self._profile = None
+
+        # Keep every timing too, for exact percentiles (replay.py does, the overlay only needs the histograms)
+        self.keep_samples = keep_samples
+        self.clear()
+
+    def clear(self):
+        self.frames = 0
+        self._samples = {section: [] for section in self.SECTIONS}
+        self._histograms = {section: [0] * (len(self._BUCKETS) + 1) for section in self.SECTIONS}
+        self._totals = dict.fromkeys(self.SECTIONS, 0.0)
+        self._maximums = dict.fromkeys(self.SECTIONS, 0.0)
+        self._last = dict.fromkeys(self.SECTIONS, 0.0)
+
+    def toggle(self):
+        '''Turn collecting on or off, start from empty histograms when turned on'''
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.clear()
+
+    def record(self, section, seconds):
+        '''Add the time one section of a frame took'''
+        milliseconds = seconds * 1000
+        bucket = 0
+
+        while bucket < len(self._BUCKETS) and milliseconds > self._BUCKETS[bucket]:
+            bucket += 1
+
+        self._histograms[section][bucket] += 1
+        self._totals[section] += seconds
+        self._maximums[section] = max(self._maximums[section], seconds)
+        self._last[section] = seconds
+
+        if self.keep_samples:
+            self._samples[section].append(milliseconds)
+
+        if section == 'frame':
+            self.frames += 1
+
+    def summary(self, solver_stats=None):
+        '''Everything collected so far as a dict, ready for JSON'''
+        labels = [f'<={bound}ms' for bound in self._BUCKETS] + [f'>{self._BUCKETS[-1]}ms']
+
+        return {
+            'frames': self.frames,
+            'sections': {
+                section: {
+                    'mean_ms': self._totals[section] * 1000 / self.frames if self.frames else 0.0,
+                    'max_ms': self._maximums[section] * 1000,
+                    'histogram': dict(zip(labels, self._histograms[section])),
+                    **(self.percentiles(section) if self.keep_samples else {}),
+                }
+                for section in self.SECTIONS
+            },
+            'solver': solver_stats or {},
+        }
+
+    def percentiles(self, section, points=(50, 90, 99)):
+        '''Percentiles (milliseconds) of a section's kept timings, nearest rank, as a dict like {'p50': 1.2}'''
+        samples = sorted(self._samples[section])
+
+        if not samples:
+            return {f'p{point}': 0.0 for point in points}
+
+        return {f'p{point}': samples[max(0, math.ceil(len(samples) * point / 100) - 1)] for point in points}
+
+    def hud_lines(self, solver_stats):
+        '''Short text lines for the on-screen overlay'''
+        lines = [f'Frames: {self.frames} (last / mean / max)']
+
+        for section in self.SECTIONS:
+            mean = self._totals[section] * 1000 / self.frames if self.frames else 0.0
+            lines.append(f'{section}: {self._last[section] * 1000:.2f} / {mean:.2f} / {self._maximums[section] * 1000:.2f} ms')
+
+        lines.append(
+            f'{solver_stats.get("algorithm", "")}: {solver_stats.get("nodes", 0)} nodes, '
+            f'{solver_stats.get("backtracks", 0)} backtracks'
+        )
+        lines.append(
+            f'{solver_stats.get("candidates", 0)} candidates, '
+            f'{solver_stats.get("steps", 0)} steps, {solver_stats.get("seconds", 0.0):.3f}s'
+        )
+        return lines
+
+    def dump(self, solver_stats=None, path=None):
+        '''Write the summary to a JSON file, return its path'''
+        path = path or time.strftime('lumidoku_stats_%Y%m%d_%H%M%S.json')
+
+        with open(path, 'w') as file:
+            json.dump(self.summary(solver_stats), file, indent=2)
+
+        return path
+
+    def toggle_profile(self, path=None):
+        '''
+        Start a cProfile run, or stop the running one and save it
+        Return the path of the saved profile, None when a run was started
+        '''
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            return None
+
+        self._profile.disable()
+        path = path or time.strftime('lumidoku_%Y%m%d_%H%M%S.prof')
+        self._profile.dump_stats(path)
+        self._profile = None
+        return path
@@ -0,0 +1,535 @@
+'''
+Logic solver: solves puzzles the way a person does, one technique at a time and without guessing
+Tells which techniques a puzzle needs, grades it from the hardest one, and finds hints
+Grade a puzzle file:
+
+Usage: python logic_solver.py puzzles.txt [-o grades.txt]
+'''
+
+import collections, functools, itertools, sys, time
+
+import board_model
+
+
+# Techniques from the simplest to the hardest, with the difficulty of a puzzle that needs them
+TECHNIQUES = {
+    'Naked Single': 'Easy',
+    'Hidden Single': 'Medium',
+    'Pointing': 'Medium',
+    'Claiming': 'Medium',
+    'Naked Pair': 'Hard',
+    'Hidden Pair': 'Hard',
+    'Naked Triple': 'Hard',
+    'Hidden Triple': 'Hard',
+    'X-Wing': 'Hard',
+}
+
+_ORDER = {technique: k for k, technique in enumerate(TECHNIQUES)}
+
+
+class _Contradiction(Exception):
+    '''The grid broke Sudoku rule, some cell or digit has no place left'''
+
+
+class _Tables:
+    '''
+    Lookups of one box size: the units of every cell with the cell's bit in each
+    (bit k of a unit's places is its k-th cell, so the places in a row are columns and those in a column are rows),
+    the positions of each row and column inside a box, and of each box along a row or column
+    '''
+
+    def __init__(self, box_size) -> None:
+        g = board_model.geometry(box_size)
+        n, side = box_size, g.side
+
+        # Units are numbered like Geometry.units: rows, then columns, then boxes
+        self.cell_units = [
+            (
+                (g.row[cell], 1 << g.col[cell]),
+                (side + g.col[cell], 1 << g.row[cell]),
+                (2 * side + g.box[cell], 1 << g.boxes[g.box[cell]].index(cell)),
+            )
+            for cell in range(g.size)
+        ]
+
+        self.box_row = [sum(1 << (r * n + c) for c in range(n)) for r in range(n)]
+        self.box_col = [sum(1 << (r * n + c) for r in range(n)) for c in range(n)]
+        self.segment = [sum(1 << (s * n + k) for k in range(n)) for s in range(n)]
+
+
+@functools.lru_cache(maxsize=None)
+def _tables(box_size):
+    return _Tables(box_size)
+
+
+class LogicSolver:
+    '''
+    Keeps the candidates of every cell as integers with one bit per digit, and the places left for every digit
+    in every row, column and box as integers with one bit per cell of the unit, both updated on every change,
+    and always applies the simplest technique that makes progress
+    Each technique only looks again at the units that changed since it last found nothing, see _changed_units
+    Works for any box size, the grid size is read from the grid
+    A step is (technique, placements, eliminations), both lists of (cell, digit)
+    '''
+
+    def __init__(self) -> None:
+        self._geometry = board_model.geometry()
+        self._tables = _tables(3)
+        self._bits = []
+        self._values = []
+        self._candidates = []
+        self._places = None
+        self._placed = None
+
+        # Step count, the step every unit last changed at, and the step up to which each technique found nothing
+        self._clock = 0
+        self._changed = []
+        self._checked = {}
+
+        self._finders = (
+            self._naked_singles,
+            self._hidden_singles,
+            self._pointing,
+            self._claiming,
+            functools.partial(self._naked_subsets, 2, 'Naked Pair'),
+            functools.partial(self._hidden_subsets, 2, 'Hidden Pair'),
+            functools.partial(self._naked_subsets, 3, 'Naked Triple'),
+            functools.partial(self._hidden_subsets, 3, 'Hidden Triple'),
+            self._x_wing,
+        )
+
+    def analyze(self, grid):
+        '''
+        Solve the grid (a list of rows or a flat buffer) with logic only, return a report:
+            solved      True if the techniques alone fill in every cell
+            techniques  how many times each technique was used, simplest first
+            difficulty  'Easy', 'Medium' or 'Hard' from the hardest technique needed,
+                        'Hard' as well when logic alone isn't enough
+        '''
+        used = collections.Counter()
+        solved = False
+
+        try:
+            if self._load(grid):
+                for technique, placements, eliminations in self._steps():
+                    used[technique] += len(placements) or 1
+                solved = 0 not in self._values
+        except _Contradiction:
+            pass
+
+        techniques = {technique: used[technique] for technique in TECHNIQUES if used[technique]}
+
+        if solved:
+            difficulty = max((TECHNIQUES[technique] for technique in techniques), key=('Easy', 'Medium', 'Hard').index, default='Easy')
+        else:
+            difficulty = 'Hard'
+
+        return {'solved': solved, 'techniques': techniques, 'difficulty': difficulty}
+
+    def grade(self, grid):
+        return self.analyze(grid)['difficulty']
+
+    def hint(self, grid):
+        '''
+        Find the next number that can be placed by logic
+        Return (i, j, value, technique), technique being the hardest one needed to find it,
+        or None if logic alone can't place another number or the grid breaks Sudoku rule
+        '''
+        hardest = None
+
+        try:
+            if not self._load(grid):
+                return None
+
+            for technique, placements, eliminations in self._steps():
+                if hardest is None or _ORDER[technique] > _ORDER[hardest]:
+                    hardest = technique
+
+                if placements:
+                    cell, digit = placements[0]
+                    return cell // self._geometry.side, cell % self._geometry.side, digit, hardest
+        except _Contradiction:
+            pass
+
+        return None
+
+    def _load(self, grid):
+        '''Fill in the given numbers, return False if they break Sudoku rule'''
+        cells = board_model.flatten(grid)
+        self._geometry = g = board_model.geometry_of(cells)
+        self._tables = _tables(g.box_size)
+        self._bits = [1 << k for k in range(g.side)]
+        self._values = [0] * g.size
+        self._candidates = candidates = [g.all_digits] * g.size
+
+        self._clock = 1
+        self._changed = [1] * len(g.units)
+        self._checked = {}
+
+        # Counted when a technique first needs them, Naked Singles alone never do
+        self._places = None
+        self._placed = None
+
+        for cell, value in enumerate(cells):
+            if value:
+                if value > g.side or not candidates[cell] & self._bits[value - 1]:
+                    return False
+                self._place(cell, value)
+
+        return True
+
+    def _unit_places(self):
+        '''The places of every digit in every unit, counted the first time and kept up to date by every change after'''
+        if self._places is not None:
+            return self._places
+
+        g = self._geometry
+        candidates = self._candidates
+        self._places = places = [[0] * g.side for unit in g.units]
+        self._placed = [0] * len(g.units)
+
+        for cell, ((row, row_bit), (col, col_bit), (box, box_bit)) in enumerate(self._tables.cell_units):
+            if value := self._values[cell]:
+                bit = self._bits[value - 1]
+                self._placed[row] |= bit
+                self._placed[col] |= bit
+                self._placed[box] |= bit
+                continue
+
+            row_places, col_places, box_places = places[row], places[col], places[box]
+            mask = candidates[cell]
+
+            while mask:
+                lowest = mask & -mask
+                mask ^= lowest
+                d = lowest.bit_length() - 1
+                row_places[d] |= row_bit
+                col_places[d] |= col_bit
+                box_places[d] |= box_bit
+
+        return places
+
+    def _place(self, cell, digit):
+        bit = self._bits[digit - 1]
+        candidates, places, changed, clock = self._candidates, self._places, self._changed, self._clock
+        cell_units = self._tables.cell_units
+
+        self._values[cell] = digit
+
+        if places is None:
+            candidates[cell] = 0
+            keep = ~bit
+            for peer in self._geometry.peers[cell]:
+                candidates[peer] &= keep
+            return
+
+        # The cell leaves the places of all its candidates, in its three units
+        mask = candidates[cell]
+        candidates[cell] = 0
+
+        for unit, unit_bit in cell_units[cell]:
+            unit_places = places[unit]
+            keep = ~unit_bit
+            left = mask
+
+            while left:
+                lowest = left & -left
+                left ^= lowest
+                unit_places[lowest.bit_length() - 1] &= keep
+
+            self._placed[unit] |= bit
+            changed[unit] = clock
+
+        # The digit leaves its peers, and their places in all their units
+        d = digit - 1
+        for peer in self._geometry.peers[cell]:
+            if candidates[peer] & bit:
+                candidates[peer] ^= bit
+                for unit, unit_bit in cell_units[peer]:
+                    places[unit][d] &= ~unit_bit
+                    changed[unit] = clock
+
+    def _eliminate(self, cell, digit):
+        bit = self._bits[digit - 1]
+
+        if not self._candidates[cell] & bit:
+            return
+
+        self._candidates[cell] ^= bit
+        if self._places is None:
+            return
+
+        for unit, unit_bit in self._tables.cell_units[cell]:
+            self._places[unit][digit - 1] &= ~unit_bit
+            self._changed[unit] = self._clock
+
+    def _changed_units(self, technique, units):
+        '''The units among units that changed since technique last found nothing, the others can't have anything new'''
+        # Changes are only stamped once the places are kept
+        self._unit_places()
+        since = self._checked.get(technique, 0)
+        return [unit for unit in units if self._changed[unit] > since]
+
+    def _found_nothing(self, technique):
+        self._checked[technique] = self._clock
+
+    def _steps(self):
+        '''Apply the simplest technique that makes progress until the grid is full or nothing works, yielding every step'''
+        while 0 in self._values:
+            for finder in self._finders:
+                if step := finder():
+                    break
+            else:
+                return
+
+            technique, placements, eliminations = step
+            self._clock += 1
+
+            for cell, digit in placements:
+                if self._values[cell] == digit:
+                    continue
+                if not self._candidates[cell] & self._bits[digit - 1]:
+                    raise _Contradiction
+                self._place(cell, digit)
+
+            for cell, digit in eliminations:
+                self._eliminate(cell, digit)
+
+            yield step
+
+    def _naked_singles(self):
+        '''Cells with only one candidate left, all of them at once'''
+        g = self._geometry
+        placements = []
+
+        for cell, (value, mask) in enumerate(zip(self._values, self._candidates)):
+            if value or mask & (mask - 1):
+                continue
+
+            if not mask:
+                raise _Contradiction
+
+            placements.append((cell, g.bit_to_digit[mask]))
+
+        return placements and ('Naked Single', placements, [])
+
+    def _hidden_singles(self):
+        '''Digits with only one place left in a row, column or box, all of them at once'''
+        g = self._geometry
+        found = {}
+
+        for unit in self._changed_units('Hidden Single', range(len(g.units))):
+            placed = self._placed[unit]
+
+            for d, where in enumerate(self._places[unit]):
+                if where & (where - 1):
+                    continue
+
+                if not where:
+                    if not placed & self._bits[d]:
+                        raise _Contradiction
+                    continue
+
+                cell = g.units[unit][where.bit_length() - 1]
+
+                if found.setdefault(cell, d + 1) != d + 1:
+                    raise _Contradiction
+
+        if not found:
+            self._found_nothing('Hidden Single')
+
+        return found and ('Hidden Single', list(found.items()), [])
+
+    def _pointing(self):
+        '''A digit confined to one row or column inside a box can go nowhere else in that row or column'''
+        g, t = self._geometry, self._tables
+        n, side = g.box_size, g.side
+        places = self._unit_places()
+
+        # Only the box matters: the lines around it can only lose candidates
+        for unit in self._changed_units('Pointing', range(2 * side, 3 * side)):
+            box = unit - 2 * side
+            band, stack = box // n, box % n
+
+            for d, where in enumerate(places[unit]):
+                if not where & (where - 1):
+                    continue
+
+                first = where.bit_length() - 1
+
+                if not where & ~t.box_row[first // n]:
+                    row = band * n + first // n
+                    outside = places[row][d] & ~t.segment[stack]
+                    if outside:
+                        return 'Pointing', [], [(row * side + col, d + 1) for col in range(side) if outside >> col & 1]
+
+                if not where & ~t.box_col[first % n]:
+                    col = stack * n + first % n
+                    outside = places[side + col][d] & ~t.segment[band]
+                    if outside:
+                        return 'Pointing', [], [(row * side + col, d + 1) for row in range(side) if outside >> row & 1]
+
+        self._found_nothing('Pointing')
+        return None
+
+    def _claiming(self):
+        '''A digit confined to one box inside a row or column can go nowhere else in that box'''
+        g, t = self._geometry, self._tables
+        n, side = g.box_size, g.side
+        places = self._unit_places()
+
+        for unit in self._changed_units('Claiming', range(2 * side)):
+            is_row = unit < side
+            line = unit if is_row else unit - side
+
+            for d, where in enumerate(places[unit]):
+                if not where & (where - 1):
+                    continue
+
+                segment = (where.bit_length() - 1) // n
+                if where & ~t.segment[segment]:
+                    continue
+
+                if is_row:
+                    box = (line // n) * n + segment
+                    outside = places[2 * side + box][d] & ~t.box_row[line % n]
+                else:
+                    box = segment * n + line // n
+                    outside = places[2 * side + box][d] & ~t.box_col[line % n]
+
+                if outside:
+                    return 'Claiming', [], [(cell, d + 1) for k, cell in enumerate(g.boxes[box]) if outside >> k & 1]
+
+        self._found_nothing('Claiming')
+        return None
+
+    def _naked_subsets(self, size, technique):
+        '''size cells of a unit sharing only size candidates take those digits from the rest of the unit'''
+        candidates = self._candidates
+        g = self._geometry
+
+        for unit in self._changed_units(technique, range(len(g.units))):
+            cells = [cell for cell in g.units[unit] if 2 <= candidates[cell].bit_count() <= size]
+
+            for subset in itertools.combinations(cells, size):
+                mask = 0
+                for cell in subset:
+                    mask |= candidates[cell]
+
+                if mask.bit_count() != size:
+                    continue
+
+                eliminations = [
+                    (cell, digit) for cell in g.units[unit] if cell not in subset
+                    for digit, bit in enumerate(self._bits, 1) if candidates[cell] & mask & bit
+                ]
+                if eliminations:
+                    return technique, [], eliminations
+
+        self._found_nothing(technique)
+        return None
+
+    def _hidden_subsets(self, size, technique):
+        '''size digits with only the same size places in a unit clear every other candidate of those cells'''
+        candidates = self._candidates
+        g = self._geometry
+
+        for unit in self._changed_units(technique, range(len(g.units))):
+            # Places of each digit in the unit, for the digits with 2 to size places
+            places = {self._bits[d]: where for d, where in enumerate(self._places[unit]) if 2 <= where.bit_count() <= size}
+
+            for subset in itertools.combinations(places, size):
+                where = digits = 0
+                for bit in subset:
+                    where |= places[bit]
+                    digits |= bit
+
+                if where.bit_count() != size:
+                    continue
+
+                eliminations = [
+                    (cell, digit) for k, cell in enumerate(g.units[unit]) if where >> k & 1
+                    for digit, bit in enumerate(self._bits, 1) if candidates[cell] & ~digits & bit
+                ]
+                if eliminations:
+                    return technique, [], eliminations
+
+        self._found_nothing(technique)
+        return None
+
+    def _x_wing(self):
+        '''
+        A digit with only the same two places in two rows can go nowhere else in those two columns,
+        and the same with rows and columns swapped
+        '''
+        g = self._geometry
+        side = g.side
+        places = self._unit_places()
+
+        for d in range(side):
+            for lines, crossing in ((0, side), (side, 0)):
+                pairs = {}
+
+                for k in range(side):
+                    where = places[lines + k][d]
+
+                    if where.bit_count() != 2:
+                        continue
+
+                    if where not in pairs:
+                        pairs[where] = k
+                        continue
+
+                    # Places along the two crossing lines, outside the two base lines
+                    base = 1 << k | 1 << pairs[where]
+                    eliminations = [
+                        (line * side + other if lines == 0 else other * side + line, d + 1)
+                        for other in range(side) if where >> other & 1
+                        for line in range(side) if (places[crossing + other][d] & ~base) >> line & 1
+                    ]
+                    if eliminations:
+                        return 'X-Wing', [], eliminations
+
+        return None
+
+
+def main(argv=None):
+    # Only the command line needs argparse, the game and sudoku_core import this module too
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Grade Sudoku puzzles by the techniques they need')
+    parser.add_argument('puzzles', help='text file with one puzzle per line (81 characters for 9x9), - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='where to write the grades, - for stdout')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.puzzles == '-' else open(args.puzzles)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    solver = LogicSolver()
+    counter = collections.Counter()
+    start = time.perf_counter()
+
+    try:
+        for line in source:
+            if (grid := board_model.parse_cells(line)) is None:
+                continue
+
+            report = solver.analyze(grid)
+            techniques = ', '.join(f'{technique} x{count}' for technique, count in report['techniques'].items())
+            output.write(f'{board_model.format_cells(grid)}\t{report["difficulty"]}\t{techniques}\n')
+            counter[report['difficulty']] += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(counter.values())
+    summary = ', '.join(f'{difficulty}: {counter[difficulty]}' for difficulty in ('Easy', 'Medium', 'Hard'))
+
+    print(f'{total} puzzles in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s) - {summary}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
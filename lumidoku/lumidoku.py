@@ -1,5 +1,6 @@
+import multiprocessing, os, time
 import pygame
-import sudoku_board
+import sudoku_board, instrumentation, replay
 
 
 class Game:
@@ -18,29 +19,72 @@ class Game:
     _BUTTON_WIDTH, _BUTTON_HEIGHT = 400, 75
     _BUTTON_GAP = 10
 
-    def __init__(self):
+    # Milliseconds to sleep waiting for events while nothing is animating
+    _IDLE_TIMEOUT = 100
+
+    # Seconds between two refreshes of the instrumentation overlay
+    _HUD_INTERVAL = 0.25
+
+    def __init__(self, fps=60, recorder=None, player=None):
         
         pygame.init()
 
+        # The input of every frame can be written to a file (replay.InputRecorder),
+        # or read from one instead of the window (replay.InputPlayer), mouse position included
+        self._recorder = recorder
+        self._player = player
+        self._mouse_pos = player.mouse_pos if player else pygame.mouse.get_pos
+
+        # Frame rate cap while the board is solving or fetching
+        self._fps = fps
+        self._clock = pygame.time.Clock()
+
         self.screen = pygame.display.set_mode((self._SCREEN_WIDTH, self._SCREEN_HEIGHT))
 
         self._board = sudoku_board.Board(
             (self._SCREEN_WIDTH, self._SCREEN_HEIGHT),
             cell_size=70, small_gap=2, big_gap=6,
+            # Keep solved puzzles between runs when a file is given
+            cache_path=os.environ.get('LUMIDOKU_SOLUTION_CACHE'),
+            # Fetch puzzles from another server, such as a local puzzle_server.py
+            api_url=os.environ.get('LUMIDOKU_API_URL'),
+            # Or play offline from a puzzle pack (see puzzle_pack.py), replayed puzzles come from the recording
+            puzzle_source='external' if player else 'pack' if os.environ.get('LUMIDOKU_PUZZLE_PACK') else 'api',
+            pack_path=os.environ.get('LUMIDOKU_PUZZLE_PACK'),
+            mouse_pos=self._mouse_pos,
         )
         
         self._LARGE_FONT = pygame.font.SysFont(None, 60)
         self._SMALL_FONT = pygame.font.SysFont(None, 40)
+        self._HUD_FONT = pygame.font.SysFont(None, 24)
 
         self._left_align = (self._SCREEN_WIDTH + self._SCREEN_HEIGHT - self._BUTTON_WIDTH) // 2
         self._button_vertical_spacing = self._BUTTON_HEIGHT + self._BUTTON_GAP
         self._bottom_align = self._SCREEN_HEIGHT - self._board._PADDING
         self._message_vertical_spacing = self._BUTTON_HEIGHT / 2
 
-        # Register rects for buttons, to check for mouse input later
+        # Everything right of the board, redrawn only when the board status or messages change
+        self._panel_rect = pygame.Rect(
+            self._board._board_border_rect.right, 0,
+            self._SCREEN_WIDTH - self._board._board_border_rect.right, self._SCREEN_HEIGHT
+        )
+
+        # The whole window is drawn and pushed to the display only when needed,
+        # otherwise only the rects that changed are
+        self._redraw_all = True
+
+        # What the side panel showed when it was last drawn
+        self._interface_state = None
+
+        # Pre-rendered buttons keyed by (board_status, label),
+        # and the last rendered difficulty and message texts
+        self._button_surfaces = {}
+        self._message_surfaces = {}
+
+        # Register rects and click handlers for buttons, to check for mouse input later
         self._button_rects = []
 
-        for i in range(4):
+        for i, execute in enumerate((self.auto_button, self.reset_button, self.user_input_button, self.get_more_puzzles)):
             rect = pygame.Rect(
                 self._left_align,
                 self._board._PADDING + i * self._button_vertical_spacing,
@@ -48,23 +92,50 @@ class Game:
             )
             self._button_rects.append({
                 'rect': rect,
-                'execute': None
+                'execute': execute
             })
 
+        # Frame timing and solver statistics, shown between the buttons and the messages (F3)
+        self._instrumentation = instrumentation.Instrumentation()
+        self._hud_rect = pygame.Rect(
+            self._left_align,
+            self._board._PADDING + 4 * self._button_vertical_spacing,
+            self._BUTTON_WIDTH,
+            self._bottom_align - 2 * self._message_vertical_spacing - self._board._PADDING - 4 * self._button_vertical_spacing
+        )
+        self._hud_surface = None
+        self._hud_rendered = 0.0
+
     def draw_interface(self, board_status):
-        '''Draw interface elements (buttons and messages)'''
+        '''
+        Draw interface elements (buttons and messages) if anything changed since last frame
+        Return the list of rects that need to be updated on the display
+        '''
+        state = (board_status, self._board.message, self._board.difficulty)
+
+        if state == self._interface_state:
+            return []
+
+        self._interface_state = state
+
+        self.screen.fill(self._PALETTE['white'], self._panel_rect)
         self.draw_auto_button(board_status)
         self.draw_reset_button(board_status)
         self.draw_user_input_button(board_status)
         self.draw_get_more_puzzles_button(board_status)
         self.draw_message()
+        return [self._panel_rect]
+
+    def redraw_interface(self):
+        '''Draw the side panel again on the next frame'''
+        self._interface_state = None
     
     def draw_board(self, screen):
-        self._board.draw(screen)
+        return self._board.draw(screen)
 
     def handle_buttons(self, board_status):
         if not self._board._status_fetching:
-            mouse = pygame.mouse.get_pos()
+            mouse = self._mouse_pos()
 
             for button in self._button_rects:
                 if button['rect'].collidepoint(mouse):
@@ -73,64 +144,108 @@ class Game:
     def handle_events(self, events):
         self._board.handle_events(events)
 
+    def draw_hud(self, force=False):
+        '''
+        Draw the instrumentation overlay, refreshed every _HUD_INTERVAL seconds
+        Return the list of rects that need to be updated on the display
+        A replay collects timings without the overlay, it would be timed too
+        '''
+        if not self._instrumentation.enabled or self._player:
+            return []
+
+        if time.perf_counter() - self._hud_rendered > self._HUD_INTERVAL:
+            self._hud_rendered = time.perf_counter()
+            self._hud_surface = pygame.Surface(self._hud_rect.size)
+            self._hud_surface.fill(self._PALETTE['white'])
+
+            lines = self._instrumentation.hud_lines(self._board.solver_stats())
+            line_height = self._HUD_FONT.get_linesize()
+
+            for k, line in enumerate(lines):
+                self._hud_surface.blit(self._HUD_FONT.render(line, True, self._PALETTE['black']), (0, k * line_height))
+
+        elif not force:
+            return []
+
+        self.screen.blit(self._hud_surface, self._hud_rect)
+        return [self._hud_rect]
+
+    def handle_instrumentation_keys(self, event):
+        '''F3 toggles the overlay, F4 saves statistics to JSON, F5 starts or stops a cProfile run'''
+        if event.key == pygame.K_F3:
+            self._instrumentation.toggle()
+            self._hud_rendered = 0.0
+
+            # Clear the overlay from the side panel
+            if not self._instrumentation.enabled:
+                self.redraw_interface()
+
+        elif event.key == pygame.K_F4:
+            self._instrumentation.dump(self._board.solver_stats())
+            self._board.message = 'Statistics Saved'
+
+        elif event.key == pygame.K_F5:
+            if self._instrumentation.toggle_profile():
+                self._board.message = 'Profile Saved'
+            else:
+                self._board.message = 'Profiling...'
+
+    def wait_events(self):
+        '''
+        Sleep until an event comes in (or the idle timeout passes) while the board is idle,
+        keep a capped frame rate while it's solving or fetching
+        A replay doesn't wait at all, the next recorded frame comes straight away
+        '''
+        if self._player:
+            return self._player.next_events(self._board)
+
+        if self._redraw_all:
+            return pygame.event.get()
+
+        if self._board.get_status() in ('solving', 'fetching'):
+            self._clock.tick(self._fps)
+            return pygame.event.get()
+
+        event = pygame.event.wait(self._IDLE_TIMEOUT)
+        events = [event] if event.type != pygame.NOEVENT else []
+        return events + pygame.event.get()
+
     def draw_auto_button(self, board_status, pos=0):
-        button_rect = self._button_rects[pos]['rect']
         color = self._PALETTE['black'] if board_status == 'normal' else self._PALETTE['grey']
-        
-        pygame.draw.rect(self.screen, color, button_rect, 5, 100)
-        
-        buttonText = self._LARGE_FONT.render('Solve', True, color)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = button_rect.center
-        self.screen.blit(buttonText, buttonTextRect)
-        
-        self._button_rects[pos]['execute'] = self.auto_button
+        self.draw_button(board_status, pos, 'Solve', color)
 
     def draw_reset_button(self, board_status, pos=1):
-        button_rect = self._button_rects[pos]['rect']
-        
         color = self._PALETTE['black'] if board_status in ('normal', 'solving', 'solved') else self._PALETTE['grey']
-        
-        pygame.draw.rect(self.screen, color, button_rect, 5, 100)
-        
         text_to_render = 'Stop' if board_status == 'solving' else 'Reset'
-        buttonText = self._LARGE_FONT.render(text_to_render, True, color)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = button_rect.center
-        
-        self.screen.blit(buttonText, buttonTextRect)
-        
-        self._button_rects[pos]['execute'] = self.reset_button
+        self.draw_button(board_status, pos, text_to_render, color)
 
     def draw_user_input_button(self, board_status, pos=2):
-        button_rect = self._button_rects[pos]['rect']
-
         color = self._PALETTE['black'] if board_status in ('normal', 'user', 'solved') else self._PALETTE['grey']
-        
-        pygame.draw.rect(self.screen, color, button_rect, 5, 100)
-        
         text_to_render = 'Custom Puzzle' if board_status != 'user' else 'Play'
-        buttonText = self._LARGE_FONT.render(text_to_render, True, color)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = button_rect.center
-        
-        self.screen.blit(buttonText, buttonTextRect)
-        
-        self._button_rects[pos]['execute'] = self.user_input_button
+        self.draw_button(board_status, pos, text_to_render, color)
 
     def draw_get_more_puzzles_button(self, board_status, pos=3):
+        color = self._PALETTE['black'] if board_status in ('normal', 'solved') else self._PALETTE['grey']
+        self.draw_button(board_status, pos, 'New puzzle', color)
+
+    def draw_button(self, board_status, pos, label, color):
+        '''Blit a button, rendering it the first time it shows up with this status and label'''
         button_rect = self._button_rects[pos]['rect']
 
-        color = self._PALETTE['black'] if board_status in ('normal', 'solved') else self._PALETTE['grey']
-        pygame.draw.rect(self.screen, color, button_rect, 5, 100)
-        
-        buttonText = self._LARGE_FONT.render('New puzzle', True, color)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = button_rect.center
-        
-        self.screen.blit(buttonText, buttonTextRect)
-        
-        self._button_rects[pos]['execute'] = self.get_more_puzzles
+        if (key := (board_status, label)) not in self._button_surfaces:
+            surface = pygame.Surface(button_rect.size)
+            surface.fill(self._PALETTE['white'])
+
+            pygame.draw.rect(surface, color, surface.get_rect(), 5, 100)
+
+            buttonText = self._LARGE_FONT.render(label, True, color)
+            buttonTextRect = buttonText.get_rect()
+            buttonTextRect.center = surface.get_rect().center
+            surface.blit(buttonText, buttonTextRect)
+
+            self._button_surfaces[key] = surface
+
+        self.screen.blit(self._button_surfaces[key], button_rect)
 
     def draw_message(self):
         '''Draw the difficulty of puzzle and its status message (if any)'''
@@ -142,7 +257,7 @@ class Game:
                     self._BUTTON_WIDTH, self._message_vertical_spacing
                 )
             
-            text = self._SMALL_FONT.render(self._board.difficulty, True, self._PALETTE['red'])
+            text = self.render_message('difficulty', self._board.difficulty)
             textRect = text.get_rect()
             textRect.center = rect.center
             self.screen.blit(text, textRect)
@@ -154,10 +269,17 @@ class Game:
                     self._BUTTON_WIDTH, self._message_vertical_spacing
                 )
             
-            text = self._SMALL_FONT.render(self._board.message, True, self._PALETTE['red'])
+            text = self.render_message('message', self._board.message)
             textRect = text.get_rect()
             textRect.center = rect.center
             self.screen.blit(text, textRect)
+
+    def render_message(self, slot, message):
+        '''Render a message text only when it differs from the last one shown in its slot'''
+        if self._message_surfaces.get(slot, (None,))[0] != message:
+            self._message_surfaces[slot] = (message, self._SMALL_FONT.render(message, True, self._PALETTE['red']))
+
+        return self._message_surfaces[slot][1]
     
     def auto_button(self, board_status):
         '''Call the algorithm to solve the puzzle'''
@@ -188,19 +310,58 @@ class Game:
     def main_loop(self):
 
         while True:
-            events = pygame.event.get()
-                
-            self.screen.fill(self._PALETTE['white'])
+            events = self.wait_events()
+
+            if self._recorder:
+                self._recorder.record(events, self._mouse_pos(), self._board)
+
+            # Only time the frame sections while instrumentation is on
+            timing = self._instrumentation.enabled
+            if timing:
+                frame_start = time.perf_counter()
+
+            redraw_all, self._redraw_all = self._redraw_all, False
+
+            if redraw_all:
+                self.screen.fill(self._PALETTE['white'])
+                self._board.redraw_all()
+                self.redraw_interface()
 
             # Board status will determine which buttons would function
             board_status = self._board.get_status()
             
             # Handle mousehover and click to insert number
             self.handle_events(events)
+
+            if timing:
+                events_end = time.perf_counter()
+                self._instrumentation.record('events', events_end - frame_start)
+
+            # Run the solving algorithm for this frame, if it's running
+            self._board.advance_solver()
+
+            # Show the result of the custom puzzle check once it's in, and load a fetched puzzle
+            self._board.poll_solution_check()
+            self._board.poll_fetched()
+
+            if timing:
+                solver_end = time.perf_counter()
+                self._instrumentation.record('solver', solver_end - events_end)
             
-            self.draw_board(self.screen)
+            dirty_rects = self.draw_board(self.screen)
+
+            if timing:
+                board_end = time.perf_counter()
+                self._instrumentation.record('draw_board', board_end - solver_end)
             
-            self.draw_interface(board_status)
+            interface_rects = self.draw_interface(board_status)
+            dirty_rects += interface_rects
+
+            if timing:
+                self._instrumentation.record('draw_interface', time.perf_counter() - board_end)
+
+            # The side panel was drawn again over the overlay
+            dirty_rects += self.draw_hud(force=bool(interface_rects))
             
             for event in events:
                 if event.type == pygame.QUIT:
@@ -209,14 +370,37 @@ class Game:
                 
                 elif event.type == pygame.MOUSEBUTTONUP:
                     self.handle_buttons(board_status)
+
+                # The window was covered or restored, so everything has to be drawn again
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self._redraw_all = True
+
+                # A replay keeps its own timings, whatever keys were recorded
+                elif event.type == pygame.KEYUP and not self._player:
+                    self.handle_instrumentation_keys(event)
             
-            pygame.display.update()
+            if redraw_all:
+                pygame.display.update()
+            else:
+                pygame.display.update(dirty_rects)
+
+            if timing:
+                self._instrumentation.record('frame', time.perf_counter() - frame_start)
 
 
 def main():
-    game = Game()
-    game.main_loop()
+    # Record the input of the session to replay it later (see replay.py)
+    recorder = replay.InputRecorder(path) if (path := os.environ.get('LUMIDOKU_RECORD')) else None
+
+    try:
+        game = Game(recorder=recorder)
+        game.main_loop()
+    finally:
+        if recorder:
+            recorder.close()
 
 
 if __name__ == '__main__':
+    # Solver processes need this in the frozen executable
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
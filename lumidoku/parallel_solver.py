@@ -0,0 +1,276 @@
+'''
+Parallel search for single hard puzzles
+The top of the search tree is expanded here (see BitmaskSolver.split) and its branches are searched
+on a pool of processes, one core each. The first solution found stops every other branch,
+solution counts are added up across branches
+'''
+
+import multiprocessing, os, threading, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import bitmask_solver, board_model, dlx_solver
+
+
+_SOLVERS = {
+    'Bitmask': bitmask_solver.BitmaskSolver,
+    'DLX': dlx_solver.DLXSolver,
+}
+
+# Solvers of the current worker process, by algorithm, and the event that stops them all
+_solvers = {}
+_stop = None
+
+
+def _stoppable(solver_class, stop):
+    '''A solver whose _status_solving follows the shared stop event, so the parent can end a search in any process'''
+
+    class StoppableSolver(solver_class):
+
+        @property
+        def _status_solving(self):
+            return not stop.is_set()
+
+        @_status_solving.setter
+        def _status_solving(self, value):
+            pass
+
+    return StoppableSolver()
+
+
+def _init_worker(stop):
+    global _solvers, _stop
+    _stop = stop
+    _solvers = {algorithm: _stoppable(solver_class, stop) for algorithm, solver_class in _SOLVERS.items()}
+
+
+def _stats(solver):
+    return {'nodes': solver.nodes, 'backtracks': solver.backtracks, 'candidates': solver.candidates}
+
+
+def _search_part(algorithm, part, limit):
+    '''
+    Worker process: search one branch, return (solutions, stats)
+    solutions is a list holding the solution grid when limit is 1, or the number of solutions found (up to limit)
+    '''
+    solver = _solvers[algorithm]
+
+    if _stop.is_set():
+        return ([] if limit == 1 else 0), _stats(solver)
+
+    if limit == 1:
+        grid = bytearray(part)
+        return ([bytes(grid)] if solver.solve(grid) else []), _stats(solver)
+
+    return solver.count_solutions(part, limit, check_stop=True), _stats(solver)
+
+
+class ParallelSolver:
+    '''
+    Search the branches of one puzzle on a pool of worker processes
+    The pool is started on first use and kept for the next puzzles, stop() can be called from any thread
+    and also ends a run that hasn't started yet (a thread about to run), reset() drops such a stop
+    '''
+
+    # Branches per worker, more branches balance uneven subtrees better
+    _PARTS_PER_WORKER = 4
+
+    def __init__(self, workers=None, algorithm='Bitmask') -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.algorithm = algorithm
+        self._splitter = bitmask_solver.BitmaskSolver()
+
+        # Spawn clean interpreters, forking a process that runs SDL and other threads isn't safe
+        self._context = multiprocessing.get_context('spawn')
+        self._stop = self._context.Event()
+
+        # A stop() not yet seen by a run, guarded by _stop_lock as the run may be starting in another thread
+        self._stop_requested = False
+        self._stop_lock = threading.Lock()
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Search statistics of the last run, added up over every branch
+        self.stats = {}
+
+    def solve(self, grid):
+        '''
+        Fill in the grid (a list of rows, or a flat buffer) in place
+        Return True if a solution is found, False if there is none or solving was stopped
+        '''
+        solutions = self._run(grid, 1)
+
+        if not solutions:
+            return False
+
+        solution = solutions[0]
+
+        if board_model.flatten(grid) is grid:
+            grid[:] = solution
+        else:
+            side = len(grid)
+            for cell, value in enumerate(solution):
+                grid[cell // side][cell % side] = value
+
+        return True
+
+    def count_solutions(self, grid, limit=2):
+        '''Count the solutions of the grid across every branch, stop counting once limit is reached'''
+        return min(self._run(grid, limit), limit)
+
+    def stop(self):
+        '''End the running search in every worker, or the next one if none is running yet'''
+        with self._stop_lock:
+            self._stop_requested = True
+            self._stop.set()
+
+    def reset(self):
+        '''Drop a stop that came after the last run, so the next one searches'''
+        with self._stop_lock:
+            self._stop_requested = False
+            self._stop.clear()
+
+    def shutdown(self):
+        self.stop()
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _run(self, grid, limit):
+        '''
+        Split the grid and search the parts on the pool
+        Return the solutions (as bytes) when limit is 1, the number of solutions otherwise
+        '''
+        with self._lock:
+            self.stats = {'nodes': 0, 'backtracks': 0, 'candidates': 0, 'parts': 0}
+
+            # The event is left set by the last run when it found enough, it's only kept if stop() asked for it
+            with self._stop_lock:
+                stopped, self._stop_requested = self._stop_requested, False
+                if not stopped:
+                    self._stop.clear()
+
+            try:
+                return self._search(grid, limit)
+            finally:
+                # A stop() during the run was for this run
+                with self._stop_lock:
+                    self._stop_requested = False
+
+    def _search(self, grid, limit):
+        '''Split the grid and search the parts, for _run once its stop event is set'''
+        if self._stop.is_set():
+            return [] if limit == 1 else 0
+
+        parts, found = self._splitter.split(grid, self.workers * self._PARTS_PER_WORKER)
+        self._add_stats(_stats(self._splitter))
+        self.stats['parts'] = len(parts)
+
+        solutions = [bytes(values) for values in found] if limit == 1 else len(found)
+
+        if (solutions if limit == 1 else solutions >= limit) or not parts or self._stop.is_set():
+            return solutions[:1] if limit == 1 else solutions
+
+        if not self._executor:
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=self._context, initializer=_init_worker, initargs=(self._stop,)
+            )
+
+        try:
+            pending = {self._executor.submit(_search_part, self.algorithm, bytes(part), limit) for part in parts}
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future.cancelled():
+                        continue
+
+                    result, stats = future.result()
+                    self._add_stats(stats)
+                    solutions += result
+
+                # Enough found: branches not started are dropped, running ones see the stop event
+                if (solutions if limit == 1 else solutions >= limit) or self._stop.is_set():
+                    self._stop.set()
+                    for future in pending:
+                        future.cancel()
+
+        except BrokenProcessPool:
+            # A worker died (killed or out of memory): the pool can't take work anymore, the next run starts a new one
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            raise
+
+        return solutions[:1] if limit == 1 else solutions
+
+    def _add_stats(self, stats):
+        for key, value in stats.items():
+            self.stats[key] += value
+
+
+class ParallelWorker:
+    '''
+    Run a ParallelSolver from a thread of the game, with the same interface as solver_worker.SolverWorker:
+    the thread only waits on the pool, so the game loop keeps the GIL
+    '''
+
+    def __init__(self, solver, grid, timeout=None) -> None:
+        self._solver = solver
+        self._grid = bytearray(board_model.flatten(grid))
+        self._timeout = timeout
+
+        self.status = 'ready'
+        self.stats = {}
+
+        self._thread = None
+        self._solved = None
+        self._started = None
+
+    def start(self):
+        # Cleared here, not in the thread, so a stop() right after start() isn't lost
+        self._solver.reset()
+        self._thread = threading.Thread(target=self._solve, daemon=True)
+        self._started = time.perf_counter()
+        self.status = 'running'
+        self._thread.start()
+
+    def _solve(self):
+        try:
+            self._solved = self._solver.solve(self._grid)
+        except Exception:
+            self._solved = None
+
+    def poll(self):
+        '''
+        Return the solved grid once the search is done, None before that
+        status becomes 'solved', 'unsolvable', 'timeout' or 'failed' once it's done
+        '''
+        if self.status != 'running':
+            return None
+
+        self.stats = dict(self._solver.stats)
+
+        if self._thread.is_alive():
+            if self._timeout and time.perf_counter() - self._started > self._timeout:
+                self.status = 'timeout'
+                self.stop()
+            return None
+
+        self._thread.join()
+
+        if self._solved is None:
+            self.status = 'failed'
+            return None
+
+        self.status = 'solved' if self._solved else 'unsolvable'
+        return bytes(self._grid) if self._solved else None
+
+    def stop(self):
+        '''Stop the search, the workers drop their branches straight away'''
+        if self.status == 'running':
+            self.status = 'stopped'
+
+        self._solver.stop()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,154 @@
+import collections, random, threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PuzzlePrefetcher:
+    '''
+    Keep a few puzzles of every difficulty ready to play
+    A background thread refills the queues through one pooled HTTP session,
+    every grid of each API response (easy, medium and hard) is kept,
+    queues that weren't low going over size until they hold twice as many
+    '''
+
+    _DIFFICULTIES = ('easy', 'medium', 'hard')
+
+    # Seconds to wait for the connection and for the response
+    _TIMEOUT = (3.05, 10)
+
+    # Seconds to wait after a failed refill, doubled on each failure in a row
+    _BACKOFF = 1
+    _MAX_BACKOFF = 60
+
+    def __init__(self, url, size=3, retries=2) -> None:
+        self._url = url
+        self._size = size
+
+        # A response refilling one queue brings a grid for the others too, kept up to this many
+        self._limit = 2 * size
+
+        # One session, so the connection to the API is reused between requests
+        # Transient errors are retried by urllib3 with its own short backoff
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=1,
+            max_retries=Retry(
+                total=retries, backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET',),
+            ),
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        self._puzzles = {difficulty: collections.deque() for difficulty in self._DIFFICULTIES}
+        self._condition = threading.Condition()
+        self._running = False
+        self._failed = False
+        self._thread = None
+
+    def start(self):
+        '''Start refilling in the background'''
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = threading.Thread(target=self._refill, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        '''Stop the background thread and close the session'''
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread:
+            self._thread.join()
+        self._session.close()
+
+    def ready(self, difficulty=None):
+        '''Number of puzzles ready to play (of one difficulty, or in total)'''
+        with self._condition:
+            return self._count(difficulty)
+
+    def get(self, difficulty=None, timeout=0):
+        '''
+        Take a ready puzzle, of any difficulty unless one is given
+        Wait up to timeout seconds for the queue to refill, then return None
+        (straight away if the last request failed)
+        Return a tuple (difficulty, grid)
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self._count(difficulty) or self._failed, timeout)
+            if not self._count(difficulty):
+                return None
+
+            if difficulty is None:
+                difficulty = random.choice([key for key, puzzles in self._puzzles.items() if puzzles])
+
+            grid = self._puzzles[difficulty].popleft()
+
+            # Wake up the refill thread
+            self._condition.notify_all()
+
+        return difficulty, grid
+
+    def fetch(self):
+        '''Request new boards once, return them as a dict of difficulty: grid'''
+        response = self._session.get(self._url, timeout=self._TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+
+        if not isinstance(data, dict):
+            raise ValueError('Unexpected response format')
+
+        return {
+            difficulty: data[difficulty] for difficulty in self._DIFFICULTIES
+            if self._is_grid(data.get(difficulty))
+        }
+
+    def _count(self, difficulty):
+        if difficulty is None:
+            return sum(len(puzzles) for puzzles in self._puzzles.values())
+        return len(self._puzzles[difficulty])
+
+    def _needs_refill(self):
+        return any(len(puzzles) < self._size for puzzles in self._puzzles.values())
+
+    def _is_grid(self, grid):
+        '''Check the response holds 9 lists of 9 numbers from 0-9'''
+        return isinstance(grid, list) and len(grid) == 9 and all(
+            isinstance(row, list) and len(row) == 9 and
+            all(isinstance(value, int) and 0 <= value <= 9 for value in row)
+            for row in grid
+        )
+
+    def _refill(self):
+        '''Fetch new boards whenever a queue runs low, back off when the API fails'''
+        backoff = self._BACKOFF
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running or self._needs_refill())
+                if not self._running:
+                    return
+
+            try:
+                grids = self.fetch()
+            except (requests.RequestException, ValueError):
+                grids = {}
+
+            with self._condition:
+                for difficulty, grid in grids.items():
+                    if len(self._puzzles[difficulty]) < self._limit:
+                        self._puzzles[difficulty].append(grid)
+                self._failed = not grids
+                self._condition.notify_all()
+
+                if grids:
+                    backoff = self._BACKOFF
+                else:
+                    self._condition.wait_for(lambda: not self._running, backoff)
+                    backoff = min(2 * backoff, self._MAX_BACKOFF)
@@ -0,0 +1,256 @@
+'''
+Binary packs of 9x9 puzzles, read through mmap so a pack of millions of puzzles opens instantly
+and a random puzzle of any difficulty is picked in constant time, without parsing or loading the file
+Layout (little-endian):
+    header   magic, version, puzzle count, Easy/Medium/Hard counts, index offset
+    records  41 bytes per puzzle, two cells per byte (high nibble first), in import order
+    index    record numbers of every Easy puzzle, then Medium, then Hard, 4 bytes each
+Convert from and to the usual text format (one 81 characters puzzle per line), both streamed:
+
+Usage: python puzzle_pack.py import puzzles.txt -o puzzles.pack [--difficulty Hard]
+       python puzzle_pack.py export puzzles.pack [-o puzzles.txt] [--with-difficulty]
+       python puzzle_pack.py info puzzles.pack
+'''
+
+import array, collections, mmap, os, random, struct, sys, time
+
+import board_model, logic_solver
+
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+
+# Pack shipped with the game, see get_sample_puzzles in sudoku_board
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'puzzles.pack')
+
+_MAGIC = b'LUMIPACK'
+_VERSION = 1
+_HEADER = struct.Struct('<8sHHI3IQ')
+
+_CELLS = 81
+_RECORD_SIZE = (_CELLS + 1) // 2
+
+# Cells moved to the high nibble, and the low nibble of every byte of a record read as one integer
+_TO_HIGH = bytes((byte << 4) & 0xFF for byte in range(256))
+_LOW_NIBBLES = int.from_bytes(b'\x0f' * _RECORD_SIZE, 'big')
+
+
+def pack_cells(cells):
+    '''Pack 81 cells into 41 bytes, the nibbles are merged as two big integers so no cell is handled in Python'''
+    cells = bytes(cells) + b'\0'
+    high = int.from_bytes(cells[0::2].translate(_TO_HIGH), 'big')
+    return (high | int.from_bytes(cells[1::2], 'big')).to_bytes(_RECORD_SIZE, 'big')
+
+
+def unpack_cells(record):
+    '''Unpack 41 bytes into 81 cells, as a bytearray'''
+    packed = int.from_bytes(record, 'big')
+    cells = bytearray(2 * _RECORD_SIZE)
+    cells[0::2] = (packed >> 4 & _LOW_NIBBLES).to_bytes(_RECORD_SIZE, 'big')
+    cells[1::2] = (packed & _LOW_NIBBLES).to_bytes(_RECORD_SIZE, 'big')
+    del cells[_CELLS:]
+    return cells
+
+
+class PuzzlePack:
+    '''
+    A pack file opened read-only through mmap, only the records picked are ever read from disk
+    Raise ValueError if the file isn't a pack
+    '''
+
+    def __init__(self, path) -> None:
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, cells, self._size, *counts, index = _HEADER.unpack_from(self._map)
+        except struct.error:
+            self._map.close()
+            raise ValueError(f'{path} is not a puzzle pack')
+
+        if magic != _MAGIC or version != _VERSION or cells != _CELLS or index + 4 * sum(counts) > len(self._map):
+            self._map.close()
+            raise ValueError(f'{path} is not a puzzle pack')
+
+        # Where the record numbers of every difficulty start, and how many there are
+        self._counts = dict(zip(DIFFICULTIES, counts))
+        self._index = {}
+        for difficulty, count in self._counts.items():
+            self._index[difficulty] = index
+            index += 4 * count
+
+    def __len__(self):
+        return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def count(self, difficulty=None):
+        '''Number of puzzles (of one difficulty, or in total)'''
+        return self._size if difficulty is None else self._counts[difficulty]
+
+    def puzzle(self, number):
+        '''Cells of the puzzle with this record number, as a flat bytearray'''
+        if not 0 <= number < self._size:
+            raise IndexError(number)
+
+        offset = _HEADER.size + number * _RECORD_SIZE
+        return unpack_cells(self._map[offset:offset + _RECORD_SIZE])
+
+    def puzzle_of(self, difficulty, k):
+        '''Cells of the k-th puzzle of a difficulty'''
+        if not 0 <= k < self._counts[difficulty]:
+            raise IndexError(k)
+
+        number, = struct.unpack_from('<I', self._map, self._index[difficulty] + 4 * k)
+        return self.puzzle(number)
+
+    def choice(self, difficulty=None, rng=random):
+        '''
+        Pick a random puzzle, of any difficulty unless one is given
+        Return (difficulty, cells), or None if there is no such puzzle
+        '''
+        if difficulty is None:
+            if not self._size:
+                return None
+            # Every puzzle is as likely to be picked, whatever its difficulty
+            k = rng.randrange(self._size)
+            for difficulty, count in self._counts.items():
+                if k < count:
+                    break
+                k -= count
+        elif self._counts[difficulty]:
+            k = rng.randrange(self._counts[difficulty])
+        else:
+            return None
+
+        return difficulty, self.puzzle_of(difficulty, k)
+
+    def __iter__(self):
+        '''Every puzzle as (difficulty, cells), difficulty by difficulty'''
+        for difficulty, count in self._counts.items():
+            for k in range(count):
+                yield difficulty, self.puzzle_of(difficulty, k)
+
+
+def write_pack(puzzles, path):
+    '''
+    Write (difficulty, cells) pairs into a new pack, streamed: records go straight to the file,
+    only the index (4 bytes per puzzle) is kept in memory until the end
+    Return the number of puzzles of every difficulty
+    '''
+    index = {difficulty: array.array('I') for difficulty in DIFFICULTIES}
+    size = 0
+
+    with open(path, 'wb') as file:
+        file.write(bytes(_HEADER.size))
+
+        for difficulty, cells in puzzles:
+            file.write(pack_cells(cells))
+            index[difficulty].append(size)
+            size += 1
+
+        offset = file.tell()
+        for numbers in index.values():
+            if sys.byteorder != 'little':
+                numbers.byteswap()
+            numbers.tofile(file)
+
+        file.seek(0)
+        file.write(_HEADER.pack(_MAGIC, _VERSION, _CELLS, size, *map(len, index.values()), offset))
+
+    return collections.Counter({difficulty: len(numbers) for difficulty, numbers in index.items()})
+
+
+def read_lines(lines, difficulty=None):
+    '''
+    Read (difficulty, cells) pairs from text lines, lazily: an 81 characters puzzle, optionally followed
+    by its difficulty after a tab (as written by logic_solver.py and export)
+    Puzzles without one get the difficulty given, or are graded with the logic solver
+    Blank lines, comments and grids of other sizes are skipped
+    '''
+    grader = logic_solver.LogicSolver()
+
+    for line in lines:
+        if not line.strip() or line.startswith('#'):
+            continue
+
+        puzzle, *fields = line.split('\t')
+        if (cells := board_model.parse_cells(puzzle)) is None or len(cells) != _CELLS:
+            continue
+
+        label = fields[0].strip().capitalize() if fields else ''
+        yield (label if label in DIFFICULTIES else difficulty or grader.grade(cells)), cells
+
+
+def write_lines(pack, output, with_difficulty=False):
+    '''
+    Write every puzzle of a pack as an 81 characters line, the format batch.py, validation.py and logic_solver.py read
+    With with_difficulty, the difficulty follows after a tab, so importing the lines back skips grading
+    '''
+    for difficulty, cells in pack:
+        if with_difficulty:
+            output.write(f'{board_model.format_cells(cells)}\t{difficulty}\n')
+        else:
+            output.write(f'{board_model.format_cells(cells)}\n')
+
+
+def main(argv=None):
+    # Only the command line needs argparse, the game imports this module too
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert Sudoku puzzle files to and from binary packs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    to_pack = commands.add_parser('import', help='pack a text file of puzzles')
+    to_pack.add_argument('puzzles', help='text file with one 81 characters puzzle per line, - for stdin')
+    to_pack.add_argument('-o', '--output', required=True, help='pack file to write')
+    to_pack.add_argument('-d', '--difficulty', choices=DIFFICULTIES, help='difficulty of the puzzles without one (default: grade them)')
+
+    to_text = commands.add_parser('export', help='write the puzzles of a pack as text')
+    to_text.add_argument('pack')
+    to_text.add_argument('-o', '--output', default='-', help='where to write the puzzles, - for stdout')
+    to_text.add_argument('-w', '--with-difficulty', action='store_true', help='add the difficulty of every puzzle after a tab')
+
+    info = commands.add_parser('info', help='count the puzzles of a pack')
+    info.add_argument('pack')
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+
+    if args.command == 'import':
+        source = sys.stdin if args.puzzles == '-' else open(args.puzzles)
+        try:
+            counter = write_pack(read_lines(source, args.difficulty), args.output)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    elif args.command == 'export':
+        output = sys.stdout if args.output == '-' else open(args.output, 'w')
+        try:
+            with PuzzlePack(args.pack) as pack:
+                write_lines(pack, output, args.with_difficulty)
+                counter = collections.Counter({difficulty: pack.count(difficulty) for difficulty in DIFFICULTIES})
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    else:
+        with PuzzlePack(args.pack) as pack:
+            counter = collections.Counter({difficulty: pack.count(difficulty) for difficulty in DIFFICULTIES})
+
+    elapsed = time.perf_counter() - start
+    total = sum(counter.values())
+    summary = ', '.join(f'{difficulty}: {counter[difficulty]}' for difficulty in DIFFICULTIES)
+
+    print(f'{total} puzzles in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s) - {summary}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
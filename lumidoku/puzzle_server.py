@@ -0,0 +1,423 @@
+'''
+Local puzzle and solving service, for machines that can't rely on the puzzle API
+    GET  /api/sudoku  answers like the API the game uses: {"easy": grid, "medium": grid, "hard": grid},
+                      from pools of generated puzzles kept full in the background
+    POST /solve       takes {"puzzles": [puzzle, ...]}, each a list of rows or a one line string,
+                      and answers {"solutions": [...], "status": [...]} in the same order and form
+Puzzles are generated and solved on a few worker processes, identical puzzles being solved
+at the same time (in one batch or by different clients) are only solved once
+
+Usage: python puzzle_server.py [--host 127.0.0.1] [--port 8765] [--workers 2] [--pool 3]
+Then start the game with LUMIDOKU_API_URL=http://127.0.0.1:8765/api/sudoku
+'''
+
+import argparse, asyncio, collections, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bitmask_solver, board_model, generator
+
+
+# Keys of the API response, with the generator's difficulty for each
+_DIFFICULTIES = {
+    'easy': 'Easy',
+    'medium': 'Medium',
+    'hard': 'Hard',
+}
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+# Solver and generator of the current worker process
+_solver = None
+_generator = None
+
+
+def _init_worker():
+    global _solver, _generator
+    _solver = bitmask_solver.BitmaskSolver()
+    _generator = generator.PuzzleGenerator()
+
+
+def _generate(difficulty):
+    return _generator.generate_graded(difficulty)
+
+
+def _solve_chunk(puzzles):
+    '''Worker process: solve flat grids, return the solutions as bytes, None for the unsolvable ones'''
+    solutions = []
+
+    for puzzle in puzzles:
+        grid = bytearray(puzzle)
+        _solver._status_solving = True
+        solutions.append(bytes(grid) if _solver.solve(grid) else None)
+
+    return solutions
+
+
+def _parse_puzzle(puzzle):
+    '''Read a puzzle of a request (a list of rows or a one line string) into flat cells, None if it isn't a grid'''
+    if isinstance(puzzle, str):
+        return board_model.parse_cells(puzzle)
+
+    if not isinstance(puzzle, list) or not all(isinstance(row, list) and len(row) == len(puzzle) for row in puzzle):
+        return None
+
+    cells = board_model.flatten(puzzle)
+
+    try:
+        side = board_model.geometry_of(cells).side
+    except ValueError:
+        return None
+
+    if not all(type(value) is int and 0 <= value <= side for value in cells):
+        return None
+
+    return bytearray(cells)
+
+
+def _format_solution(solution, puzzle):
+    '''Write a solution in the form its puzzle came in'''
+    if isinstance(puzzle, str):
+        return board_model.format_cells(solution)
+
+    side = len(puzzle)
+    return [list(solution[i * side:i * side + side]) for i in range(side)]
+
+
+class _BadRequest(Exception):
+
+    def __init__(self, status, message) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class PuzzleServer:
+    '''
+    asyncio HTTP server: any number of clients are served by one event loop,
+    while the CPU work runs on a pool of worker processes with a bounded number of jobs in flight
+    '''
+
+    # Largest request body and most puzzles solved in one request
+    _MAX_BODY = 1 << 20
+    _MAX_BATCH = 1000
+
+    # Puzzles sent to a worker at a time
+    _CHUNK_SIZE = 32
+
+    # Seconds a client waits for a puzzle of each difficulty when the pools are empty
+    _PUZZLE_TIMEOUT = 30
+
+    # Seconds a refill task waits after a failed generation before trying again
+    _RETRY_DELAY = 1
+
+    def __init__(self, host='127.0.0.1', port=8765, workers=None, pool_size=3) -> None:
+        self.host = host
+        self.port = port
+        self.workers = workers or min(os.cpu_count() or 1, 4)
+        self._pool_size = pool_size
+
+        self._executor = None
+        self._server = None
+        self._refill_tasks = []
+
+        # Jobs on the worker processes, more wait their turn here instead of piling up in the executor
+        self._jobs = None
+
+        # Ready puzzles of every difficulty, the ones being generated,
+        # and the condition clients wait on when they run out
+        self._puzzles = {difficulty: collections.deque() for difficulty in _DIFFICULTIES}
+        self._generating = collections.Counter()
+        self._refilled = None
+
+        # Futures of the puzzles being solved, by puzzle, so the same puzzle is only solved once at a time
+        self._solving = {}
+
+        self.stats = collections.Counter()
+
+    async def start(self):
+        '''Start the workers, the puzzle pools and listening, return the address served'''
+        self._executor = self._new_executor()
+        self._jobs = asyncio.Semaphore(2 * self.workers)
+        self._refilled = asyncio.Condition()
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self._refill_tasks = [asyncio.create_task(self._refill()) for worker in range(self.workers)]
+
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self):
+        '''Serve until cancelled, start() first'''
+        await self._server.serve_forever()
+
+    async def close(self):
+        for task in self._refill_tasks:
+            task.cancel()
+
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def puzzles(self):
+        '''Take one ready puzzle of every difficulty, as the API response'''
+        async with self._refilled:
+            await asyncio.wait_for(self._refilled.wait_for(lambda: all(self._puzzles.values())), self._PUZZLE_TIMEOUT)
+            response = {difficulty: puzzles.popleft() for difficulty, puzzles in self._puzzles.items()}
+
+            # Wake up the refill tasks
+            self._refilled.notify_all()
+
+        return response
+
+    async def solve(self, puzzles):
+        '''Solve flat grids, return their solutions as bytes, None for the unsolvable ones'''
+        puzzles = [bytes(puzzle) for puzzle in puzzles]
+        loop = asyncio.get_running_loop()
+        futures = {}
+        new = []
+
+        for puzzle in dict.fromkeys(puzzles):
+            if puzzle in self._solving:
+                self.stats['coalesced'] += 1
+            else:
+                self._solving[puzzle] = loop.create_future()
+                new.append(puzzle)
+            futures[puzzle] = self._solving[puzzle]
+
+        for start in range(0, len(new), self._CHUNK_SIZE):
+            asyncio.create_task(self._solve_chunk(new[start:start + self._CHUNK_SIZE]))
+
+        # Shielded, other requests may be waiting for the same futures
+        solutions = dict(zip(futures, await asyncio.gather(*map(asyncio.shield, futures.values()))))
+
+        return [solutions[puzzle] for puzzle in puzzles]
+
+    async def _solve_chunk(self, puzzles):
+        '''Solve new puzzles on a worker, and pass the solutions to every request waiting for them'''
+        try:
+            async with self._jobs:
+                executor = self._executor
+                solutions = await asyncio.get_running_loop().run_in_executor(executor, _solve_chunk, puzzles)
+        except Exception as error:
+            solutions = [error] * len(puzzles)
+            if isinstance(error, BrokenProcessPool):
+                self._replace_executor(executor)
+
+        self.stats['solved'] += len(puzzles)
+
+        for puzzle, solution in zip(puzzles, solutions):
+            future = self._solving.pop(puzzle)
+            if isinstance(solution, Exception):
+                future.set_exception(solution)
+            else:
+                future.set_result(solution)
+
+    async def _refill(self):
+        '''Generate puzzles on a worker whenever a pool runs low, one task per worker'''
+        loop = asyncio.get_running_loop()
+
+        def missing(difficulty):
+            return self._pool_size - len(self._puzzles[difficulty]) - self._generating[difficulty]
+
+        while True:
+            async with self._refilled:
+                await self._refilled.wait_for(lambda: any(missing(difficulty) > 0 for difficulty in self._puzzles))
+                difficulty = max(self._puzzles, key=missing)
+                self._generating[difficulty] += 1
+
+            try:
+                async with self._jobs:
+                    executor = self._executor
+                    puzzle, grade = await loop.run_in_executor(executor, _generate, _DIFFICULTIES[difficulty])
+
+            # The task keeps going whatever happened, or this pool would never be refilled again
+            except Exception as error:
+                self.stats['failed'] += 1
+                print(f'Generating a {difficulty} puzzle failed: {type(error).__name__}: {error}', file=sys.stderr)
+
+                if isinstance(error, BrokenProcessPool):
+                    self._replace_executor(executor)
+
+                await asyncio.sleep(self._RETRY_DELAY)
+                continue
+
+            finally:
+                self._generating[difficulty] -= 1
+
+            # A puzzle that came out easier or harder than asked goes to the pool of its grade, unless that one is full
+            pool = grade.lower()
+
+            async with self._refilled:
+                if len(self._puzzles[pool]) < self._pool_size:
+                    self._puzzles[pool].append(puzzle)
+                    self.stats['generated'] += 1
+                else:
+                    self.stats['discarded'] += 1
+                self._refilled.notify_all()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker)
+
+    def _replace_executor(self, broken):
+        '''Start new workers in place of a broken pool (a worker died), unless another task already did'''
+        if self._executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    async def _handle(self, reader, writer):
+        '''Serve the requests of one connection, kept alive until the client closes it'''
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except _BadRequest as error:
+                    await self._respond(writer, error.status, {'error': str(error)}, keep_alive=False)
+                    break
+
+                if request is None:
+                    break
+
+                method, path, body, keep_alive = request
+                self.stats['requests'] += 1
+
+                try:
+                    status, response = 200, await self._route(method, path, body)
+                except _BadRequest as error:
+                    status, response = error.status, {'error': str(error)}
+                except asyncio.TimeoutError:
+                    status, response = 503, {'error': 'No puzzle ready, try again later'}
+                except Exception as error:
+                    status, response = 500, {'error': f'{type(error).__name__}: {error}'}
+
+                await self._respond(writer, status, response, keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        '''Read one request, return (method, path, body, keep_alive), or None once the client is gone'''
+        line = await reader.readline()
+        if not line:
+            return None
+
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise _BadRequest(400, 'Malformed request line')
+
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise _BadRequest(400, 'Bad Content-Length')
+
+        if length > self._MAX_BODY:
+            raise _BadRequest(413, 'Request body too large')
+
+        body = await reader.readexactly(length) if length else b''
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        return method, target.split('?')[0], body, keep_alive
+
+    async def _route(self, method, path, body):
+        if path in ('/', '/api/sudoku'):
+            if method != 'GET':
+                raise _BadRequest(405, 'Use GET')
+            return await self.puzzles()
+
+        if path == '/solve':
+            if method != 'POST':
+                raise _BadRequest(405, 'Use POST')
+            return await self._solve_request(body)
+
+        raise _BadRequest(404, f'No such endpoint: {path}')
+
+    async def _solve_request(self, body):
+        try:
+            puzzles = json.loads(body)['puzzles']
+        except (ValueError, TypeError, KeyError):
+            raise _BadRequest(400, 'Expected {"puzzles": [...]}')
+
+        if not isinstance(puzzles, list):
+            raise _BadRequest(400, 'Expected {"puzzles": [...]}')
+
+        if len(puzzles) > self._MAX_BATCH:
+            raise _BadRequest(413, f'At most {self._MAX_BATCH} puzzles per request')
+
+        grids = [_parse_puzzle(puzzle) for puzzle in puzzles]
+        solutions = dict(zip(
+            (k for k, grid in enumerate(grids) if grid is not None),
+            await self.solve([grid for grid in grids if grid is not None]),
+        ))
+
+        response = {'solutions': [], 'status': []}
+
+        for k, puzzle in enumerate(puzzles):
+            solution = solutions.get(k)
+            response['solutions'].append(_format_solution(solution, puzzle) if solution else None)
+            response['status'].append('invalid' if grids[k] is None else 'solved' if solution else 'unsolvable')
+
+        return response
+
+    async def _respond(self, writer, status, response, keep_alive=True):
+        body = json.dumps(response, separators=(',', ':')).encode()
+        head = (
+            f'HTTP/1.1 {status} {_REASONS[status]}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            f'\r\n'
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Sudoku puzzles and solutions over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes (default: up to 4 cores)')
+    parser.add_argument('--pool', type=int, default=3, help='puzzles kept ready for each difficulty')
+    args = parser.parse_args(argv)
+
+    server = PuzzleServer(args.host, args.port, args.workers, args.pool)
+
+    async def serve():
+        try:
+            await server.start()
+            print(f'Serving on http://{server.host}:{server.port}/api/sudoku and /solve', file=sys.stderr)
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
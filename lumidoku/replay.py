@@ -0,0 +1,159 @@
+'''
+Record the input of a game session and replay it without a window, to measure the game loop
+Recording (set LUMIDOKU_RECORD when starting the game) writes one JSON line per frame:
+the events of the frame, where the mouse was, and the puzzle whenever a new one came in
+Replaying drives Game frame by frame from the file on SDL's dummy video driver, as fast as it can,
+and reports percentiles of the time taken by event handling, drawing and whole frames
+
+Usage: LUMIDOKU_RECORD=session.jsonl python lumidoku.py
+       python replay.py session.jsonl [--repeat 3] [-o timings.json]
+'''
+
+import json, os, sys, time
+
+import pygame
+
+import board_model
+
+
+_VERSION = 1
+
+
+def _event_to_dict(event):
+    '''The type and JSON friendly attributes of an event'''
+    attributes = {
+        name: list(value) if isinstance(value, tuple) else value
+        for name, value in event.dict.items()
+        if isinstance(value, (bool, int, float, str, tuple))
+    }
+    return {'type': event.type, **attributes}
+
+
+def _event_from_dict(data):
+    attributes = {name: tuple(value) if isinstance(value, list) else value for name, value in data.items() if name != 'type'}
+    return pygame.event.Event(data['type'], attributes)
+
+
+class InputRecorder:
+    '''Write the input of every frame to a file, see Game.main_loop'''
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self._file = open(path, 'w')
+        self._file.write(json.dumps({'version': _VERSION, 'started': time.strftime('%Y-%m-%d %H:%M:%S')}) + '\n')
+
+        self._started = time.perf_counter()
+        self._puzzle_count = None
+
+    def record(self, events, mouse, board):
+        '''Write one frame: its events, the mouse position, and the puzzle if the board loaded a new one'''
+        frame = {'t': round(time.perf_counter() - self._started, 4), 'mouse': list(mouse)}
+
+        if events:
+            frame['events'] = [_event_to_dict(event) for event in events]
+
+        if board.puzzle_count != self._puzzle_count:
+            self._puzzle_count = board.puzzle_count
+            frame['puzzle'] = board_model.format_cells(board._model.puzzle())
+            frame['difficulty'] = board.difficulty
+
+        self._file.write(json.dumps(frame, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class InputPlayer:
+    '''
+    Give Game the recorded input of one frame at a time, and the recorded mouse position
+    The board is expected to take its puzzles from outside (puzzle_source 'external'), they're loaded from the file
+    '''
+
+    def __init__(self, path) -> None:
+        with open(path) as file:
+            header = json.loads(file.readline())
+
+            if header.get('version') != _VERSION:
+                raise ValueError(f'{path} is not a recording this version can replay')
+
+            self._frames = [json.loads(line) for line in file if line.strip()]
+
+        self._next = 0
+        self._mouse = (0, 0)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def mouse_pos(self):
+        return self._mouse
+
+    def next_events(self, board):
+        '''Events of the next frame, a QUIT event once the recording is over'''
+        if self._next == len(self._frames):
+            return [pygame.event.Event(pygame.QUIT)]
+
+        frame = self._frames[self._next]
+        self._next += 1
+        self._mouse = tuple(frame['mouse'])
+
+        if 'puzzle' in frame:
+            board.load_puzzle(board_model.parse_cells(frame['puzzle']), frame.get('difficulty', ''))
+
+        # Window events are dropped, the dummy window is never covered or closed
+        return [
+            _event_from_dict(data) for data in frame.get('events', ())
+            if data['type'] != pygame.QUIT
+        ]
+
+
+def replay(path):
+    '''Replay a recording once, return the game's instrumentation summary (with percentiles)'''
+    # Imported here, the game imports this module for recording
+    import lumidoku
+
+    player = InputPlayer(path)
+    game = lumidoku.Game(player=player)
+    game._instrumentation.keep_samples = True
+    game._instrumentation.enabled = True
+    game._instrumentation.clear()
+
+    start = time.perf_counter()
+    game.main_loop()
+
+    summary = game._instrumentation.summary()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay a recorded game session without a window and time its frames')
+    parser.add_argument('recording', help='file written with LUMIDOKU_RECORD')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='replays to run, the fastest one is reported')
+    parser.add_argument('-o', '--output', help='save the timings to a JSON file, to compare with other runs')
+    args = parser.parse_args(argv)
+
+    # No window and no sound, the frames are drawn into a surface in memory
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    runs = [replay(args.recording) for run in range(args.repeat)]
+    best = min(runs, key=lambda summary: summary['sections']['frame']['p50'])
+
+    print(f'{best["frames"]} frames, fastest of {len(runs)} replays took {best["seconds"]:.2f}s')
+    print(f'{"section":<16}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}  ms')
+    for section, timings in best['sections'].items():
+        print(f'{section:<16}' + ''.join(f'{timings[key]:>10.3f}' for key in ('p50', 'p90', 'p99', 'max_ms')))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'recording': args.recording, 'runs': runs}, file, indent=2)
+        print(f'Saved to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    # Solver processes need this in the frozen executable
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,268 @@
+'''
+Solutions of already solved puzzles, keyed by the canonical form of the puzzle
+Puzzles that only differ by Sudoku symmetries (relabelled digits, swapped bands or stacks,
+swapped rows or columns inside a band or stack, transposed) share one entry,
+so solving any of them again is a lookup
+'''
+
+import collections, itertools, os
+import board_model
+
+
+# Most row and column orders tried for each of the grid and its transpose when rows or columns can't be told apart
+_MAX_ORDERINGS = 24
+
+# Most rounds of colour refinement between rows, columns and digits
+_REFINE_ROUNDS = 3
+
+
+def _ranks(keys):
+    '''Replace every key by its rank among the distinct keys, so equal keys get equal small numbers'''
+    rank = {key: k for k, key in enumerate(sorted(set(keys)))}
+    return [rank[key] for key in keys]
+
+
+def _refine(clues, side):
+    '''
+    Colour rows, columns and digits by what they hold, independently of their order:
+    a row's colour comes from the colours of the columns and digits of its clues, and the same the other way
+    clues is a list of (row, column, digit)
+    Refinement stops early once a round splits no colour
+    '''
+    rows, cols, digits = [0] * side, [0] * side, [0] * (side + 1)
+    classes = 1, 1, 1
+
+    for round in range(_REFINE_ROUNDS):
+        row_keys = [[rows[r]] for r in range(side)]
+        col_keys = [[cols[c]] for c in range(side)]
+        digit_keys = [[digits[d]] for d in range(side + 1)]
+
+        for r, c, d in clues:
+            row_keys[r].append((cols[c], digits[d]))
+            col_keys[c].append((rows[r], digits[d]))
+            digit_keys[d].append((rows[r], cols[c]))
+
+        rows = _ranks([(key[0], tuple(sorted(key[1:]))) for key in row_keys])
+        cols = _ranks([(key[0], tuple(sorted(key[1:]))) for key in col_keys])
+        digits = _ranks([(key[0], tuple(sorted(key[1:]))) for key in digit_keys])
+
+        if classes == (classes := (max(rows), max(cols), max(digits))):
+            break
+
+    return rows, cols
+
+
+def _tie_orders(items, colors):
+    '''Every order of items sorted by colour, items of the same colour being swapped in every possible way'''
+    items = sorted(items, key=colors.__getitem__)
+    groups = [list(group) for color, group in itertools.groupby(items, key=colors.__getitem__)]
+
+    return [
+        [item for part in parts for item in part]
+        for parts in itertools.product(*(itertools.permutations(group) for group in groups))
+    ]
+
+
+def _line_orders(colors, box_size):
+    '''
+    Orders of the rows (or columns) that keep them in their bands, sorted by colour:
+    bands sorted by the colours of their rows, rows sorted by colour inside each band,
+    with every arrangement of ties
+    '''
+    n = box_size
+    bands = [range(b * n, b * n + n) for b in range(n)]
+    band_colors = _ranks([tuple(sorted(colors[line] for line in band)) for band in bands])
+
+    choices = [_tie_orders(range(n), band_colors)] + [_tie_orders(band, colors) for band in bands]
+
+    for band_order, *inside in itertools.product(*choices):
+        yield [line for band in band_order for line in inside[band]]
+
+
+def canonical_form(cells):
+    '''
+    Return (key, transform) for a flat grid: key is the grid moved by transform into a canonical position,
+    with its digits relabelled in order of first appearance, as bytes
+    transform is (order, digits): key[k] == digits[cells[order[k]]]
+    Equivalent grids get the same key unless too many rows or columns look alike (see _MAX_ORDERINGS),
+    then some of them just get keys of their own
+    '''
+    g = board_model.geometry_of(cells)
+    side = g.side
+    best = None
+
+    # The transpose has the colours and orders of the grid, rows and columns swapped, so they are worked out once
+    clues = [(r, c, value) for r in range(side) for c in range(side) if (value := cells[r * side + c])]
+    row_colors, col_colors = _refine(clues, side)
+    row_orders = list(itertools.islice(_line_orders(row_colors, g.box_size), _MAX_ORDERINGS))
+    col_orders = list(itertools.islice(_line_orders(col_colors, g.box_size), _MAX_ORDERINGS))
+
+    for transposed in (False, True):
+        line_orders, cross_orders = (col_orders, row_orders) if transposed else (row_orders, col_orders)
+        cross_orders = cross_orders[:max(1, _MAX_ORDERINGS // len(line_orders))]
+
+        # Index of the cell at (line, cross): row and column, or column and row in the transpose
+        line_step, cross_step = (1, side) if transposed else (side, 1)
+
+        for lines in line_orders:
+            for crosses in cross_orders:
+                order = [line * line_step + cross * cross_step for line in lines for cross in crosses]
+                digits = {0: 0}
+                key = bytes(digits.setdefault(value, len(digits)) for value in map(cells.__getitem__, order))
+
+                if best is None or key < best[0]:
+                    best = key, order, digits
+
+    key, order, digits = best
+
+    # Digits missing from the grid take the labels left, in order
+    missing = [digit for digit in range(1, side + 1) if digit not in digits]
+    for digit, label in zip(missing, range(len(digits), side + 1)):
+        digits[digit] = label
+
+    return key, (order, [digits[digit] for digit in range(side + 1)])
+
+
+def fingerprint(cells):
+    '''
+    A summary of a flat grid much cheaper than canonical_form, shared by equivalent grids:
+    how many clues every digit, row and column holds, sorted (rows and columns as a sorted pair, for the transpose)
+    Grids with different fingerprints never have the same canonical form
+    '''
+    cells = bytes(cells)
+    side = board_model.geometry_of(cells).side
+
+    digits = tuple(sorted(cells.count(digit) for digit in range(1, side + 1)))
+    rows = tuple(sorted(side - cells[r * side:r * side + side].count(0) for r in range(side)))
+    cols = tuple(sorted(side - cells[c::side].count(0) for c in range(side)))
+
+    return digits, min(rows, cols), max(rows, cols)
+
+
+def to_canonical(cells, transform):
+    '''Move a flat grid (the puzzle or one of its solutions) into the canonical position of transform'''
+    order, digits = transform
+    return bytes(digits[cells[index]] for index in order)
+
+
+def from_canonical(cells, transform):
+    '''Move a flat grid in canonical position back to where the puzzle of transform was'''
+    order, digits = transform
+    labels = {label: digit for digit, label in enumerate(digits)}
+    grid = bytearray(len(cells))
+
+    for index, value in zip(order, cells):
+        grid[index] = labels[value]
+
+    return grid
+
+
+class SolutionCache:
+    '''
+    Least recently used cache of solutions, keyed by canonical puzzle (see canonical_form)
+    A puzzle whose fingerprint no entry has is a miss straight away, without working out its canonical form
+    With a path, every new entry is appended to a text file (puzzle and solution in canonical position
+    on one line) and the file is read back on start, so solutions survive the game;
+    the file is rewritten with only the entries kept when it holds more
+    '''
+
+    def __init__(self, maxsize=1024, path=None) -> None:
+        self._maxsize = maxsize
+        self._path = path
+        self._entries = collections.OrderedDict()
+
+        # Number of entries of every fingerprint
+        self._fingerprints = collections.Counter()
+
+        # The last grid looked up with its canonical form, a put usually follows the get of the same puzzle
+        self._last = None
+
+        self.hits = 0
+        self.misses = 0
+
+        if path and os.path.exists(path):
+            self._read(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, grid):
+        '''Return a solution of the grid (a list of rows or a flat buffer) as a flat bytearray, or None'''
+        if not self._fingerprints[fingerprint(board_model.flatten(grid))]:
+            self.misses += 1
+            return None
+
+        key, transform = self._canonical_form(grid)
+
+        if (solution := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return from_canonical(solution, transform)
+
+    def put(self, grid, solution):
+        '''Remember the solution of a grid, both lists of rows or flat buffers'''
+        key, transform = self._canonical_form(grid)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        solution = to_canonical(board_model.flatten(solution), transform)
+        self._store(key, solution)
+
+        if self._path:
+            with open(self._path, 'a') as file:
+                file.write(f'{board_model.format_cells(key)} {board_model.format_cells(solution)}\n')
+
+    def _canonical_form(self, grid):
+        cells = bytes(board_model.flatten(grid))
+
+        if self._last is None or self._last[0] != cells:
+            self._last = cells, canonical_form(cells)
+
+        return self._last[1]
+
+    def _store(self, key, solution):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        else:
+            self._fingerprints[fingerprint(key)] += 1
+
+        self._entries[key] = solution
+
+        if len(self._entries) > self._maxsize:
+            key, solution = self._entries.popitem(last=False)
+            self._fingerprints[fingerprint(key)] -= 1
+
+    def _read(self, path):
+        '''
+        Load the saved entries, the latest ones win when there are more than maxsize
+        The file is compacted when it has more lines than entries kept (evicted, repeated or broken ones)
+        '''
+        lines = 0
+
+        with open(path) as file:
+            for line in file:
+                lines += 1
+                try:
+                    puzzle, solution = line.split()
+                except ValueError:
+                    continue
+
+                key, solution = board_model.parse_cells(puzzle), board_model.parse_cells(solution)
+                if key is not None and solution is not None and len(key) == len(solution):
+                    self._store(bytes(key), bytes(solution))
+
+        if lines > len(self._entries):
+            self._rewrite(path)
+
+    def _rewrite(self, path):
+        '''Write the entries kept to a new file, swapped in for the old one only once it's complete'''
+        with open(path + '.tmp', 'w') as file:
+            for key, solution in self._entries.items():
+                file.write(f'{board_model.format_cells(key)} {board_model.format_cells(solution)}\n')
+
+        os.replace(path + '.tmp', path)
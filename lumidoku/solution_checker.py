@@ -0,0 +1,72 @@
+import threading, time
+import board_model, dlx_solver
+
+
+class SolutionChecker:
+    '''
+    Count the solutions of a grid (up to 2) in a background thread, within a time budget,
+    so a custom puzzle can be checked while the game keeps drawing
+    Starting a new check stops the running one, so the check can follow the grid as clues are typed
+    '''
+
+    # Results of a check, from the number of solutions found
+    _RESULTS = {0: 'unsolvable', 1: 'unique', 2: 'multiple'}
+
+    def __init__(self, budget=3.0) -> None:
+        self._budget = budget
+        self._counter = dlx_solver.DLXSolver()
+        self._thread = None
+        self._timer = None
+
+        # Grid (flat bytes) of the last check started, and its result once known:
+        # 'unique', 'multiple', 'unsolvable', or 'timeout' when the budget ran out first
+        self.grid = None
+        self.result = None
+        self._started = None
+
+    def start(self, grid):
+        '''Check a grid (a list of rows or a flat buffer), stopping the check still running'''
+        self.stop()
+
+        self.grid = bytes(board_model.flatten(grid))
+        self.result = None
+        self._started = time.perf_counter()
+
+        # The search looks at _status_solving on every node, turning it off ends the count
+        self._counter._status_solving = True
+        self._timer = threading.Timer(self._budget, self._expire)
+        self._thread = threading.Thread(target=self._count, args=(self.grid,), daemon=True)
+        self._timer.start()
+        self._thread.start()
+
+    def stop(self):
+        '''Stop the running check, its result is dropped'''
+        if self._thread:
+            self._counter._status_solving = False
+            self._timer.cancel()
+            self._thread.join()
+            self._thread = None
+
+    def running(self):
+        return self._thread is not None and self.result is None
+
+    def elapsed(self):
+        '''Seconds since the last check started'''
+        return time.perf_counter() - self._started if self._started else 0.0
+
+    def _expire(self):
+        self._counter._status_solving = False
+
+    def _count(self, grid):
+        solutions = self._counter.count_solutions(grid, 2, check_stop=True)
+        self._timer.cancel()
+
+        # Cut short: two solutions are still proof, fewer prove nothing
+        # A count that finished is trusted, even if the budget ran out just after
+        if solutions < 2 and self._counter.stopped:
+            if self._started and time.perf_counter() - self._started >= self._budget:
+                self.result = 'timeout'
+            return
+
+        self._counter._status_solving = False
+        self.result = self._RESULTS[solutions]
@@ -0,0 +1,124 @@
+import math, multiprocessing, time
+import bitmask_solver, board_model, dlx_solver
+
+
+_SOLVERS = {
+    'Bitmask': bitmask_solver.BitmaskSolver,
+    'DLX': dlx_solver.DLXSolver,
+}
+
+
+def _stats(solver, steps):
+    return {'nodes': solver.nodes, 'backtracks': solver.backtracks, 'candidates': solver.candidates, 'steps': steps}
+
+
+def _solve(algorithm, buffer, connection, interval):
+    '''
+    Worker process: solve the grid sent as one byte per cell, send the grid back the same way
+    (with the search statistics) every interval seconds while searching, and once more when done
+    '''
+    grid = bytearray(buffer)
+    side = math.isqrt(len(grid))
+    solver = _SOLVERS[algorithm]()
+    steps = 0
+    last_sent = time.perf_counter()
+
+    for i, j, value in solver.steps(grid):
+        grid[i * side + j] = value
+        steps += 1
+
+        if not steps % 256 and time.perf_counter() - last_sent > interval:
+            connection.send(('progress', _stats(solver, steps), bytes(grid)))
+            last_sent = time.perf_counter()
+
+    connection.send(('done', solver._status_solved, _stats(solver, steps), bytes(grid)))
+    connection.close()
+
+
+class SolverWorker:
+    '''
+    Run a solving algorithm in its own process, so the search never competes
+    with the game loop for the GIL
+    The process can be killed at any time, and is killed once timeout seconds have passed
+    '''
+
+    # Seconds between two progress updates from the worker
+    _PROGRESS_INTERVAL = 0.05
+
+    def __init__(self, algorithm, grid, timeout=None) -> None:
+        self._algorithm = algorithm
+        self._buffer = bytes(board_model.flatten(grid))
+        self._timeout = timeout
+
+        self.status = 'ready'
+        self.stats = {}
+
+        self._process = None
+        self._connection = None
+        self._started = None
+
+    def start(self):
+        # Spawn a clean interpreter, forking a process that runs SDL and other threads isn't safe
+        context = multiprocessing.get_context('spawn')
+        self._connection, child_connection = context.Pipe(duplex=False)
+
+        self._process = context.Process(
+            target=_solve,
+            args=(self._algorithm, self._buffer, child_connection, self._PROGRESS_INTERVAL),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+
+        self._started = time.perf_counter()
+        self.status = 'running'
+
+    def poll(self):
+        '''
+        Read what the worker sent since the last call, without blocking
+        Return the latest grid (81 bytes, row by row) or None if nothing new came in,
+        status becomes 'solved', 'unsolvable', 'timeout' or 'failed' once the worker is done
+        '''
+        if self.status != 'running':
+            return None
+
+        buffer = None
+
+        try:
+            while self._connection.poll():
+                message = self._connection.recv()
+
+                if message[0] == 'progress':
+                    self.stats, buffer = message[1:]
+                else:
+                    solved, self.stats, buffer = message[1:]
+                    self.status = 'solved' if solved else 'unsolvable'
+                    self._close()
+                    break
+
+        # The worker died before sending its result
+        except (EOFError, OSError):
+            self.status = 'failed'
+            self.stop()
+
+        if self.status == 'running' and self._timeout and time.perf_counter() - self._started > self._timeout:
+            self.status = 'timeout'
+            self.stop()
+
+        return buffer
+
+    def stop(self):
+        '''Kill the worker straight away'''
+        if self.status == 'running':
+            self.status = 'stopped'
+
+        if self._process and self._process.is_alive():
+            self._process.kill()
+
+        self._close()
+
+    def _close(self):
+        if self._process:
+            self._process.join()
+        if self._connection:
+            self._connection.close()
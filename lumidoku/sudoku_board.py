@@ -1,5 +1,6 @@
-import threading, random, requests
+import queue, threading, random, time
 import pygame
+import bitmask_solver, board_model, dlx_solver, generator, parallel_solver, puzzle_pack, solution_cache, solution_checker, solver_worker, sudoku_core
 
 
 class Board:
@@ -23,65 +24,71 @@ class Board:
     
     _API_URL = 'https://sudoku-game-and-api.netlify.app/api/sudoku'
 
-    _SAMPLE_PUZZLES = {
-        'Easy': [
-            [7, 0, 9, 0, 0, 1, 6, 3, 0],
-            [0, 5, 1, 6, 8, 4, 9, 0, 0],
-            [0, 8, 6, 0, 0, 7, 0, 0, 0],
-            [5, 1, 0, 7, 2, 0, 3, 0, 9],
-            [4, 6, 7, 8, 3, 9, 2, 1, 5],
-            [9, 3, 0, 0, 0, 5, 7, 0, 6],
-            [0, 0, 5, 0, 0, 0, 0, 7, 3],
-            [8, 7, 0, 0, 6, 0, 0, 9, 1],
-            [1, 9, 4, 5, 7, 3, 8, 0, 2]
-        ],
-        'Medium': [
-            [9, 0, 5, 4, 8, 0, 0, 0, 3],
-            [2, 1, 0, 0, 0, 9, 6, 5, 8],
-            [0, 0, 0, 0, 2, 5, 0, 0, 4],
-            [0, 9, 7, 0, 6, 0, 0, 0, 5],
-            [0, 0, 8, 0, 0, 0, 3, 0, 0],
-            [5, 0, 0, 0, 4, 0, 7, 8, 0],
-            [8, 0, 0, 6, 1, 0, 0, 0, 0],
-            [7, 5, 6, 2, 0, 0, 0, 1, 9],
-            [1, 0, 0, 0, 9, 8, 4, 0, 7]
-        ],
-        'Hard': [
-            [0, 0, 0, 0, 0, 0, 4, 0, 8],
-            [7, 0, 0, 0, 3, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 6, 0, 0],
-            [5, 0, 0, 8, 0, 0, 0, 0, 0],
-            [0, 0, 0, 6, 0, 9, 0, 0, 0],
-            [0, 3, 0, 0, 0, 0, 0, 7, 0],
-            [0, 9, 6, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 5, 0, 0, 2, 0],
-            [4, 0, 8, 0, 0, 0, 0, 0, 0]
-        ],
+    # Seconds to wait for the API when no puzzle was fetched ahead of time
+    _FETCH_TIMEOUT = 10
+
+    # Solving speeds the player can switch between with the S key:
+    # (most solver steps, most seconds) spent on solving in each frame
+    _SOLVE_SPEEDS = {
+        'Max speed': (None, 0.012),
+        'Fast': (50, None),
+        'Animated': (1, None),
+    }
+
+    # Seconds a solver running in its own process gets before it's killed
+    _SOLVE_TIMEOUT = 30
+
+    # Seconds the background check of a custom puzzle gets to count its solutions,
+    # and how long it runs before the player is told it's still checking
+    _CHECK_BUDGET = 3
+    _CHECK_NOTICE = 0.25
+
+    # Side of the grids kept in the solution cache, on larger ones the canonical form costs about as much as a solve
+    _CACHED_SIDE = 9
+
+    _CHECK_MESSAGES = {
+        'unique': 'Unique Solution',
+        'multiple': 'Multiple Solutions',
+        'unsolvable': 'No Solution',
+        # Mostly sparse 25x25 puzzles, a few more clues usually settle them
+        'timeout': 'Check Timed Out, Add Clues',
     }
 
+    # Read without a window from sudoku_core
+    _SAMPLE_PUZZLES = sudoku_core.SAMPLE_PUZZLES
+
     def __init__(
             self,
             screen_size,
             cell_size,
             small_gap,
             big_gap,
-            font=None
+            font=None,
+            puzzle_source='api',
+            solve_speed='Max speed',
+            solve_in_process=False,
+            solve_parallel=False,
+            box_size=3,
+            cache_path=None,
+            api_url=None,
+            pack_path=None,
+            mouse_pos=None
     ) -> None:
 
-        self._CELL_SIZE = cell_size
+        # cell_size is the size of a 9x9 board's cells, other box sizes fit their cells in the same board
+        self._BASE_CELL_SIZE = cell_size
         self._SMALL_GAP = small_gap
         self._ADDITIONAL_GAP = (big_gap - small_gap) if big_gap > small_gap else 0
         self._SCREEN_WIDTH, self._SCREEN_HEIGHT = screen_size
-        self._BOARD_SIZE = 9 * self._CELL_SIZE + 8 * self._SMALL_GAP + 2 * self._ADDITIONAL_GAP
+        self._BOARD_SIZE = 9 * self._BASE_CELL_SIZE + 8 * self._SMALL_GAP + 2 * self._ADDITIONAL_GAP
         self._PADDING = (self._SCREEN_HEIGHT - self._BOARD_SIZE) // 2
-        self._FONT = pygame.font.SysFont('roboto', 60)
 
-        self._FULL_SET = {1, 2, 3, 4, 5, 6, 7, 8, 9}
-        self._values = [[0 for i in range(9)] for j in range(9)]
-        self._board = []
         self.difficulty = ''
         self.message = ''
 
+        # Puzzles loaded so far, so a recording can tell when a new one comes in (see replay.py)
+        self.puzzle_count = 0
+
         self._whole_board_rect = pygame.Rect(
             self._PADDING, self._PADDING, 
             self._BOARD_SIZE, self._BOARD_SIZE
@@ -93,6 +100,8 @@ class Board:
             self._BOARD_SIZE + 4 * self._ADDITIONAL_GAP
         )
         
+        # Where the mouse is, read from the window unless the input is replayed (see replay.py)
+        self._mouse_pos = mouse_pos or pygame.mouse.get_pos
         self._hover_mode = False
         self._mouse_clicked = False
         self._select_multiple_mode = False
@@ -100,107 +109,250 @@ class Board:
 
         self._current_loc = ()
         self._selected_cells = []
+
+        self._redraw_all = True
         
         self._status_solving = False
         self._status_solved = False
         self._status_fetching = False
 
+        # Puzzle of the last fetch, handed from its thread to poll_fetched, as (difficulty, values)
+        self._fetched = queue.Queue()
+
         self._user_input = False
 
+        # Solving algorithms the player can switch between with the Tab key
+        self._solvers = {
+            'Bitmask': bitmask_solver.BitmaskSolver(),
+            'DLX': dlx_solver.DLXSolver(),
+        }
+        self.algorithm = 'Bitmask'
+
+        # The running solver, advanced a few steps every frame by advance_solver
+        self._solve_steps = None
+        self.solve_speed = solve_speed
+
+        # Or the solver running in its own process, polled every frame
+        self._worker = None
+        self._last_worker_stats = {}
+        self.solve_in_process = solve_in_process
+
+        # Or split over every core, on a process pool started the first time it's used
+        self.solve_parallel = solve_parallel
+        self._parallel_solver = None
+
+        # Counts the solutions of custom puzzles in the background, as clues are typed and on Play
+        self._checker = solution_checker.SolutionChecker(self._CHECK_BUDGET)
+        self._check_pending = False
+
+        # Solutions of the puzzles solved so far, any puzzle equivalent to one of them is solved by a lookup
+        # (kept in cache_path as well when it's given)
+        self._solution_cache = solution_cache.SolutionCache(path=cache_path)
+        self._solved_from_cache = False
+
+        # Timing of the last (or running) solve, see solver_stats
+        self._solve_started = None
+        self._solve_seconds = 0.0
+        self._solve_step_count = 0
+
+        # New puzzles come from the API ('api') with the generator as fallback,
+        # from a puzzle pack ('pack', see puzzle_pack), straight from the generator ('generator'),
+        # or only from outside through load_puzzle ('external', as when replaying recorded input)
+        self._puzzle_source = puzzle_source
+        self._generator = generator.PuzzleGenerator()
+
+        # The pack is only opened (mapped, not read) the first time a puzzle is taken from it
+        self._pack_path = pack_path or puzzle_pack.DEFAULT_PATH
+        self._pack = None
+
+        # Keep a few API puzzles of each difficulty ready in the background,
+        # requests is only imported when the API is used
+        # api_url can point at any server answering like the API, such as puzzle_server.py
+        self._prefetcher = None
+        if self._puzzle_source == 'api':
+            import prefetcher
+            self._prefetcher = prefetcher.PuzzlePrefetcher(api_url or self._API_URL)
+            self._prefetcher.start()
+
+        self._set_box_size(box_size)
+        
+        # Choose one sample puzzle for the initial launch
+        self.get_api_puzzles()
+
+    def _set_box_size(self, box_size):
+        '''
+        Set up the grid, cell rects, font and glyphs for box_size x box_size boxes (3 for the usual 9x9 board),
+        the cells are sized to fit the same board area whatever the box size
+        '''
+        self._box_size = n = box_size
+        self._side = side = n * n
+
+        # Numbers, rule counts and undo history (CTRL+Z, CTRL+Y) of the grid, see sudoku_core
+        self._grid = sudoku_core.SudokuGrid(box_size)
+        self._model = self._grid.model
+        self._history = self._grid.history
+
+        self._CELL_SIZE = (self._BOARD_SIZE - (side - 1) * self._SMALL_GAP - (n - 1) * self._ADDITIONAL_GAP) // side
+        self._FONT = pygame.font.SysFont('roboto', round(60 * self._CELL_SIZE / self._BASE_CELL_SIZE))
+        self._highlight_width = max(2, round(4 * self._CELL_SIZE / self._BASE_CELL_SIZE))
+
+        # Pixels left over by rounding the cell size down, shared on both sides to keep the grid centered
+        offset = self._PADDING + (self._BOARD_SIZE - side * self._CELL_SIZE - (side - 1) * self._SMALL_GAP - (n - 1) * self._ADDITIONAL_GAP) // 2
+
+        self._current_loc = ()
+        self._selected_cells = []
+        self._value_selected = 0
+
+        # Each number is rendered once for every color it can be drawn in (letters from 10 on, see board_model.SYMBOLS)
+        self._glyphs = {
+            color: {
+                value: self._FONT.render(board_model.SYMBOLS[value], True, self._PALETTE[color])
+                for value in range(1, side + 1)
+            }
+            for color in ('beige', 'light green', 'orange')
+        }
+
+        # Row, column and rect of every cell, row by row
+        self._cells = []
+
         # Set up and initilize all the rects that will be used to draw cells
-        for i in range(9):
-            row = []
-            for j in range(9):
-                cell = pygame.Rect(
-                    self._PADDING + (self._CELL_SIZE + self._SMALL_GAP) * j + self._ADDITIONAL_GAP * (j // 3), 
-                    self._PADDING + (self._CELL_SIZE + self._SMALL_GAP) * i + self._ADDITIONAL_GAP * (i // 3), 
+        for i in range(side):
+            for j in range(side):
+                rect = pygame.Rect(
+                    offset + (self._CELL_SIZE + self._SMALL_GAP) * j + self._ADDITIONAL_GAP * (j // n), 
+                    offset + (self._CELL_SIZE + self._SMALL_GAP) * i + self._ADDITIONAL_GAP * (i // n), 
                     self._CELL_SIZE, self._CELL_SIZE
                 )
-                row.append({
-                    'rect': cell,
-                    'player_input': True,
-                })
-            self._board.append(row)
-        
-        # Choose one sample puzzle for the initial launch
+                self._cells.append(board_model.Cell(i, j, rect, side))
+
+        # What every cell looked like when it was last drawn, only changed cells are drawn again
+        self._drawn_cells = [None] * len(self._cells)
+        self._redraw_all = True
+
+    def switch_box_size(self):
+        '''Switch to the next board size (4x4, 9x9, 16x16 or 25x25) with a new puzzle, unless the board is busy'''
+        if self.get_status() not in ('normal', 'solved'):
+            return
+
+        sizes = board_model.BOX_SIZES
+        self._set_box_size(sizes[(sizes.index(self._box_size) + 1) % len(sizes)])
         self.get_api_puzzles()
+        self.message = f'Board: {self._side}x{self._side}'
 
 
     def draw(self, screen):
-        '''Draw cells and their number (if any)'''
+        '''
+        Draw cells and their number (if any), only the cells that changed since last frame
+        Return the list of rects that need to be updated on the display
+        '''
         
-        # Draw the board border
-        pygame.draw.rect(screen, self._PALETTE['black'], self._board_border_rect)
+        dirty_rects = []
 
-        mouse = pygame.mouse.get_pos()
+        # Draw the board border, and every cell after it
+        if self._redraw_all:
+            pygame.draw.rect(screen, self._PALETTE['black'], self._board_border_rect)
+            dirty_rects.append(self._board_border_rect)
+            self._drawn_cells = [None] * len(self._cells)
+            self._redraw_all = False
+
+        mouse = self._mouse_pos()
         
-        for i in range(9):
-            for j in range(9):
-                
-                current_cell = self._board[i][j]
-
-                # Registering the coordination of a cell
-                # to draw the cell's highlight border when mouse hovers over a cell
-                if current_cell['rect'].collidepoint(mouse):
-                    self._current_loc = (i, j)
-
-                    if self._mouse_clicked:
-                        # Clicking on a number will highlight all the cells will the same number
-                        if not self._select_multiple_mode and self._values[i][j] > 0:
-                            self._value_selected = self._values[i][j]
-                        # Clicking on empty cells will remove the highlight
-                        else:
-                            self._value_selected = 0
+        if self._whole_board_rect.collidepoint(mouse):
+            self._handle_mouse(mouse)
 
-                        # Click again to already selected cell would deselect that cell 
-                        if (i, j) in self._selected_cells:
-                            self._selected_cells.remove((i, j))
-                        
-                        else:
-                            # If you hold CTRL, you can select multiple cells
-                            if self._select_multiple_mode:
-                                self._selected_cells.append((i, j))
-                            
-                            # If you don't hold CTRL, then each mouse click to a different cell 
-                            # would deselect the old ones 
-                            else:
-                                self._selected_cells = [(i, j)]
-    
-                        self._mouse_clicked = False
+        hovered_cell = self._current_loc if self._hover_mode else None
+        conflicts = self.conflicts()
 
-                # Cell color depends on if current cell is selected or not
-                cell_color = self._PALETTE['dark cyan'] if (i, j) in self._selected_cells\
-                         else self._PALETTE['dark green']
-                pygame.draw.rect(screen, cell_color, current_cell['rect'], 0)
+        values = self._model.view
 
-                # Only draw cell number if it's not 0 (empty cell)
-                if self._values[i][j] > 0:
-                    if self._value_selected == self._values[i][j]:
-                        text_color = self._PALETTE['orange']
-                    else:
-                    # Number color depends on if it's player answer or not
-                        text_color = self._PALETTE['beige'] if not current_cell['player_input'] else self._PALETTE['light green']
+        for cell in self._cells:
 
-                    text = self._FONT.render(str(self._values[i][j]), True, text_color)
-                    
-                    text_rect = text.get_rect()
-                    text_rect.center = current_cell['rect'].center
-                    screen.blit(text, text_rect)
+            value = values[cell.index]
+            coord = (cell.row, cell.col)
+            text_color = None
+
+            # Only draw cell number if it's not 0 (empty cell)
+            if value > 0:
+                if self._value_selected == value:
+                    text_color = 'orange'
+                else:
+                # Number color depends on if it's player answer or not
+                    text_color = 'beige' if self._model.is_given(*coord) else 'light green'
+
+            state = (value, text_color, coord in self._selected_cells, coord == hovered_cell, coord in conflicts)
+
+            if state == self._drawn_cells[cell.index]:
+                continue
+
+            self._drawn_cells[cell.index] = state
+            self._draw_cell(screen, cell.rect, *state)
+            dirty_rects.append(cell.rect)
 
-        # Draw the cell's highlight border base on registered mouse location
-        if self._hover_mode:
-            i, j = self._current_loc
-            pygame.draw.rect(screen, self._PALETTE['green'], self._board[i][j]['rect'], 4)
+        return dirty_rects
 
-        if self._selected_cells:
-            for (i, j) in self._selected_cells:
-                pygame.draw.rect(screen, self._PALETTE['orange'], self._board[i][j]['rect'], 4)
+    def redraw_all(self):
+        '''Draw the whole board again on the next frame'''
+        self._redraw_all = True
+
+    def _draw_cell(self, screen, rect, value, text_color, selected, hovered, conflict):
+        # Cell color depends on if current cell is selected or breaks Sudoku rule
+        if selected:
+            cell_color = self._PALETTE['dark cyan']
+        elif conflict:
+            cell_color = self._PALETTE['dark red']
+        else:
+            cell_color = self._PALETTE['dark green']
+        pygame.draw.rect(screen, cell_color, rect, 0)
+
+        if text_color:
+            text = self._glyphs[text_color][value]
+            screen.blit(text, text.get_rect(center=rect.center))
+
+        # Highlight border of the cell under the mouse, and of the selected cells
+        if hovered:
+            pygame.draw.rect(screen, self._PALETTE['green'], rect, self._highlight_width)
+
+        if selected:
+            pygame.draw.rect(screen, self._PALETTE['orange'], rect, self._highlight_width)
+
+    def _handle_mouse(self, mouse):
+        '''Register the cell under the mouse, and select it when clicked'''
+        for cell in self._cells:
+
+            # Registering the coordination of a cell
+            # to draw the cell's highlight border when mouse hovers over a cell
+            if cell.rect.collidepoint(mouse):
+                i, j = self._current_loc = (cell.row, cell.col)
+                value = self._model.values[cell.index]
+
+                if self._mouse_clicked:
+                    # Clicking on a number will highlight all the cells will the same number
+                    if not self._select_multiple_mode and value > 0:
+                        self._value_selected = value
+                    # Clicking on empty cells will remove the highlight
+                    else:
+                        self._value_selected = 0
+
+                    # Click again to already selected cell would deselect that cell 
+                    if (i, j) in self._selected_cells:
+                        self._selected_cells.remove((i, j))
+                    
+                    else:
+                        # If you hold CTRL, you can select multiple cells
+                        if self._select_multiple_mode:
+                            self._selected_cells.append((i, j))
+                        
+                        # If you don't hold CTRL, then each mouse click to a different cell 
+                        # would deselect the old ones 
+                        else:
+                            self._selected_cells = [(i, j)]
 
+                    self._mouse_clicked = False
 
     def handle_events(self, events):
         '''Determine how mouse and keys affect the board'''
 
-        mouse = pygame.mouse.get_pos()
+        mouse = self._mouse_pos()
 
         mouse_inside_board = self._whole_board_rect.collidepoint(mouse)
 
@@ -212,6 +364,13 @@ class Board:
             # Turn on/off select multiple mode when Ctrl key is held or not
             if event.type == pygame.KEYDOWN and event.key in (pygame.K_RCTRL, pygame.K_LCTRL):
                 self._select_multiple_mode = True
+
+            # CTRL+Z undo the last edit, CTRL+Y or CTRL+SHIFT+Z redo it
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL and event.key in (pygame.K_z, pygame.K_y):
+                if event.key == pygame.K_y or event.mod & pygame.KMOD_SHIFT:
+                    self.redo()
+                else:
+                    self.undo()
                 
             elif event.type == pygame.KEYUP and event.key in (pygame.K_RCTRL, pygame.K_LCTRL):
                 self._select_multiple_mode = False
@@ -226,20 +385,106 @@ class Board:
                 self._selected_cells = []
 
             # Backspace and Del key would remove value in the already input cells
-            elif event.type == pygame.KEYUP and event.key in (pygame.K_BACKSPACE, pygame.K_DELETE):
+            elif event.type == pygame.KEYUP and event.key in (pygame.K_BACKSPACE, pygame.K_DELETE) and not (self._status_fetching or self._status_solving):
+                self._history.begin()
                 for i, j in self._selected_cells:
-                    self._values[i][j] = 0
+                    self._grid.set_value(i, j, 0)
+                self._history.end()
+                self._check_custom_puzzle()
+
+            # Tab key would switch to the next solving algorithm
+            elif event.type == pygame.KEYUP and event.key == pygame.K_TAB:
+                self.switch_algorithm()
+
+            # F2 key would switch to the next board size
+            elif event.type == pygame.KEYUP and event.key == pygame.K_F2:
+                self.switch_box_size()
+
+            # S key would switch to the next solving speed
+            elif event.type == pygame.KEYUP and event.key == pygame.K_s:
+                self.switch_solve_speed()
+
+            # P key would switch between solving in the game, in its own process and on every core
+            elif event.type == pygame.KEYUP and event.key == pygame.K_p and not self._status_solving and not self._is_typing(event):
+                self.switch_solve_process()
+
+            # H key would select the next cell that can be filled in by logic
+            elif event.type == pygame.KEYUP and event.key == pygame.K_h and self.get_status() == 'normal' and not self._is_typing(event):
+                self.hint()
 
             # Register player input
-            if event.type == pygame.TEXTINPUT and self._selected_cells and not self._status_fetching:
-                if event.text and (text := event.text[-1]).isdigit():
-                    
-                    value = int(text)
+            if event.type == pygame.TEXTINPUT and self._selected_cells and not (self._status_fetching or self._status_solving):
+                # Numbers from 10 on are typed as letters, A for 10 up to P for 25
+                if event.text and 0 <= (value := board_model.SYMBOLS.find(event.text[-1].upper())) <= self._side:
 
+                    # Numbers typed in all the selected cells at once are a single edit
+                    self._history.begin()
                     for i, j in self._selected_cells:
-                        if self._board[i][j]['player_input'] and\
-                            (value == 0 or value in self._find_available((i, j), self._values)):
-                            self._values[i][j] = value
+                        if not self._model.is_given(i, j) and\
+                            (value == 0 or self._grid.is_available(i, j, value)):
+                            self._grid.set_value(i, j, value)
+                    self._history.end()
+
+                    self._check_finished()
+                    self._check_custom_puzzle()
+
+    def _is_typing(self, event):
+        '''On 25x25 boards H and P are numbers too, so they go in the selected cells instead of running their shortcut'''
+        return bool(self._selected_cells) and 10 <= board_model.SYMBOLS.find(pygame.key.name(event.key).upper()) <= self._side
+
+    def hint(self):
+        '''Select the next cell the player can fill in without guessing, and name the technique that finds it'''
+        if self._grid.duplicates:
+            self.message = 'Fix Conflicts First'
+        elif hint := self._grid.hint():
+            i, j, value, technique = hint
+            self._selected_cells = [(i, j)]
+            self._value_selected = 0
+            self.message = f'Hint: {technique}'
+        else:
+            self.message = 'No Hint Found'
+
+    def _check_finished(self):
+        '''Mark the puzzle as finished once the player filled in the last cell'''
+        if not self._user_input and self.is_complete():
+            self._status_solved = True
+            self.message = 'Puzzle Finished'
+
+    def undo(self):
+        '''Take back the last player edit (or solve)'''
+        self._apply_history(self._grid.undo)
+
+    def redo(self):
+        '''Apply the last undone edit again'''
+        self._apply_history(self._grid.redo)
+
+    def _apply_history(self, step):
+        if self._status_fetching or self._status_solving:
+            return
+
+        if not step():
+            return
+
+        self.message = ''
+        self._status_solved = False
+        self._check_finished()
+        self._check_custom_puzzle()
+
+    def conflicts(self):
+        '''Return the cells whose number shows up more than once in their row, column or box'''
+        return self._grid.conflicts()
+
+    def check(self):
+        '''
+        Conflicts, candidates and filled/complete status of the board in one vectorized pass,
+        see validation.check_board (needs NumPy, so it's only imported here)
+        '''
+        import validation
+        return validation.check_board(self._model.view)
+
+    def is_complete(self):
+        '''Return True if every cell is filled in without breaking Sudoku rule'''
+        return self._grid.is_complete()
 
     # Board status would determine button functions
     def get_status(self):
@@ -255,60 +500,342 @@ class Board:
             return 'normal'
         
     def auto_solve(self, run=True):
-        '''Run the algorithm in a new thread'''
+        '''
+        Start the algorithm, it runs a few steps every frame (see advance_solver)
+        Use flag run=False to stop it
+        '''
         if run:
+            self.message = ''
             self._status_solving = True
-            solve_thread = threading.Thread(target=self._solve_wrapper, daemon=True)
-            solve_thread.start()
+            self._values_before_solve = bytes(self._model.values)
+            self._solve_started = time.perf_counter()
+            self._solve_step_count = 0
+
+            # A puzzle equivalent to one solved before is solved straight away,
+            # if the solution agrees with the numbers the player put in
+            self._puzzle_before_solve = self._model.puzzle()
+            self._solved_from_cache = False
+            if (solution := self._cached_solution()) is not None:
+                self._solved_from_cache = True
+                self._grid.copy_values(solution)
+                self._finish_solving()
+                self._solve_succeeded()
+
+            elif self.solve_in_process and self.solve_parallel:
+                self._worker = parallel_solver.ParallelWorker(self._get_parallel_solver(), self._model.view, self._SOLVE_TIMEOUT)
+                self._worker.start()
+
+            elif self.solve_in_process:
+                self._worker = solver_worker.SolverWorker(self.algorithm, self._model.view, self._SOLVE_TIMEOUT)
+                self._worker.start()
+            else:
+                self._solve_steps = self._solvers[self.algorithm].steps(self._values_before_solve)
+
+        elif self._status_solving:
+            self._stop_solving('Stop Finding Solution')
+
+    def _cached_solution(self):
+        if self._side != self._CACHED_SIDE or (solution := self._solution_cache.get(self._puzzle_before_solve)) is None:
+            return None
+
+        if any(value and value != solution[k] for k, value in enumerate(self._values_before_solve)):
+            return None
+
+        return solution
+
+    def _stop_solving(self, message):
+        '''Stop the running algorithm and take back the numbers it tried so far'''
+        self._finish_solving()
+        self.message = message
+
+        if self._worker:
+            self._worker.stop()
+            self._last_worker_stats = self._worker.stats
+            self._worker = None
+
+        if self._solve_steps:
+            self._solve_steps.close()
+            self._solve_steps = None
+
+        self._grid.copy_values(self._values_before_solve)
+
+    def _finish_solving(self):
+        self._status_solving = False
+        self._solve_seconds = time.perf_counter() - self._solve_started
+
+    def _solve_succeeded(self):
+        '''Keep the solution, the whole solve can be undone as one edit'''
+        self._history.record_diff(self._values_before_solve, self._model.values)
+        if self._side == self._CACHED_SIDE:
+            self._solution_cache.put(self._puzzle_before_solve, self._model.values)
+        self._status_solved = True
+        self.message = 'Puzzle Finished'
+
+    def solver_stats(self):
+        '''Search statistics and timing of the last (or running) solve'''
+        if self._solved_from_cache:
+            stats = {'nodes': 0, 'backtracks': 0, 'candidates': 0, 'steps': 0}
+        elif self._worker:
+            stats = dict(self._worker.stats)
+        elif self.solve_in_process:
+            stats = dict(self._last_worker_stats)
+        else:
+            solver = self._solvers[self.algorithm]
+            stats = {
+                'nodes': solver.nodes,
+                'backtracks': solver.backtracks,
+                'candidates': solver.candidates,
+                'steps': self._solve_step_count,
+            }
+
+        if self._status_solving:
+            stats['seconds'] = time.perf_counter() - self._solve_started
+        else:
+            stats['seconds'] = self._solve_seconds
+
+        stats['algorithm'] = 'Cache' if self._solved_from_cache else self.algorithm
+        return stats
+
+    def advance_solver(self):
+        '''
+        Run the algorithm for this frame's budget of steps or time,
+        every change is applied here so the grid is only ever touched by the game loop
+        '''
+        if self._worker:
+            self._advance_worker()
+            return
+
+        if not self._solve_steps:
+            return
+
+        max_steps, max_time = self._SOLVE_SPEEDS[self.solve_speed]
+        deadline = time.perf_counter() + max_time if max_time else None
+        steps = 0
+
+        try:
+            while max_steps is None or steps < max_steps:
+                i, j, value = next(self._solve_steps)
+                self._grid.set_value(i, j, value)
+                steps += 1
+                self._solve_step_count += 1
+
+                # Checking the clock is slow compared to a step, so only check it now and then
+                if deadline and not steps % 64 and time.perf_counter() > deadline:
+                    break
+
+        except StopIteration:
+            self._solve_steps = None
+            self._finish_solving()
+
+            if self._solvers[self.algorithm]._status_solved:
+                self._solve_succeeded()
+            else:
+                self.message = 'Could Not Find Solution'
+
+    def _advance_worker(self):
+        '''Show the latest grid from the solver process, and its result once it's done'''
+        if values := self._worker.poll():
+            self._grid.copy_values(values)
+
+        status = self._worker.status
+
+        if status == 'running':
+            return
+
+        self._last_worker_stats = self._worker.stats
+        self._worker = None
+
+        if status == 'solved':
+            self._finish_solving()
+            self._solve_succeeded()
+        elif status == 'timeout':
+            self._stop_solving('Solving Timed Out')
+        elif status == 'failed':
+            self._stop_solving('Solver Failed')
+        else:
+            self._stop_solving('Could Not Find Solution')
+
+    def switch_solve_speed(self):
+        '''Select the next solving speed'''
+        names = list(self._SOLVE_SPEEDS)
+        self.solve_speed = names[(names.index(self.solve_speed) + 1) % len(names)]
+        self.message = f'Speed: {self.solve_speed}'
+
+    def switch_solve_process(self):
+        '''Switch between solving in the game, in its own process and in parallel on every core'''
+        if not self.solve_in_process:
+            self.solve_in_process, self.solve_parallel = True, False
+            self.message = 'Solve In Process: On'
+        elif not self.solve_parallel:
+            self.solve_parallel = True
+            self.message = 'Solve In Process: Parallel'
         else:
-            self._status_solving = False
+            self.solve_in_process, self.solve_parallel = False, False
+            self.message = 'Solve In Process: Off'
+
+    def _get_parallel_solver(self):
+        if not self._parallel_solver:
+            self._parallel_solver = parallel_solver.ParallelSolver()
+
+        self._parallel_solver.algorithm = self.algorithm
+        return self._parallel_solver
+
+    def switch_algorithm(self):
+        '''Select the next solving algorithm, unless a solve is running'''
+        if self._status_solving:
+            return
+
+        names = list(self._solvers)
+        self.algorithm = names[(names.index(self.algorithm) + 1) % len(names)]
+        self.message = f'Algorithm: {self.algorithm}'
+
+    def count_solutions(self, limit=2):
+        '''Count the solutions of the current board, up to limit'''
+        return self._grid.count_solutions(limit)
+
+    def _check_custom_puzzle(self):
+        '''Check the custom puzzle again after every edit while the player types it in (not while it's empty)'''
+        if not self._user_input:
+            return
+
+        if self._grid.filled_cells:
+            self._check_solutions()
+        else:
+            self._checker.stop()
+            self._check_pending = False
+            self.message = ''
+
+    def _check_solutions(self):
+        '''
+        Count the solutions of the board in the background, the result shows up in poll_solution_check
+        A check already running (or done) on the same grid is kept
+        '''
+        self._check_pending = True
+        checker = self._checker
+
+        if checker.grid != bytes(self._model.values) or not (checker.running() or checker.result):
+            checker.start(self._model.view)
+
+    def poll_solution_check(self):
+        '''Show the result of the background solution check once it's known, called every frame'''
+        if not self._check_pending or self._checker.grid != bytes(self._model.values):
+            return
+
+        if (result := self._checker.result) is None:
+            if self._checker.running() and self._checker.elapsed() > self._CHECK_NOTICE:
+                self.message = 'Checking Solutions...'
+            return
+
+        self._check_pending = False
+        self.message = self._CHECK_MESSAGES[result]
+
+        # Played custom puzzles with one answer get a difficulty
+        if result == 'unique' and not self._user_input:
+            self.difficulty = self._grid.grade()
 
     def reset(self):
         '''Undo player answers back to initial puzzle'''
         self.message = ''
         self._status_solved = False
-        for i in range(9):
-            for j in range(9):
-                if self._board[i][j]['player_input']:
-                    self._values[i][j] = 0 
+        self._grid.reset()
 
     def empty_board(self):
         '''Return a black board for user to fill in custom puzzle'''
         self.message = ''
         self._status_solved = False
-        for i in range(9):
-            for j in range(9):
-                self._values[i][j] = 0
-                self._board[i][j]['player_input'] = True
+        self._checker.stop()
+        self._check_pending = False
+        self._grid.clear()
 
     def update(self, values):
         '''Copy puzzle from a different source'''
         try:
-            for i in range(9):
-                for j in range(9):
-                    if values[i][j]:
-                        self._values[i][j] = values[i][j]
-                        self._board[i][j]['player_input'] = False
+            self._grid.load(values)
+            self.puzzle_count += 1
         except:
             self.get_sample_puzzles()
 
+    def load_puzzle(self, cells, difficulty=''):
+        '''Load a puzzle given from outside as flat cells, such as a recorded one being replayed'''
+        g = board_model.geometry_of(cells)
+        side = g.side
+
+        if side != self._side:
+            self._set_box_size(g.box_size)
+
+        self.empty_board()
+        self.difficulty = difficulty
+        self.update([list(cells[i * side:i * side + side]) for i in range(side)])
+
     def get_sample_puzzles(self):
+        '''Load a random puzzle of the puzzle pack, or one of the built-in samples when there's no pack'''
+        # The pack and the sample puzzles are 9x9 only
+        if self._box_size != 3:
+            self.get_generated_puzzles()
+            return
+
         self.message = ''
         self._status_solved = False
-        self.difficulty = random.choice(('Easy', 'Medium', 'Hard'))
-        self.update(self._SAMPLE_PUZZLES[self.difficulty])
+        difficulty = random.choice(puzzle_pack.DIFFICULTIES)
+
+        if (pack := self._open_pack()) and (puzzle := pack.choice(difficulty) or pack.choice()):
+            self.difficulty, cells = puzzle
+            self.update([list(cells[i * 9:i * 9 + 9]) for i in range(9)])
+        else:
+            self.difficulty = difficulty
+            self.update(self._SAMPLE_PUZZLES[difficulty])
+
+    def _open_pack(self):
+        '''The puzzle pack, or None if it can't be opened'''
+        if self._pack is None:
+            try:
+                self._pack = puzzle_pack.PuzzlePack(self._pack_path)
+            except (OSError, ValueError):
+                self._pack = False
+
+        return self._pack
+
+    def get_generated_puzzles(self):
+        '''Build a new puzzle locally with a random difficulty'''
+        self.message = ''
+        self._status_solved = False
+        self.difficulty, puzzle = self._generate_puzzle()
+        self.update(puzzle)
+
+    def _generate_puzzle(self):
+        '''Return (difficulty, puzzle) for a new puzzle of a random difficulty, the board is left as is'''
+        difficulty = random.choice(('Easy', 'Medium', 'Hard'))
+
+        # The grade measured, the generator may not reach the difficulty asked for in time (or at all on large boards)
+        puzzle, grade = self._generator.generate_graded(difficulty, self._box_size)
+        return grade, puzzle
 
     def get_api_puzzles(self):
-        '''Send a request to an Api to get a new board'''
+        '''Load a board fetched ahead of time, or wait for a new one in the background'''
 
         self._status_solved = False
         self.message = ''
         self.difficulty = ''
 
         if not self._status_fetching:
-            self._status_fetching = True
             self.empty_board()
 
+            # A puzzle is usually ready, so there's nothing to wait for (the API only serves 9x9 puzzles)
+            if self._uses_api() and (puzzle := self._prefetcher.get()):
+                self._load_fetched(*puzzle)
+                return
+
+            # Nor for a pack puzzle, it's read straight from the file
+            if self._puzzle_source == 'pack' and self._box_size == 3:
+                self.get_sample_puzzles()
+                return
+
+            # External puzzles are loaded by whoever gives them, see load_puzzle
+            if self._puzzle_source == 'external':
+                return
+
+            self._status_fetching = True
+
             # Because fetching data take some times, so we start a new thread
             # to avoid freeze the game
             fetch_thread = threading.Thread(target=self._fetching_data, daemon=True)
@@ -327,106 +854,42 @@ class Board:
 
         else:
             self._user_input = False
-            for i in range(9):
-                for j in range(9):
-                    if self._values[i][j] > 0:
-                        self._board[i][j]['player_input'] = False
-    
-    def _solve_wrapper(self):
-        '''
-        Wrapper function for the main algorithm
-        Use to config some flags, messages
-        '''
-        self.message = ''
 
-        self._solve(self._values)
-
-        # After the process, if the message is neither about successfull nor stop solving
-        # then it means we could not find a solution
-        if not self.message:
-            self._status_solving = False
-            self._status_solved = False
-            self.message = 'Could Not Find Soluion'
-
-    def _find_available(self, coord, grid):
-        '''Find available numbers for a given cell'''
-        row, col = coord
-        avai = {grid[i][j] for i in range(row - row % 3, row - row % 3 + 3)
-                            for j in range(col - col % 3, col - col % 3 + 3)}\
-                | {grid[row][j] for j in range(9)}\
-                | {grid[i][col] for i in range(9)}
-        return self._FULL_SET - avai 
-    
-    def _find_empty_cell(self, grid):
-        '''Return the coordination of the first empty (value 0) cell'''
-        for i in range(9):
-            for j in range(9):
-                if grid[i][j] == 0:
-                    return (i, j)
-        return None
-
-    def _solve(self, grid):
-        '''
-        Find and fill in the possible numbers for the first empty cell,
-        then recursively do the same with all the empty cells after that,
-        until the grid is filled with numbers from 1-9 following Sudoku rule 
-        '''
-
-        if not self._status_solving and not self._status_solved:
-            self.message = 'Stop Finding Solution'
-            return False
-
-        # If there's no empty cell, the puzzle is solved
-        if not (coord := self._find_empty_cell(grid)):
-            self._status_solved = True
-            self._status_solving = False
-            self.message = 'Puzzle Finished'
-            return True
-        
-        possible_set = self._find_available(coord, grid)
-        i, j = coord
-
-        # Loop through all possible candidates for the cell
-        for number in possible_set:
+            # The numbers entered so far become the puzzle, they can't be undone anymore
+            self._grid.freeze()
 
-            # Fill in the possible candidate
-            grid[i][j] = number
-
-            # Run the algorithm on the new grid
-            solved = self._solve(grid)
+            # Let the player know if the custom puzzle has exactly one answer,
+            # counted in the background (usually already done while it was typed in)
+            self._check_solutions()
+    
+    def _uses_api(self):
+        return self._puzzle_source == 'api' and self._box_size == 3
 
-            if solved:
-                return True
-            
-            # If it's the wrong candidate, empty the cell again
-            else: 
-                grid[i][j] = 0
+    def _load_fetched(self, difficulty, values):
+        '''Load an API puzzle, graded by the techniques it needs rather than by the API's label'''
+        self.difficulty = self._generator.grade(values)
+        self.update(values)
 
-        return False
-        
     def _fetching_data(self):
         '''
-        Make an API call to get new boards
-        Verify its difficulty and return
+        Wait for the prefetcher to get new boards and grade the one taken, in the background
+        The board is only changed on the main thread: the puzzle is handed over to poll_fetched
         '''
+        puzzle = None
 
-        values = []
-        
-        try:
-            response = requests.get(self._API_URL)
-            
-            if response.status_code == 200:
-                difficulty = random.choice(('easy', 'medium', 'hard'))
-        
-                values = response.json()[difficulty]
-                self.difficulty = difficulty.capitalize()
-        
-                self.update(values)
-        except:
-            pass
+        if self._uses_api() and (fetched := self._prefetcher.get(timeout=self._FETCH_TIMEOUT)):
+            difficulty, values = fetched
+            puzzle = self._generator.grade(values), values
 
-        # In case fetching failed, then return 1 of 3 sample puzzles
-        if not values:
-            self.get_sample_puzzles()
+        # In case fetching failed (or the API is not used), then generate a new puzzle
+        self._fetched.put(puzzle or self._generate_puzzle())
+
+    def poll_fetched(self):
+        '''Load the puzzle fetched in the background once it's there, called every frame'''
+        try:
+            self.difficulty, values = self._fetched.get_nowait()
+        except queue.Empty:
+            return
 
+        self.update(values)
         self._status_fetching = False
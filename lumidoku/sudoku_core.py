@@ -0,0 +1,198 @@
+'''
+Sudoku grid and rules without any window or network: the numbers and given cells,
+row/column/box counts kept up to date on every change, undo history, solution counting and hints
+Only the standard library and the solver modules are imported, so scripts and worker processes
+that only solve don't pay for pygame, fonts or HTTP (see benchmark.py --startup)
+'''
+
+import board_model, dlx_solver, history, logic_solver
+
+
+SAMPLE_PUZZLES = {
+    'Easy': [
+        [7, 0, 9, 0, 0, 1, 6, 3, 0],
+        [0, 5, 1, 6, 8, 4, 9, 0, 0],
+        [0, 8, 6, 0, 0, 7, 0, 0, 0],
+        [5, 1, 0, 7, 2, 0, 3, 0, 9],
+        [4, 6, 7, 8, 3, 9, 2, 1, 5],
+        [9, 3, 0, 0, 0, 5, 7, 0, 6],
+        [0, 0, 5, 0, 0, 0, 0, 7, 3],
+        [8, 7, 0, 0, 6, 0, 0, 9, 1],
+        [1, 9, 4, 5, 7, 3, 8, 0, 2]
+    ],
+    'Medium': [
+        [9, 0, 5, 4, 8, 0, 0, 0, 3],
+        [2, 1, 0, 0, 0, 9, 6, 5, 8],
+        [0, 0, 0, 0, 2, 5, 0, 0, 4],
+        [0, 9, 7, 0, 6, 0, 0, 0, 5],
+        [0, 0, 8, 0, 0, 0, 3, 0, 0],
+        [5, 0, 0, 0, 4, 0, 7, 8, 0],
+        [8, 0, 0, 6, 1, 0, 0, 0, 0],
+        [7, 5, 6, 2, 0, 0, 0, 1, 9],
+        [1, 0, 0, 0, 9, 8, 4, 0, 7]
+    ],
+    'Hard': [
+        [0, 0, 0, 0, 0, 0, 4, 0, 8],
+        [7, 0, 0, 0, 3, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 6, 0, 0],
+        [5, 0, 0, 8, 0, 0, 0, 0, 0],
+        [0, 0, 0, 6, 0, 9, 0, 0, 0],
+        [0, 3, 0, 0, 0, 0, 0, 7, 0],
+        [0, 9, 6, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 5, 0, 0, 2, 0],
+        [4, 0, 8, 0, 0, 0, 0, 0, 0]
+    ],
+}
+
+
+class SudokuGrid:
+    '''
+    A grid of box_size x box_size boxes (3 for the usual 9x9) and its rule bookkeeping
+    Every change goes through set_value, so the counts, the duplicates and the undo history never drift apart
+    '''
+
+    def __init__(self, box_size=3) -> None:
+        self.box_size = box_size
+        self.side = side = box_size * box_size
+        self.geometry = board_model.geometry(box_size)
+
+        # Numbers and given cells of the grid, see board_model
+        self.model = board_model.BoardModel(box_size)
+
+        # Player edits that can be undone and redone, cleared on every new puzzle
+        self.history = history.EditHistory()
+
+        # How many times each number shows up in every row, column and box,
+        # kept up to date on every change (see set_value) so no check has to scan the grid
+        self._row_counts = [[0] * (side + 1) for i in range(side)]
+        self._col_counts = [[0] * (side + 1) for i in range(side)]
+        self._box_counts = [[0] * (side + 1) for i in range(side)]
+        self.filled_cells = 0
+        # Number of (row/column/box, number) pairs showing up more than once
+        self.duplicates = 0
+
+        self._counter = dlx_solver.DLXSolver()
+        self._logic_solver = logic_solver.LogicSolver()
+
+    def set_value(self, i, j, value):
+        '''Change the number of a cell, and its row, column and box counts along with it'''
+        old_value = self.model.get(i, j)
+
+        if value == old_value:
+            return
+
+        if self.history.recording:
+            self.history.record(i * self.side + j, old_value, value)
+
+        counts = (self._row_counts[i], self._col_counts[j], self._box_counts[self.geometry.box[i * self.side + j]])
+
+        if old_value:
+            self.filled_cells -= 1
+            for count in counts:
+                count[old_value] -= 1
+                if count[old_value] == 1:
+                    self.duplicates -= 1
+
+        if value:
+            self.filled_cells += 1
+            for count in counts:
+                count[value] += 1
+                if count[value] == 2:
+                    self.duplicates += 1
+
+        self.model.set(i, j, value)
+
+    def is_available(self, i, j, value):
+        '''Check if a number can go in a cell, using the row, column and box counts'''
+        return not (
+            self._row_counts[i][value] or
+            self._col_counts[j][value] or
+            self._box_counts[self.geometry.box[i * self.side + j]][value]
+        )
+
+    def conflicts(self):
+        '''Return the cells whose number shows up more than once in their row, column or box'''
+        if not self.duplicates:
+            return set()
+
+        return {
+            (i, j) for i in range(self.side) for j in range(self.side)
+            if (value := self.model.get(i, j)) and (
+                self._row_counts[i][value] > 1 or
+                self._col_counts[j][value] > 1 or
+                self._box_counts[self.geometry.box[i * self.side + j]][value] > 1
+            )
+        }
+
+    def is_complete(self):
+        '''Return True if every cell is filled in without breaking Sudoku rule'''
+        return self.filled_cells == self.geometry.size and not self.duplicates
+
+    def copy_values(self, values):
+        '''Copy a flat grid into this one, only the cells that differ are changed'''
+        current = self.model.values
+
+        for index, value in enumerate(values):
+            if current[index] != value:
+                self.set_value(index // self.side, index % self.side, value)
+
+    def load(self, values):
+        '''Copy a puzzle (a list of rows) into the grid as given cells, an empty grid is expected'''
+        self.history.clear()
+
+        for i in range(self.side):
+            for j in range(self.side):
+                if values[i][j]:
+                    self.set_value(i, j, values[i][j])
+                    self.model.set_given(i, j)
+
+    def clear(self):
+        '''Empty every cell, nothing is given anymore and there's nothing to undo'''
+        for i in range(self.side):
+            for j in range(self.side):
+                self.set_value(i, j, 0)
+        self.model.givens = 0
+        self.history.clear()
+
+    def reset(self):
+        '''Take back every player answer, as one edit that can be undone'''
+        self.history.begin()
+        for i in range(self.side):
+            for j in range(self.side):
+                if not self.model.is_given(i, j):
+                    self.set_value(i, j, 0)
+        self.history.end()
+
+    def freeze(self):
+        '''The numbers filled in so far become the puzzle, they can't be undone anymore'''
+        self.history.clear()
+        for i in range(self.side):
+            for j in range(self.side):
+                if self.model.get(i, j) > 0:
+                    self.model.set_given(i, j)
+
+    def undo(self):
+        '''Take back the last edit, return False if there was nothing to undo'''
+        return self._apply(self.history.undo())
+
+    def redo(self):
+        '''Apply the last undone edit again, return False if there was nothing to redo'''
+        return self._apply(self.history.redo())
+
+    def _apply(self, changes):
+        for index, value in changes:
+            self.set_value(index // self.side, index % self.side, value)
+
+        return bool(changes)
+
+    def count_solutions(self, limit=2):
+        '''Count the solutions of the grid, up to limit'''
+        return self._counter.count_solutions(self.model.view, limit)
+
+    def grade(self):
+        '''Difficulty of the grid from the hardest technique it needs, see logic_solver'''
+        return self._logic_solver.grade(self.model.view)
+
+    def hint(self):
+        '''The next number logic can place as (i, j, value, technique), or None, see LogicSolver.hint'''
+        return self._logic_solver.hint(self.model.view)
@@ -0,0 +1,167 @@
+'''
+Vectorized checks of many grids at once, with NumPy
+Same rules as SudokuGrid.is_available: a number may show up only once in its row, column and box
+Check a puzzle file without solving it:
+
+Usage: python validation.py puzzles.txt
+'''
+
+import argparse, functools, sys, time
+
+import numpy as np
+
+import board_model
+
+
+# Grids checked at a time, the counting keys take 4 bytes per cell (of a 9x9 grid, larger grids go fewer at a time)
+_CHUNK_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=None)
+def _tables(side):
+    '''
+    Bit of every digit in the candidate masks (digit 1 is bit 0), and the row, column and box of every cell,
+    counted from 0 in each grid, for side x side grids
+    '''
+    box_size = board_model.geometry_of(range(side * side)).box_size
+    dtype = np.uint16 if side <= 16 else np.uint32
+
+    bits = (1 << np.arange(side)).astype(dtype)
+    rows = np.arange(side, dtype=np.int32).repeat(side).reshape(side, side)
+    cols = rows.T.copy()
+    boxes = (rows // box_size) * box_size + cols // box_size
+
+    return bits, rows, cols, boxes
+
+
+def as_grids(grids, side=9):
+    '''
+    Turn grids into an (N, side, side) uint8 array, without copying when possible
+    Accepts an (N, 9, 9) or (N, 81) array, a single 9x9 grid or a flat 81 cells buffer (or the same for other sides)
+    '''
+    if isinstance(grids, (bytes, bytearray, memoryview)):
+        grids = np.frombuffer(grids, dtype=np.uint8)
+
+    return np.asarray(grids, dtype=np.uint8).reshape(-1, side, side)
+
+
+def _check_chunk(grids):
+    count, side = len(grids), grids.shape[-1]
+    bits, rows, cols, boxes = _tables(side)
+    values = np.minimum(grids, side + 1).astype(np.int32)
+    first_unit = np.arange(count, dtype=np.int32).reshape(-1, 1, 1) * side
+    conflicts = np.zeros(grids.shape, dtype=bool)
+    used = np.zeros(grids.shape, dtype=bits.dtype)
+
+    for units in (rows, cols, boxes):
+        # One counter for every (grid, unit, number), the key of each cell points at its own counter
+        keys = (first_unit + units) * (side + 2) + values
+        counts = np.bincount(keys.ravel(), minlength=count * side * (side + 2)).reshape(count, side, side + 2)
+
+        # A cell conflicts when its number shows up more than once in the unit
+        conflicts |= (counts.ravel()[keys] > 1) & (values > 0) & (values <= side)
+
+        # Numbers used by every unit as side bits masks, spread back over the unit's cells
+        masks = (counts[:, :, 1:side + 1] > 0).astype(bits.dtype) @ bits
+        used |= masks[:, units]
+
+    # Candidates are the numbers none of the cell's units use
+    return conflicts, ~used & bits.dtype.type((1 << side) - 1)
+
+
+def check(grids, side=9):
+    '''
+    Check every grid, return a dict of arrays:
+        valid       (N,) no number breaks Sudoku rule and every cell holds 0-9 (0 to side)
+        conflicts   (N, 9, 9) cells whose number shows up more than once in their row, column or box
+        candidates  (N, 9, 9) uint16 bitmask of the numbers not used by the cell's row, column and box
+                    (bit 0 for 1), filled cells included (uint32 for 25x25 grids)
+        filled      (N,) every cell holds a number
+        complete    (N,) filled and valid
+    '''
+    grids = as_grids(grids, side)
+    bits = _tables(side)[0]
+    chunk_size = max(1, _CHUNK_SIZE * 81 // (side * side))
+    conflicts = np.zeros(grids.shape, dtype=bool)
+    candidates = np.zeros(grids.shape, dtype=bits.dtype)
+
+    for start in range(0, len(grids), chunk_size):
+        end = start + chunk_size
+        conflicts[start:end], candidates[start:end] = _check_chunk(grids[start:end])
+
+    valid = ~conflicts.any(axis=(1, 2)) & (grids <= side).all(axis=(1, 2))
+    filled = (grids > 0).all(axis=(1, 2))
+
+    return {
+        'valid': valid,
+        'conflicts': conflicts,
+        'candidates': candidates,
+        'filled': filled,
+        'complete': filled & valid,
+    }
+
+
+def check_board(grid):
+    '''
+    Check a single grid (9 lists of 9 numbers or a flat 81 cells buffer, any size), as plain Python values:
+    the conflicting cells as a set of (i, j), the candidates as 9 lists of 9 sets of numbers
+    '''
+    cells = board_model.flatten(grid)
+    side = board_model.geometry_of(cells).side
+    result = check(as_grids(cells, side), side)
+    masks = result['candidates'][0].tolist()
+
+    return {
+        'valid': bool(result['valid'][0]),
+        'conflicts': {(int(i), int(j)) for i, j in np.argwhere(result['conflicts'][0])},
+        'candidates': [[{digit for digit in range(1, side + 1) if mask >> (digit - 1) & 1} for mask in row] for row in masks],
+        'filled': bool(result['filled'][0]),
+        'complete': bool(result['complete'][0]),
+    }
+
+
+def load_text(source):
+    '''Read 81 characters lines into an (N, 9, 9) array, lines that aren't a 9x9 grid are skipped'''
+    cells = bytearray()
+    skipped = 0
+
+    for line in source:
+        if (grid := board_model.parse_cells(line)) is None or len(grid) != 81:
+            skipped += line.strip() != ''
+        else:
+            cells += grid
+
+    return as_grids(cells), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check Sudoku grids from a file for broken rules')
+    parser.add_argument('puzzles', help='text file with one 81 characters grid per line, - for stdin')
+    parser.add_argument('-l', '--list', action='store_true', help='print the number of every grid breaking Sudoku rule, counting grids only (not skipped lines)')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.puzzles == '-' else open(args.puzzles)
+
+    try:
+        grids, skipped = load_text(source)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    start = time.perf_counter()
+    result = check(grids)
+    elapsed = time.perf_counter() - start
+
+    if args.list:
+        for index in np.flatnonzero(~result['valid']):
+            print(f'grid {index + 1}: {int(result["conflicts"][index].sum())} conflicting cells')
+
+    print(
+        f'{len(grids)} grids checked in {elapsed:.2f}s - invalid: {int((~result["valid"]).sum())}, '
+        f'complete: {int(result["complete"].sum())}, not a grid: {skipped}',
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# The game's modules import each other as top-level modules, the way lumidoku.py runs them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lumidoku'))
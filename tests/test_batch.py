@@ -0,0 +1,62 @@
+import io, random
+
+import pytest
+
+import batch, board_model, puzzle_pack
+
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+UNSOLVABLE = '55' + PUZZLE[2:]
+
+
+def puzzles(count, seed=0):
+    rng = random.Random(seed)
+    with puzzle_pack.PuzzlePack(puzzle_pack.DEFAULT_PATH) as pack:
+        return [board_model.format_cells(pack.choice(rng=rng)[1]) for _ in range(count)]
+
+
+def results(text):
+    return [line.split('\t') for line in text.splitlines()]
+
+
+@pytest.mark.parametrize('algorithm', ('Bitmask', 'DLX'))
+def test_solve_file(algorithm):
+    lines = puzzles(20) + [PUZZLE, UNSOLVABLE, 'not a puzzle', '.' * 81]
+    source = io.StringIO('# comments and blank lines are skipped\n\n' + '\n'.join(lines) + '\n')
+    output = io.StringIO()
+
+    # Small chunks on two workers, so results come back from several chunks in flight
+    counter = batch.solve_file(source, output, algorithm, workers=2, chunk_size=3)
+    rows = results(output.getvalue())
+
+    assert [puzzle for puzzle, solution, status, elapsed in rows] == lines
+    assert [status for puzzle, solution, status, elapsed in rows] == ['solved'] * 21 + ['unsolvable', 'invalid', 'solved']
+    assert rows[20][1] == SOLUTION and rows[21][1] == rows[22][1] == ''
+    assert all(float(elapsed) >= 0 for puzzle, solution, status, elapsed in rows)
+    assert counter == {'solved': 22, 'unsolvable': 1, 'invalid': 1}
+
+    for puzzle, solution, status, elapsed in rows[:20]:
+        assert all(given in '0.' or given == value for given, value in zip(puzzle, solution))
+
+
+def test_check_unique():
+    source = io.StringIO('\n'.join([PUZZLE, UNSOLVABLE, '0' * 81]))
+    output = io.StringIO()
+
+    counter = batch.solve_file(source, output, workers=1, check_unique=True)
+    rows = results(output.getvalue())
+
+    assert [status for puzzle, solution, status, elapsed in rows] == ['unique', 'unsolvable', 'multiple']
+    assert rows[0][1] == SOLUTION and rows[1][1] == '' and len(rows[2][1]) == 81
+    assert counter == {'unique': 1, 'unsolvable': 1, 'multiple': 1}
+
+
+def test_main(tmp_path, capsys):
+    source, output = tmp_path / 'puzzles.txt', tmp_path / 'solutions.txt'
+    source.write_text(PUZZLE + '\n' + UNSOLVABLE + '\n')
+
+    batch.main([str(source), '-o', str(output), '-w', '1', '-a', 'DLX'])
+
+    assert [row[:3] for row in results(output.read_text())] == [[PUZZLE, SOLUTION, 'solved'], [UNSOLVABLE, '', 'unsolvable']]
+    assert '2 puzzles' in capsys.readouterr().err
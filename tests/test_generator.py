@@ -0,0 +1,24 @@
+import pytest
+
+import bitmask_solver, generator
+
+
+@pytest.mark.parametrize('difficulty', ('Easy', 'Medium', 'Hard'))
+def test_puzzles_have_the_difficulty_asked_for(difficulty):
+    puzzles = generator.PuzzleGenerator(seed=0)
+    solver = bitmask_solver.BitmaskSolver()
+
+    for _ in range(10):
+        puzzle, grade = puzzles.generate_graded(difficulty)
+
+        assert grade == difficulty == puzzles.grade(puzzle)
+        assert solver.count_solutions(puzzle) == 1
+
+
+@pytest.mark.parametrize('box_size', (2, 4, 5))
+def test_other_sizes(box_size):
+    puzzle, grade = generator.PuzzleGenerator(seed=0).generate_graded('Medium', box_size)
+
+    assert len(puzzle) == box_size ** 2
+    assert grade in ('Easy', 'Medium', 'Hard')
+    assert bitmask_solver.BitmaskSolver().count_solutions(puzzle) == 1
@@ -0,0 +1,78 @@
+import random
+
+import history
+
+
+def apply(grid, changes):
+    for index, value in changes:
+        grid[index] = value
+
+
+def edit(record, grid, cells):
+    '''Change some cells as one edit, the way the board does'''
+    record.begin()
+    for index, value in cells:
+        record.record(index, grid[index], value)
+        grid[index] = value
+    record.end()
+
+
+def test_undo_redo_round_trip():
+    rng = random.Random(0)
+    record = history.EditHistory()
+    grid = bytearray(625)
+    states = [bytes(grid)]
+
+    # Single and multi-cell edits, one cell changed twice in the same edit, on a 25x25 board
+    for _ in range(50):
+        cells = [(rng.randrange(625), rng.randint(1, 25)) for _ in range(rng.randint(1, 4))]
+        edit(record, grid, cells)
+        states.append(bytes(grid))
+
+    for state in reversed(states[:-1]):
+        apply(grid, record.undo())
+        assert grid == state
+
+    assert record.undo() == []
+
+    for state in states[1:]:
+        apply(grid, record.redo())
+        assert grid == state
+
+    assert record.redo() == []
+
+
+def test_new_edit_drops_redo():
+    record = history.EditHistory()
+    grid = bytearray(81)
+
+    edit(record, grid, [(0, 5)])
+    edit(record, grid, [(1, 6)])
+    apply(grid, record.undo())
+    edit(record, grid, [(2, 7)])
+
+    assert record.redo() == []
+    apply(grid, record.undo())
+    apply(grid, record.undo())
+    assert grid == bytes(81)
+
+
+def test_empty_edits_and_diffs():
+    record = history.EditHistory()
+    grid = bytearray(81)
+
+    # An edit that changed nothing isn't kept
+    record.begin()
+    record.end()
+    assert record.undo() == []
+
+    # A solve is recorded as the difference between the grids before and after
+    solved = bytes(range(1, 82))
+    record.record_diff(grid, solved)
+    record.record_diff(solved, solved)
+    grid[:] = solved
+
+    apply(grid, record.undo())
+    assert grid == bytes(81)
+    apply(grid, record.redo())
+    assert grid == solved
@@ -0,0 +1,98 @@
+import http.server, json, threading, time
+
+import pytest
+
+import prefetcher
+
+
+GRID = [[(i * 3 + i // 3 + j) % 9 + 1 for j in range(9)] for i in range(9)]
+
+
+class StubApi(http.server.ThreadingHTTPServer):
+    '''Local stand-in for the puzzle API, answering every GET with status (and one grid of each difficulty if 200)'''
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.status = 200
+        self.requests = 0
+        self.url = f'http://127.0.0.1:{self.server_address[1]}/api'
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests += 1
+        body = json.dumps({'easy': GRID, 'medium': GRID, 'hard': GRID} if self.server.status == 200 else {}).encode()
+
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = StubApi()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(api):
+    fetcher = prefetcher.PuzzlePrefetcher(api.url, size=2, retries=0)
+    fetcher._BACKOFF = 0.05
+    fetcher._MAX_BACKOFF = 0.2
+    yield fetcher
+    fetcher.stop()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_refill_fills_every_queue(api, fetcher):
+    fetcher.start()
+
+    assert wait_until(lambda: all(fetcher.ready(difficulty) == 2 for difficulty in ('easy', 'medium', 'hard')))
+    assert api.requests == 2
+    assert fetcher.get('hard') == ('hard', GRID)
+
+
+def test_refill_keeps_the_other_grids_of_a_response(api, fetcher):
+    fetcher.start()
+    assert wait_until(lambda: fetcher.ready() == 6)
+
+    # Every easy puzzle taken brings a medium and a hard one along, kept until twice the queue size
+    for taken in range(4):
+        assert fetcher.get('easy', timeout=5) == ('easy', GRID)
+        assert wait_until(lambda: fetcher.ready('easy') == 2)
+
+    assert api.requests == 6
+    assert fetcher.ready('medium') == fetcher.ready('hard') == 4
+
+
+def test_backoff_after_failures_then_recovery(api, fetcher):
+    api.status = 500
+    fetcher.start()
+
+    assert wait_until(lambda: api.requests >= 1)
+    assert fetcher.get(timeout=5) is None
+
+    # Waits of 0.05, 0.1, 0.2, 0.2... seconds between requests, not one request after another
+    time.sleep(0.6)
+    assert 3 <= api.requests <= 7
+
+    api.status = 200
+    assert wait_until(lambda: fetcher.ready() == 6)
@@ -0,0 +1,117 @@
+import io, random
+
+import pytest
+
+import batch, board_model, puzzle_pack, validation
+
+
+def puzzles(count, seed=0):
+    '''Random (difficulty, cells) pairs, any values from 0 to 9 go through a pack'''
+    rng = random.Random(seed)
+    return [
+        (rng.choice(puzzle_pack.DIFFICULTIES), bytearray(rng.randrange(10) for _ in range(81)))
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def written(tmp_path):
+    path = tmp_path / 'puzzles.pack'
+    written = puzzles(50)
+    counts = puzzle_pack.write_pack(written, path)
+    return path, written, counts
+
+
+def test_cells_round_trip():
+    for difficulty, cells in puzzles(20):
+        record = puzzle_pack.pack_cells(cells)
+        assert len(record) == 41
+        assert puzzle_pack.unpack_cells(record) == cells
+
+
+def test_pack_round_trip(written):
+    path, written, counts = written
+
+    with puzzle_pack.PuzzlePack(path) as pack:
+        assert len(pack) == pack.count() == 50
+        assert {difficulty: pack.count(difficulty) for difficulty in puzzle_pack.DIFFICULTIES} == counts
+
+        # Records stay in import order, the index groups them by difficulty
+        assert [pack.puzzle(number) for number in range(50)] == [cells for difficulty, cells in written]
+        assert list(pack) == sorted(written, key=lambda puzzle: puzzle_pack.DIFFICULTIES.index(puzzle[0]))
+
+        with pytest.raises(IndexError):
+            pack.puzzle(50)
+        with pytest.raises(IndexError):
+            pack.puzzle_of('Hard', counts['Hard'])
+
+
+def test_choice(written):
+    path, written, counts = written
+    rng = random.Random(1)
+
+    with puzzle_pack.PuzzlePack(path) as pack:
+        for _ in range(100):
+            assert pack.choice(rng=rng) in written
+            difficulty, cells = pack.choice('Easy', rng)
+            assert difficulty == 'Easy' and ('Easy', cells) in written
+
+
+def test_empty_pack(tmp_path):
+    path = tmp_path / 'empty.pack'
+    puzzle_pack.write_pack([], path)
+
+    with puzzle_pack.PuzzlePack(path) as pack:
+        assert len(pack) == 0
+        assert pack.choice() is None
+        assert pack.choice('Medium') is None
+
+
+def test_text_round_trip(written):
+    path, written, counts = written
+    text = io.StringIO()
+
+    with puzzle_pack.PuzzlePack(path) as pack:
+        puzzle_pack.write_lines(pack, text, with_difficulty=True)
+        exported = list(pack)
+
+    lines = ['# comment\n', '\n', '123\tEasy\n'] + text.getvalue().splitlines(keepends=True)
+    assert list(puzzle_pack.read_lines(lines)) == exported
+
+
+def test_export_is_read_by_the_other_tools(tmp_path):
+    path = tmp_path / 'puzzles.pack'
+    text = io.StringIO()
+
+    with puzzle_pack.PuzzlePack(puzzle_pack.DEFAULT_PATH) as pack:
+        puzzle_pack.write_pack([pack.choice(difficulty, random.Random(0)) for difficulty in puzzle_pack.DIFFICULTIES], path)
+
+    with puzzle_pack.PuzzlePack(path) as pack:
+        puzzle_pack.write_lines(pack, text)
+        exported = [cells for difficulty, cells in pack]
+
+    lines = text.getvalue().splitlines(keepends=True)
+    assert [len(line) for line in lines] == [82] * 3
+
+    batch._init_worker('Bitmask')
+    assert [status for puzzle, solution, status, elapsed in batch._solve_chunk(lines, True)] == ['unique'] * 3
+
+    grids, skipped = validation.load_text(lines)
+    assert skipped == 0 and bytes(grids) == b''.join(exported)
+
+
+def test_unlabelled_lines_are_graded():
+    grid = [[(i * 3 + i // 3 + j) % 9 + 1 for j in range(9)] for i in range(9)]
+    cells = bytearray(board_model.flatten(grid))
+
+    assert list(puzzle_pack.read_lines([board_model.format_cells(cells)])) == [('Easy', cells)]
+    assert list(puzzle_pack.read_lines([board_model.format_cells(cells)], 'Hard')) == [('Hard', cells)]
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / 'puzzles.txt'
+
+    for content in (b'', b'not a pack at all, just some text that is long enough'):
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            puzzle_pack.PuzzlePack(path)
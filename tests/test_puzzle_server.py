@@ -0,0 +1,130 @@
+import asyncio, itertools, json
+from concurrent.futures import ThreadPoolExecutor
+
+import board_model, puzzle_server
+
+
+def run(test):
+    '''Run an async test body against a started server, closed afterwards'''
+    async def main():
+        server = puzzle_server.PuzzleServer(port=0, workers=1, pool_size=1)
+        server._PUZZLE_TIMEOUT = 10
+        server._RETRY_DELAY = 0.01
+        await server.start()
+        try:
+            await test(server)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+PUZZLE = '530070000600195000098000060800060003400803001700020006060000280000419005000080079'
+SOLUTION = '534678912672195348198342567859761423426853791713924856961537284287419635345286179'
+SOLUTION_CELLS = bytes(board_model.parse_cells(SOLUTION))
+
+
+async def request(server, method, path, body=b'', length=None):
+    '''
+    Send one request on a new connection, return the status and the decoded JSON response
+    With a length, only the headers announcing a body that long are sent
+    '''
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    head = f'{method} {path} HTTP/1.1\r\nContent-Length: {len(body) if length is None else length}\r\nConnection: close\r\n\r\n'
+    writer.write(head.encode() + body)
+
+    status = int((await reader.readline()).split()[1])
+    response = (await reader.read()).partition(b'\r\n\r\n')[2]
+    writer.close()
+
+    return status, json.loads(response)
+
+
+def threaded(monkeypatch):
+    '''Run the server's jobs on threads, so the test can swap the functions they call'''
+    monkeypatch.setattr(puzzle_server.PuzzleServer, '_new_executor', lambda self: ThreadPoolExecutor(self.workers, initializer=puzzle_server._init_worker))
+
+
+def test_refill_keeps_going_after_generator_errors(monkeypatch, capsys):
+    threaded(monkeypatch)
+    generate, calls = puzzle_server._generate, itertools.count()
+
+    def failing(difficulty):
+        if next(calls) < 3:
+            raise RuntimeError('generator failed')
+        return generate(difficulty)
+
+    monkeypatch.setattr(puzzle_server, '_generate', failing)
+
+    async def test(server):
+        assert set(await server.puzzles()) == {'easy', 'medium', 'hard'}
+        assert server.stats['failed'] == 3
+
+    run(test)
+    assert 'RuntimeError: generator failed' in capsys.readouterr().err
+
+
+def test_refill_replaces_a_broken_pool():
+    async def test(server):
+        await server.puzzles()
+        broken = server._executor
+
+        # A worker killed (out of memory for one) breaks the whole pool
+        for process in list(broken._processes.values()):
+            process.kill()
+
+        for request in range(2):
+            await server.puzzles()
+
+        assert server._executor is not broken
+        assert server.stats['failed'] >= 1
+
+    run(test)
+
+
+def test_error_codes():
+    async def test(server):
+        assert (await request(server, 'GET', '/nope'))[0] == 404
+        assert (await request(server, 'POST', '/api/sudoku'))[0] == 405
+        assert (await request(server, 'GET', '/solve'))[0] == 405
+        assert (await request(server, 'POST', '/solve', b'not json'))[0] == 400
+        assert (await request(server, 'POST', '/solve', b'{"grids": []}'))[0] == 400
+        assert (await request(server, 'POST', '/solve', b'{"puzzles": "' + PUZZLE.encode() + b'"}'))[0] == 400
+
+        too_many = json.dumps({'puzzles': [PUZZLE] * (server._MAX_BATCH + 1)}).encode()
+        assert (await request(server, 'POST', '/solve', too_many))[0] == 413
+        assert (await request(server, 'POST', '/solve', length=server._MAX_BODY + 1))[0] == 413
+
+    run(test)
+
+
+def test_solve_request():
+    async def test(server):
+        unsolvable = '55' + PUZZLE[2:]
+        rows = [[int(digit) for digit in PUZZLE[i * 9:i * 9 + 9]] for i in range(9)]
+        body = json.dumps({'puzzles': [PUZZLE, 'x' * 81, rows, [[1, 2], [3]], unsolvable]}).encode()
+
+        status, response = await request(server, 'POST', '/solve', body)
+
+        assert status == 200
+        assert response['status'] == ['solved', 'invalid', 'solved', 'invalid', 'unsolvable']
+        assert response['solutions'][0] == SOLUTION
+        assert response['solutions'][2] == [[int(digit) for digit in SOLUTION[i * 9:i * 9 + 9]] for i in range(9)]
+        assert response['solutions'][1] is response['solutions'][3] is response['solutions'][4] is None
+
+    run(test)
+
+
+def test_requests_for_the_same_puzzle_are_coalesced():
+    async def test(server):
+        puzzle = bytes(board_model.parse_cells(PUZZLE))
+
+        # Duplicates inside a request are solved once, and a second request joins the solve in flight
+        first, second = await asyncio.gather(server.solve([puzzle, puzzle]), server.solve([puzzle]))
+
+        assert first == [SOLUTION_CELLS, SOLUTION_CELLS] and second == [SOLUTION_CELLS]
+        assert server.stats['solved'] == 1
+        assert server.stats['coalesced'] == 1
+        assert not server._solving
+
+    run(test)
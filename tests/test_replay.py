@@ -0,0 +1,75 @@
+import json
+
+import pygame
+import pytest
+
+import board_model, replay
+
+
+PUZZLE = board_model.parse_cells('530070000600195000098000060800060003400803001700020006060000280000419005000080079')
+
+
+@pytest.fixture
+def headless(monkeypatch):
+    # No window and no sound, as replay.main sets up
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    monkeypatch.setenv('SDL_AUDIODRIVER', 'dummy')
+
+
+def record(path):
+    '''Record a short session: a puzzle comes in, a click on the empty cell (0, 2), and a 4 typed in it'''
+    import lumidoku, sudoku_board
+
+    pygame.init()
+    size = lumidoku.Game._SCREEN_WIDTH, lumidoku.Game._SCREEN_HEIGHT
+    pygame.display.set_mode(size)
+
+    board = sudoku_board.Board(size, cell_size=70, small_gap=2, big_gap=6, puzzle_source='external', mouse_pos=lambda: (0, 0))
+    board.load_puzzle(PUZZLE, 'Easy')
+    mouse = next(cell.rect.center for cell in board._cells if (cell.row, cell.col) == (0, 2))
+
+    recorder = replay.InputRecorder(path)
+    recorder.record([], (0, 0), board)
+    recorder.record([pygame.event.Event(pygame.MOUSEBUTTONUP, pos=mouse, button=1)], mouse, board)
+    recorder.record([pygame.event.Event(pygame.TEXTINPUT, text='4'), pygame.event.Event(pygame.QUIT)], mouse, board)
+    recorder.close()
+    pygame.quit()
+
+
+def test_replay_plays_the_recorded_input(tmp_path, headless):
+    import lumidoku
+
+    path = str(tmp_path / 'session.jsonl')
+    record(path)
+
+    player = replay.InputPlayer(path)
+    assert len(player) == 3
+
+    # The recorded QUIT doesn't end the replay early, every frame is played
+    game = lumidoku.Game(player=player)
+    game.main_loop()
+
+    expected = bytearray(PUZZLE)
+    expected[2] = 4
+    assert bytes(game._board._model.values) == expected
+    assert game._board.difficulty == 'Easy'
+
+
+def test_replay_times_every_frame(tmp_path, headless):
+    path = str(tmp_path / 'session.jsonl')
+    record(path)
+
+    summary = replay.replay(path)
+
+    # The frame of the QUIT event that ends the replay isn't timed
+    assert summary['frames'] == 3
+    assert {'events', 'draw_board', 'frame'} <= set(summary['sections'])
+    assert summary['sections']['frame']['p50'] <= summary['sections']['frame']['max_ms']
+
+
+def test_other_versions_are_refused(tmp_path):
+    path = tmp_path / 'session.jsonl'
+    path.write_text(json.dumps({'version': 0}) + '\n')
+
+    with pytest.raises(ValueError):
+        replay.InputPlayer(str(path))
@@ -0,0 +1,112 @@
+import pytest
+
+import bitmask_solver, puzzle_pack, solution_cache
+
+
+with puzzle_pack.PuzzlePack(puzzle_pack.DEFAULT_PATH) as pack:
+    PUZZLE = pack.puzzle_of('Hard', 0)
+    OTHER = pack.puzzle_of('Easy', 0)
+
+
+def solved(puzzle):
+    solution = bytearray(puzzle)
+    solver = bitmask_solver.BitmaskSolver()
+    solver._status_solving = True
+    assert solver.solve(solution)
+    return solution
+
+
+def transposed(cells):
+    return bytearray(cells[j * 9 + i] for i in range(9) for j in range(9))
+
+
+def relabelled(cells):
+    # 1 -> 2 -> ... -> 9 -> 1, empty cells stay empty
+    return bytearray(value % 9 + 1 if value else 0 for value in cells)
+
+
+def bands_swapped(cells):
+    # Rows 0-2 and 6-7-8 swap places, and the rows of the middle band are reversed
+    order = [6, 7, 8, 5, 4, 3, 0, 1, 2]
+    return bytearray(cells[row * 9 + j] for row in order for j in range(9))
+
+
+def stacks_swapped(cells):
+    order = [3, 4, 5, 0, 1, 2, 8, 7, 6]
+    return bytearray(cells[i * 9 + col] for i in range(9) for col in order)
+
+
+@pytest.mark.parametrize('transform', (transposed, relabelled, bands_swapped, stacks_swapped, lambda cells: relabelled(transposed(bands_swapped(cells)))))
+def test_equivalent_puzzles_hit(transform):
+    cache = solution_cache.SolutionCache()
+    cache.put(PUZZLE, solved(PUZZLE))
+
+    puzzle = transform(PUZZLE)
+    assert cache.get(puzzle) == transform(solved(PUZZLE))
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_canonical_form_is_shared():
+    key, transform = solution_cache.canonical_form(bytes(PUZZLE))
+
+    for cells in (transposed(PUZZLE), relabelled(PUZZLE), bands_swapped(stacks_swapped(PUZZLE))):
+        other_key, other_transform = solution_cache.canonical_form(bytes(cells))
+        assert other_key == key
+        assert solution_cache.fingerprint(cells) == solution_cache.fingerprint(PUZZLE) == solution_cache.fingerprint(key)
+        assert solution_cache.from_canonical(solution_cache.to_canonical(cells, other_transform), other_transform) == cells
+
+
+def test_other_puzzles_miss():
+    cache = solution_cache.SolutionCache()
+    cache.put(PUZZLE, solved(PUZZLE))
+
+    # A played grid isn't the puzzle it came from, the cache is keyed on the givens
+    played = bytearray(PUZZLE)
+    played[PUZZLE.index(0)] = solved(PUZZLE)[PUZZLE.index(0)]
+
+    assert cache.get(OTHER) is None
+    assert cache.get(played) is None
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entry_goes_first():
+    cache = solution_cache.SolutionCache(maxsize=2)
+    third = bands_swapped(OTHER)
+    third[third.index(0)] = solved(third)[third.index(0)]
+
+    cache.put(PUZZLE, solved(PUZZLE))
+    cache.put(OTHER, solved(OTHER))
+    cache.get(PUZZLE)
+    cache.put(third, solved(third))
+
+    assert len(cache) == 2
+    assert cache.get(OTHER) is None
+    assert cache.get(PUZZLE) == solved(PUZZLE)
+
+
+def test_entries_are_kept_in_the_file(tmp_path):
+    path = tmp_path / 'cache.txt'
+    solution_cache.SolutionCache(path=str(path)).put(PUZZLE, solved(PUZZLE))
+
+    cache = solution_cache.SolutionCache(path=str(path))
+    assert len(cache) == 1
+    assert cache.get(relabelled(PUZZLE)) == relabelled(solved(PUZZLE))
+
+
+def test_the_file_keeps_only_the_entries_kept(tmp_path):
+    path = tmp_path / 'cache.txt'
+    cache = solution_cache.SolutionCache(path=str(path))
+    third = bands_swapped(OTHER)
+    third[third.index(0)] = solved(third)[third.index(0)]
+
+    for puzzle in (PUZZLE, OTHER, third, PUZZLE):
+        cache.put(puzzle, solved(puzzle))
+    with open(path, 'a') as file:
+        file.write('not an entry\n')
+    assert len(path.read_text().splitlines()) == 4
+
+    cache = solution_cache.SolutionCache(maxsize=2, path=str(path))
+    assert len(path.read_text().splitlines()) == len(cache) == 2
+    assert cache.get(PUZZLE) is None and cache.get(third) == solved(third)
+
+    assert len(solution_cache.SolutionCache(maxsize=2, path=str(path))) == 2
@@ -0,0 +1,58 @@
+import time
+
+import board_model, generator, solution_checker
+
+
+PUZZLE = board_model.parse_cells('530070000600195000098000060800060003400803001700020006060000280000419005000080079')
+
+# A 25x25 puzzle, far too long to check in a millisecond
+PUZZLE_25 = board_model.flatten(generator.PuzzleGenerator(seed=0).generate('Medium', box_size=5))
+
+
+def finished(checker, timeout=30):
+    '''Wait for the running check, return its result'''
+    deadline = time.perf_counter() + timeout
+    while checker.running() and time.perf_counter() < deadline:
+        time.sleep(0.001)
+
+    return checker.result
+
+
+def test_results():
+    checker = solution_checker.SolutionChecker()
+    clash = bytearray(PUZZLE)
+    clash[2] = 5
+
+    for grid, result in ((PUZZLE, 'unique'), (bytes(81), 'multiple'), (clash, 'unsolvable')):
+        checker.start(grid)
+        assert finished(checker) == result
+        assert checker.grid == bytes(grid)
+
+
+def test_budget_runs_out():
+    checker = solution_checker.SolutionChecker(budget=0.001)
+
+    # The budget ends the count, the result says so rather than staying unknown
+    checker.start(PUZZLE_25)
+    assert finished(checker) == 'timeout' and not checker.running()
+
+
+def test_count_finished_after_the_budget_is_trusted(monkeypatch):
+    # The timer goes off without stopping the count, as when it fires just after the count ended
+    monkeypatch.setattr(solution_checker.SolutionChecker, '_expire', lambda self: None)
+    checker = solution_checker.SolutionChecker(budget=0)
+
+    checker.start(PUZZLE)
+    assert finished(checker) == 'unique'
+
+
+def test_start_and_stop_drop_the_running_check():
+    checker = solution_checker.SolutionChecker(budget=30)
+
+    checker.start(PUZZLE_25)
+    checker.start(PUZZLE)
+    assert finished(checker) == 'unique' and checker.grid == bytes(PUZZLE)
+
+    checker.start(PUZZLE_25)
+    checker.stop()
+    assert checker.result is None and not checker.running()
@@ -0,0 +1,120 @@
+import random
+
+import pytest
+
+import bitmask_solver, board_model, dlx_solver, generator, logic_solver, parallel_solver, puzzle_pack
+
+
+def pack_puzzles(count, seed=0):
+    '''A few puzzles of every difficulty from the pack shipped with the game'''
+    rng = random.Random(seed)
+    with puzzle_pack.PuzzlePack(puzzle_pack.DEFAULT_PATH) as pack:
+        return [pack.choice(difficulty, rng)[1] for difficulty in puzzle_pack.DIFFICULTIES for _ in range(count)]
+
+
+PUZZLES = pack_puzzles(5)
+
+# A 16x16 puzzle with a unique solution, and the same grid with only 30% of the cells left
+PUZZLE_16 = board_model.flatten(generator.PuzzleGenerator(seed=1).generate('Medium', box_size=4))
+SPARSE_16 = bytearray(value if random.Random(cell).random() < 0.3 else 0 for cell, value in enumerate(PUZZLE_16))
+
+
+def solvers():
+    bitmask, dlx = bitmask_solver.BitmaskSolver(), dlx_solver.DLXSolver()
+    bitmask._status_solving = dlx._status_solving = True
+    return bitmask, dlx
+
+
+def is_solution(puzzle, solution):
+    '''Check the solution keeps every given number and fills every row, column and box with each digit once'''
+    g = board_model.geometry_of(puzzle)
+    return all(not given or given == value for given, value in zip(puzzle, solution)) and all(
+        sorted(solution[cell] for cell in unit) == list(range(1, g.side + 1)) for unit in g.units
+    )
+
+
+@pytest.mark.parametrize('puzzle', PUZZLES + [PUZZLE_16], ids=range(len(PUZZLES) + 1))
+def test_solvers_find_the_same_unique_solution(puzzle):
+    bitmask, dlx = solvers()
+    first, second = bytearray(puzzle), bytearray(puzzle)
+
+    assert bitmask.solve(first) and dlx.solve(second)
+    assert first == second
+    assert is_solution(puzzle, first)
+    assert bitmask.count_solutions(puzzle) == dlx.count_solutions(puzzle) == 1
+
+
+def test_solvers_agree_on_counts():
+    bitmask, dlx = solvers()
+    clashing = bytearray(PUZZLES[0])
+    clashing[1] = clashing[0] = next(value for value in PUZZLES[0] if value)
+
+    for grid, count in ((bytes(16), 2), (bytes(81), 2), (SPARSE_16, 2), (clashing, 0)):
+        assert bitmask.count_solutions(grid) == dlx.count_solutions(grid) == count
+
+
+def test_steps_end_on_the_solution():
+    bitmask, dlx = solvers()
+    expected = bytearray(PUZZLES[-1])
+    bitmask.solve(expected)
+
+    for solver in (bitmask, dlx):
+        grid = bytearray(PUZZLES[-1])
+        for i, j, value in solver.steps(PUZZLES[-1]):
+            grid[i * 9 + j] = value
+        assert solver._status_solved and grid == expected
+
+
+@pytest.mark.parametrize('puzzle', PUZZLES, ids=range(len(PUZZLES)))
+def test_logic_hints_agree_with_the_solution(puzzle):
+    solution = bytearray(puzzle)
+    solvers()[0].solve(solution)
+    grid = bytearray(puzzle)
+    solver = logic_solver.LogicSolver()
+
+    while hint := solver.hint(grid):
+        i, j, value, technique = hint
+        assert value == solution[i * 9 + j], technique
+        grid[i * 9 + j] = value
+
+    # Easy and Medium puzzles need no guessing, Hard ones may
+    assert grid == solution or solver.grade(puzzle) == 'Hard'
+
+
+def test_parallel_solver_agrees():
+    solver = parallel_solver.ParallelSolver(workers=2)
+    try:
+        for puzzle in (PUZZLES[-1], PUZZLE_16):
+            grid = bytearray(puzzle)
+            expected = bytearray(puzzle)
+            solvers()[0].solve(expected)
+
+            assert solver.solve(grid) and grid == expected
+            assert solver.count_solutions(puzzle) == 1
+
+        assert solver.count_solutions(bytes(81)) == 2
+    finally:
+        solver.shutdown()
+
+
+def test_parallel_solver_stops():
+    solver = parallel_solver.ParallelSolver(workers=2)
+    try:
+        # A stop before the run ends that run only
+        solver.stop()
+        assert solver.count_solutions(bytes(81)) == 0
+        assert solver.count_solutions(bytes(81)) == 2
+
+        # Stopped before its thread gets to the search (held back by the lock), the worker ends without searching
+        worker = parallel_solver.ParallelWorker(solver, bytes(256))
+        with solver._lock:
+            worker.start()
+            solver.stop()
+        worker.stop()
+        assert worker.status == 'stopped' and solver.stats['parts'] == 0
+
+        # Puzzles solved while splitting still count their nodes
+        assert solver.solve(bytearray(PUZZLES[0]))
+        assert solver.stats['parts'] == 0 and solver.stats['nodes'] > 0
+    finally:
+        solver.shutdown()
@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+import pytest
+
+import board_model, validation
+
+
+def brute_force(cells, side):
+    '''The same checks one cell at a time, straight from the rule'''
+    g = board_model.geometry_of(cells)
+    conflicts, candidates = [], []
+
+    for cell, value in enumerate(cells):
+        units = [unit for unit in g.units if cell in unit]
+        peers = {other for unit in units for other in unit if other != cell}
+        used = {cells[other] for unit in units for other in unit}
+
+        conflicts.append(1 <= value <= side and any(cells[other] == value for other in peers))
+        candidates.append(sum(1 << (digit - 1) for digit in range(1, side + 1) if digit not in used))
+
+    valid = not any(conflicts) and all(value <= side for value in cells)
+    filled = all(cells)
+
+    return {
+        'valid': valid,
+        'conflicts': conflicts,
+        'candidates': candidates,
+        'filled': filled,
+        'complete': filled and valid,
+    }
+
+
+def grids(side, count, rng):
+    '''Random grids from empty to full, a few with numbers too large, and a solved one (pattern grid)'''
+    n = board_model.geometry_of(range(side * side)).box_size
+    solved = bytes((n * (i % n) + i // n + j) % side + 1 for i in range(side) for j in range(side))
+    result = [solved, bytes(side * side)]
+
+    for k in range(count):
+        density = rng.random()
+        cells = bytearray(rng.randint(1, side) if rng.random() < density else 0 for _ in range(side * side))
+        if k % 5 == 0:
+            cells[rng.randrange(side * side)] = rng.randint(side + 1, 255)
+        result.append(bytes(cells))
+
+    # A solved grid with one cell emptied and one swapped for a conflict
+    broken = bytearray(solved)
+    broken[0], broken[1] = 0, broken[2]
+    result.append(bytes(broken))
+
+    return result
+
+
+@pytest.mark.parametrize('side', (4, 9, 16, 25))
+def test_check_matches_brute_force(side, monkeypatch):
+    # Small chunks, so grids are checked over several of them
+    monkeypatch.setattr(validation, '_CHUNK_SIZE', 7)
+    cases = grids(side, 40, random.Random(side))
+    result = validation.check(np.frombuffer(b''.join(cases), dtype=np.uint8), side)
+
+    for k, cells in enumerate(cases):
+        expected = brute_force(cells, side)
+
+        for key in ('valid', 'filled', 'complete'):
+            assert bool(result[key][k]) == expected[key], (k, key)
+
+        assert result['conflicts'][k].ravel().tolist() == expected['conflicts'], k
+        assert result['candidates'][k].ravel().tolist() == expected['candidates'], k
+
+    assert result['complete'][0] and not result['valid'][-1]
+
+
+def test_check_board():
+    cells = bytearray(grids(9, 0, random.Random(0))[0])
+    cells[0], cells[1] = 0, cells[2]
+    result = validation.check_board([list(cells[i * 9:i * 9 + 9]) for i in range(9)])
+
+    assert not result['valid'] and not result['filled']
+    # The 3 moved into (0, 1) clashes with the 3 of its row and of its column
+    assert result['conflicts'] == {(0, 1), (0, 2), (3, 1)}
+    assert result['candidates'][0][0] == {1}